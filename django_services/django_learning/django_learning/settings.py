@@ -22,6 +22,20 @@ def get_db_config() -> dict:
         "PASSWORD": service_pss["admin_db_password"],
         "HOST": env("DB_HOST"),
         "PORT": env("DB_PORT"),
+        # Connections are kept across requests instead of paying for the
+        # TCP, TLS and authentication round trips on each of them. Under
+        # ASGI they'd leak, requests not ending in the thread that queried.
+        "CONN_MAX_AGE": env.int(
+            "DB_CONN_MAX_AGE",
+            default=0 if env.bool("ASYNC_VIEWS", default=False) else 60,
+        ),
+        # Reused connections are checked once per request, so one closed
+        # by the database or the pooler fails no query
+        "CONN_HEALTH_CHECKS": env.bool("DB_CONN_HEALTH_CHECKS", default=True),
+        # pgbouncer in transaction mode may give every query of a request
+        # a different server connection, which cursors can't outlive
+        "DISABLE_SERVER_SIDE_CURSORS": env("DB_POOLER", default="")
+        == "pgbouncer",
     }
 
 
@@ -2,30 +2,38 @@
 
 set -e
 
-SERVICE_NAME="$1"
-CONTAINER_PORT="$2"
-SUPERUSER_USERNAME="$3"
-SUPERUSER_EMAIL="$4"
-WORKERS_PER_INSTANCE="$5"
-PARAMETER_NAME="$6"
-
-echo "Running database migrations"
-python manage.py migrate --noinput
-
-echo "Accessing passwords from encrypted parameter"
-SUPERUSER_PASSWORD=$(aws ssm get-parameter --name $PARAMETER_NAME --with-decryption | jq -r '.Parameter.Value | fromjson.superuser_password')
-
-echo "Creating superuser if it doesn't exist"
-python manage.py create_superuser_if_not_exists \
-    --username $SUPERUSER_USERNAME \
-    --email $SUPERUSER_EMAIL \
-    --password $SUPERUSER_PASSWORD
-
-echo "Collect static files, mainly for styling"
-python manage.py collectstatic --noinput
-
-echo "Initializing data in DB"
-python manage.py init_db
-
-echo "Starting Gunicorn server on port $CONTAINER_PORT"
-exec gunicorn -w $WORKERS_PER_INSTANCE -b :$CONTAINER_PORT $SERVICE_NAME.wsgi:application
+# bootstrap: one-off task run once per deploy, prepares the database
+# serve: service task, only starts the server
+MODE="$1"
+shift
+
+case "$MODE" in
+bootstrap)
+    SUPERUSER_USERNAME="$1"
+    SUPERUSER_EMAIL="$2"
+    PARAMETER_NAME="$3"
+
+    echo "Running database migrations"
+    python manage.py migrate --noinput
+
+    echo "Accessing passwords from encrypted parameter"
+    SUPERUSER_PASSWORD=$(aws ssm get-parameter --name $PARAMETER_NAME --with-decryption | jq -r '.Parameter.Value | fromjson.superuser_password')
+
+    echo "Creating superuser if it doesn't exist"
+    python manage.py create_superuser_if_not_exists \
+        --username $SUPERUSER_USERNAME \
+        --email $SUPERUSER_EMAIL \
+        --password $SUPERUSER_PASSWORD
+    ;;
+serve)
+    CONTAINER_PORT="$1"
+
+    # Workers, worker class and recycling come from gunicorn.conf.py
+    echo "Starting Gunicorn server on port $CONTAINER_PORT"
+    exec gunicorn --bind :$CONTAINER_PORT
+    ;;
+*)
+    echo "Unknown mode \"$MODE\", expected bootstrap or serve"
+    exit 1
+    ;;
+esac
@@ -0,0 +1,128 @@
+"""
+Gunicorn settings of the service tasks, read from the GUNICORN_*
+environment variables the IaC sets from BackendCfg. Gunicorn loads this
+file from the working directory, flags given on the command line win.
+"""
+
+import gc
+import math
+import os
+from typing import Any, Optional
+
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "gevent": "gevent",
+    "uvicorn": "uvicorn.workers.UvicornWorker",
+}
+# The ALB keeps idle connections for 60 seconds, workers must keep them
+# longer or the ALB may reuse one the worker just closed
+KEEPALIVE = 75
+
+
+def cgroup_cpus() -> Optional[float]:
+    """CPU quota of the container cgroup, None without one."""
+    try:
+        # cgroup v2: "<quota> <period>", quota being "max" without limit
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (FileNotFoundError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            cfs_quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            cfs_period = int(f.read())
+        return None if cfs_quota <= 0 else cfs_quota / cfs_period
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def available_cpus() -> float:
+    """
+    CPUs the task may use: the cgroup quota, then the CPU units of the
+    task definition, then the CPUs the process may run on.
+    """
+    cpus = cgroup_cpus()
+    if cpus is None and os.environ.get("GUNICORN_TASK_CPUS"):
+        cpus = float(os.environ["GUNICORN_TASK_CPUS"])
+    if cpus is None:
+        cpus = len(os.sched_getaffinity(0))
+    return cpus
+
+
+def setting(name: str, auto: int) -> int:
+    """Integer setting of the environment, the auto value when unset."""
+    value = os.environ.get(name, "auto")
+    return auto if value in ("", "auto") else int(value)
+
+
+cpus = available_cpus()
+worker_kind = os.environ.get("GUNICORN_WORKER_CLASS") or (
+    "uvicorn" if os.environ.get("ASYNC_VIEWS") == "true" else "sync"
+)
+worker_class = WORKER_CLASSES[worker_kind]
+wsgi_app = (
+    "django_learning.asgi:application"
+    if worker_kind == "uvicorn"
+    else "django_learning.wsgi:application"
+)
+
+# Sync workers handle one request each, so there are two per CPU to cover
+# the time spent waiting on the database. Others keep one per CPU and get
+# their concurrency from threads or an event loop.
+if worker_kind == "sync":
+    workers = setting("GUNICORN_WORKERS", math.ceil(2 * cpus) + 1)
+else:
+    workers = setting("GUNICORN_WORKERS", max(1, math.ceil(cpus)))
+threads = setting("GUNICORN_THREADS", 4 if worker_kind == "gthread" else 1)
+worker_connections = 1000
+
+# Workers are forked from a master that already loaded Django and the
+# views, sharing their pages copy-on-write
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true") == "true"
+
+# Recycles workers after a number of requests, jittered so they don't all
+# restart at once
+max_requests = setting("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = setting("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+timeout = setting("GUNICORN_TIMEOUT", 30)
+graceful_timeout = timeout
+keepalive = KEEPALIVE
+
+if worker_kind == "gevent" and preload_app:
+    # Patched before the application is loaded in the master
+    from gevent import monkey
+
+    monkey.patch_all()
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    if worker_kind == "gevent":
+        # psycopg2 waits on the database in C, blocking the hub of the
+        # worker unless it yields to gevent through a wait callback
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
+
+
+def when_ready(server: Any) -> None:
+    if not preload_app:
+        return
+    from django.db import connections
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    # Connections can't be shared with the forked workers
+    connections.close_all()
+    # Objects of the master are left out of the collections of the
+    # workers, which would otherwise touch and copy their pages
+    gc.freeze()
+    server.log.info(
+        "Warmed up %s %s workers on %.2f CPUs",
+        workers,
+        worker_kind,
+        cpus,
+    )
@@ -2,34 +2,42 @@
 
 set -e
 
-SERVICE_NAME="$1"
-CONTAINER_PORT="$2"
-SUPERUSER_USERNAME="$3"
-SUPERUSER_EMAIL="$4"
-WORKERS_PER_INSTANCE="$5"
-PARAMETER_NAME="$6"
-
-echo "Running database migrations"
-python manage.py migrate --noinput
-
-echo "Accessing passwords from encrypted parameter"
-SUPERUSER_PASSWORD=$(aws ssm get-parameter --name $PARAMETER_NAME --with-decryption | jq -r '.Parameter.Value | fromjson.superuser_password')
-
-echo "Creating superuser if it doesn't exist"
-python manage.py create_superuser_if_not_exists \
-    --username $SUPERUSER_USERNAME \
-    --email $SUPERUSER_EMAIL \
-    --password $SUPERUSER_PASSWORD
-
-echo "Collect static files, mainly for styling"
-python manage.py collectstatic --noinput
-
-echo "Installing GIS extension on postgres"
-DB_PSS=$(aws ssm get-parameter --name $PARAMETER_NAME --with-decryption | jq -r '.Parameter.Value | fromjson.admin_db_password')
-PGPASSWORD="$DB_PSS" psql -U "$DB_USER" -d "$DB_NAME" -h "$DB_HOST" -p "$DB_PORT" -c "CREATE EXTENSION IF NOT EXISTS postgis;"
-
-echo "Initializing data in DB"
-python manage.py init_db
-
-echo "Starting Gunicorn server on port $CONTAINER_PORT"
-exec gunicorn -w $WORKERS_PER_INSTANCE -b :$CONTAINER_PORT $SERVICE_NAME.wsgi:application
+# bootstrap: one-off task run once per deploy, prepares the database
+# serve: service task, only starts the server
+MODE="$1"
+shift
+
+case "$MODE" in
+bootstrap)
+    SUPERUSER_USERNAME="$1"
+    SUPERUSER_EMAIL="$2"
+    # The passwords are read from the PSS_PARAM_NAME parameter by
+    # papernest/secrets.py, and migrate installs the PostGIS extension
+
+    echo "Bootstrapping: migrations, cache table, superuser and data"
+    # Static files are collected in the image
+    exec python manage.py bootstrap \
+        --username $SUPERUSER_USERNAME \
+        --email $SUPERUSER_EMAIL \
+        --skip collectstatic
+    ;;
+serve)
+    CONTAINER_PORT="$1"
+
+    # The snapshot the memory backend maps is a local file, each task
+    # exports its own as the bootstrap task's one isn't visible to it
+    if [ "$COVERAGE_BACKEND" = "memory" ] &&
+        [ -n "$COVERAGE_SNAPSHOT_PATH" ]; then
+        echo "Exporting the coverage snapshot to $COVERAGE_SNAPSHOT_PATH"
+        python manage.py export_coverage_snapshot
+    fi
+
+    # Workers, worker class and recycling come from gunicorn.conf.py
+    echo "Starting Gunicorn server on port $CONTAINER_PORT"
+    exec gunicorn --bind :$CONTAINER_PORT
+    ;;
+*)
+    echo "Unknown mode \"$MODE\", expected bootstrap or serve"
+    exit 1
+    ;;
+esac
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+from typing import Iterable, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.files.storage import Storage
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+
+from operators.datasets import file_checksum
+from operators.models import CoverageDataset
+from operators.scripts.columnar import read_header
+from operators.snapshot import MAGIC as SNAPSHOT_MAGIC
+
+from .models import BootstrapStep
+
+# Fingerprint of the collected static files, kept with them since every
+# container collects its own copy
+STATIC_FINGERPRINT = ".fingerprint"
+# Concurrent bootstraps, from tasks started together, run one at a time
+LOCK_ID = 0x626F6F74
+
+
+def sha256_lines(lines: Iterable[str]) -> str:
+    sha256 = hashlib.sha256()
+    for line in lines:
+        sha256.update(line.encode())
+        sha256.update(b"\n")
+    return sha256.hexdigest()
+
+
+def migrations_fingerprint() -> str:
+    """Hash of the migration graph, read from disk only."""
+    graph = MigrationLoader(None, ignore_no_migrations=True).graph
+    return sha256_lines(f"{app}.{name}" for app, name in sorted(graph.nodes))
+
+
+def cache_fingerprint() -> str:
+    return sha256_lines([json.dumps(settings.CACHES, sort_keys=True)])
+
+
+def superuser_fingerprint(username: str, email: str) -> str:
+    return sha256_lines([username, email])
+
+
+def dataset_fingerprint(path: str) -> str:
+    return sha256_lines([file_checksum(path), settings.COVERAGE_LAYOUT])
+
+
+def static_fingerprint() -> str:
+    """
+    Hash of the names and contents of the files collectstatic copies, the
+    first finder listing a name winning as it does in collectstatic.
+    """
+    ignore_patterns = apps.get_app_config("staticfiles").ignore_patterns
+    files: dict[str, Tuple[Storage, str]] = dict()
+    for finder in get_finders():
+        for path, storage in finder.list(ignore_patterns):
+            prefixed = os.path.join(getattr(storage, "prefix", "") or "", path)
+            files.setdefault(prefixed, (storage, path))
+
+    sha256 = hashlib.sha256()
+    for prefixed in sorted(files):
+        storage, path = files[prefixed]
+        sha256.update(prefixed.encode() + b"\n")
+        with storage.open(path) as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+    return sha256.hexdigest()
+
+
+def snapshot_fingerprint() -> str:
+    """Release the snapshot should hold, the active dataset."""
+    active = CoverageDataset.active()
+    return active.version if active else ""
+
+
+def stored_fingerprint(name: str) -> Optional[str]:
+    """Fingerprint recorded for the step, None before the first migrate."""
+    if (
+        BootstrapStep._meta.db_table
+        not in connection.introspection.table_names()
+    ):
+        return None
+    step = BootstrapStep.objects.filter(name=name).first()
+    return step.fingerprint if step else None
+
+
+def record_fingerprint(name: str, fingerprint: str, seconds: float) -> None:
+    BootstrapStep.objects.update_or_create(
+        name=name, defaults={"fingerprint": fingerprint, "seconds": seconds}
+    )
+
+
+def stored_static_fingerprint() -> Optional[str]:
+    try:
+        with open(os.path.join(settings.STATIC_ROOT, STATIC_FINGERPRINT)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def record_static_fingerprint(fingerprint: str) -> None:
+    with open(
+        os.path.join(settings.STATIC_ROOT, STATIC_FINGERPRINT), "w"
+    ) as f:
+        f.write(fingerprint)
+
+
+def stored_snapshot_fingerprint(path: str) -> Optional[str]:
+    """Release the snapshot at the path holds, None when there is none."""
+    try:
+        return read_header(path, SNAPSHOT_MAGIC)["dataset"]
+    except FileNotFoundError:
+        return None
+
+
+def lock() -> None:
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [LOCK_ID])
+
+
+def unlock() -> None:
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [LOCK_ID])
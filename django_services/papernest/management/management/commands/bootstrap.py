@@ -0,0 +1,214 @@
+import argparse
+import time
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from management.bootstrap import (
+    cache_fingerprint,
+    dataset_fingerprint,
+    lock,
+    migrations_fingerprint,
+    record_fingerprint,
+    record_static_fingerprint,
+    snapshot_fingerprint,
+    static_fingerprint,
+    stored_fingerprint,
+    stored_snapshot_fingerprint,
+    stored_static_fingerprint,
+    superuser_fingerprint,
+    unlock,
+)
+from operators.models import Operator
+from papernest.secrets import get_secrets
+
+
+class Step(NamedTuple):
+    name: str
+    fingerprint: Callable[[], str]
+    stored: Callable[[], Optional[str]]
+    run: Callable[[], None]
+    # Stores the fingerprint and duration of the step once it ran
+    record: Callable[[str, float], None]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prepares the database and the container in one process: migrate, "
+        "createcachetable, create_superuser_if_not_exists, collectstatic, "
+        "init_db and optionally export_coverage_snapshot. Steps whose "
+        "inputs didn't change since they last ran are skipped."
+    )
+
+    STEPS = [
+        "migrate",
+        "createcachetable",
+        "superuser",
+        "collectstatic",
+        "init_db",
+        "snapshot",
+    ]
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument("--username", help="Superuser username")
+        parser.add_argument("--email", default="", help="Superuser email")
+        parser.add_argument(
+            "--password",
+            help="Superuser password, the superuser_password secret by "
+            "default",
+        )
+        parser.add_argument(
+            "--path",
+            default="data/operators_cvg.csv",
+            help="Coverage file init_db or refresh_coverage loads",
+        )
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument(
+            "--snapshot",
+            action="store_true",
+            help="Exports the coverage snapshot to COVERAGE_SNAPSHOT_PATH, "
+            "for workers sharing its volume",
+        )
+        parser.add_argument(
+            "--skip",
+            action="append",
+            choices=self.STEPS,
+            default=[],
+            help="Step not to run, can be repeated",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Runs every step, whatever its fingerprint",
+        )
+
+    def handle(self, *args: Tuple, **options: Any) -> None:
+        skip = set(options["skip"])
+        if not options["username"]:
+            skip.add("superuser")
+        elif not options["password"]:
+            try:
+                options["password"] = get_secrets().get("superuser_password")
+            except KeyError:
+                raise CommandError(
+                    "Missing --password or superuser_password secret"
+                )
+        snapshot_path = settings.COVERAGE_SNAPSHOT["PATH"]
+        if options["snapshot"] and not snapshot_path:
+            raise CommandError("--snapshot needs COVERAGE_SNAPSHOT_PATH")
+        if not options["snapshot"]:
+            skip.add("snapshot")
+
+        steps = [
+            step
+            for step in self.steps(options, snapshot_path)
+            if step.name not in skip
+        ]
+        start = time.perf_counter()
+        lock()
+        try:
+            for step in steps:
+                self.run_step(step, options["force"])
+        finally:
+            unlock()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Bootstrap done in {time.perf_counter() - start:.2f}s"
+            )
+        )
+
+    def steps(self, options: dict[str, Any], snapshot_path: str) -> list[Step]:
+        def db_step(
+            name: str, fingerprint: Callable[[], str], run: Callable[[], None]
+        ) -> Step:
+            return Step(
+                name,
+                fingerprint,
+                lambda: stored_fingerprint(name),
+                run,
+                lambda value, seconds: record_fingerprint(
+                    name, value, seconds
+                ),
+            )
+
+        return [
+            db_step(
+                "migrate",
+                migrations_fingerprint,
+                lambda: self.call("migrate", interactive=False),
+            ),
+            db_step(
+                "createcachetable",
+                cache_fingerprint,
+                lambda: self.call("createcachetable"),
+            ),
+            db_step(
+                "superuser",
+                lambda: superuser_fingerprint(
+                    options["username"], options["email"]
+                ),
+                lambda: self.call(
+                    "create_superuser_if_not_exists",
+                    username=options["username"],
+                    email=options["email"],
+                    password=options["password"],
+                ),
+            ),
+            Step(
+                "collectstatic",
+                static_fingerprint,
+                stored_static_fingerprint,
+                lambda: self.call("collectstatic", interactive=False),
+                lambda value, _: record_static_fingerprint(value),
+            ),
+            db_step(
+                "init_db",
+                lambda: dataset_fingerprint(options["path"]),
+                lambda: self.load_coverage(
+                    options["path"], options["workers"]
+                ),
+            ),
+            Step(
+                "snapshot",
+                snapshot_fingerprint,
+                lambda: stored_snapshot_fingerprint(snapshot_path),
+                lambda: self.call("export_coverage_snapshot"),
+                lambda value, seconds: None,
+            ),
+        ]
+
+    def run_step(self, step: Step, force: bool) -> None:
+        start = time.perf_counter()
+        fingerprint = step.fingerprint()
+        if not force and step.stored() == fingerprint:
+            status = "up to date, skipped"
+        else:
+            step.run()
+            step.record(fingerprint, time.perf_counter() - start)
+            status = "done"
+        self.stdout.write(
+            f"{step.name}: {status} in {time.perf_counter() - start:.2f}s"
+        )
+
+    def load_coverage(self, path: str, workers: int) -> None:
+        """
+        init_db does nothing once the operators exist, a new file or
+        COVERAGE_LAYOUT is then published with refresh_coverage. Forced,
+        the active dataset sharing the file checksum on a layout switch.
+        """
+        if not Operator.objects.exists():
+            self.call("init_db", path=path, workers=workers)
+        else:
+            self.call(
+                "refresh_coverage",
+                path=path,
+                workers=workers,
+                force=True,
+                delta=connection.vendor != "postgresql",
+            )
+
+    def call(self, name: str, **options: Any) -> None:
+        call_command(name, stdout=self.stdout, stderr=self.stderr, **options)
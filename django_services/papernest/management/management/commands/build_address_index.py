@@ -0,0 +1,37 @@
+import argparse
+from typing import Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from operators.requests.local_geocoder import build_address_index, read_ban
+
+
+class Command(BaseCommand):
+    help = "Builds the local geocoder index from BAN CSV extracts."
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help="BAN CSV extracts (adresses-*.csv), plain or gzipped",
+        )
+        parser.add_argument(
+            "--output",
+            default=settings.LOCAL_GEOCODER["INDEX"],
+            help="Index directory, LOCAL_GEOCODER_INDEX by default",
+        )
+
+    def handle(self, *args: Tuple, **options: dict) -> None:
+        if not options["output"]:
+            raise CommandError("Missing --output or LOCAL_GEOCODER_INDEX")
+
+        counts = build_address_index(
+            read_ban(options["paths"]), str(options["output"])
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {counts['addresses']} addresses of "
+                f"{counts['streets']} streets in {options['output']}"
+            )
+        )
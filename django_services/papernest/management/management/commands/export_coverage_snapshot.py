@@ -0,0 +1,51 @@
+import argparse
+import os
+from typing import Any, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from operators.models import CoverageDataset
+from operators.snapshot import export_snapshot, snapshot_generation
+from operators.spatial_index import CoverageIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the Coverage table to the snapshot the memory backend "
+        "workers map."
+    )
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--path",
+            default=settings.COVERAGE_SNAPSHOT["PATH"],
+            help="Snapshot file, COVERAGE_SNAPSHOT_PATH by default",
+        )
+        parser.add_argument(
+            "--generation",
+            type=int,
+            help="Generation of the snapshot, the current one plus one by "
+            "default",
+        )
+
+    def handle(self, *args: Tuple, **options: Any) -> None:
+        path = options["path"]
+        if not path:
+            raise CommandError("Missing --path or COVERAGE_SNAPSHOT_PATH")
+
+        generation = options["generation"]
+        if generation is None:
+            generation = (snapshot_generation(path) or 0) + 1
+        active = CoverageDataset.active()
+
+        index = CoverageIndex.from_db()
+        export_snapshot(
+            path, index, generation, active.version if active else ""
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Exported {len(index)} coverages to {path}, generation "
+                f"{generation} ({os.path.getsize(path) / 2**20:.1f} MB)"
+            )
+        )
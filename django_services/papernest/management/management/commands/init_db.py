@@ -1,23 +1,70 @@
-import csv
-from typing import Tuple
+import argparse
+import time
+from typing import Any, Tuple
 
 from django.core.management.base import BaseCommand
-from operators.models import Operator, Coverage
-from django.contrib.gis.geos import Point
+from django.db import transaction
+from operators.datasets import file_checksum
+from operators.loaders import load_coverage
+from operators.models import Operator, CoverageDataset
 
 
 class Command(BaseCommand):
     help = "Initiliazes DB. Idempotent, only runs if it hasn't been initialized yet."
 
-    def handle(self, *args: Tuple, **options: dict) -> None:
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--path",
+            default="data/operators_cvg.csv",
+            help="Raw coverage file, plain or compressed (.gz, .zst)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50000,
+            help="Rows read, reprojected and inserted at once",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes parsing and reprojecting uncompressed files",
+        )
+        parser.add_argument(
+            "--cluster",
+            action=argparse.BooleanOptionalAction,
+            default=False,
+            help="Sorts the rows along a Hilbert curve before loading them, "
+            "in memory",
+        )
+        parser.add_argument(
+            "--release",
+            default="initial",
+            help="Version recorded for the loaded dataset",
+        )
+
+    def handle(self, *args: Tuple, **options: Any) -> None:
         if not Operator.objects.exists():
-            Command.load_operators()
-            init_data = Command.read_init_data(
-                "data/operators_cvg_processed.csv"
-            )
-            Command.load_coverage_bulk(init_data)
+            start = time.perf_counter()
+            with transaction.atomic():
+                Command.load_operators()
+                rows = load_coverage(
+                    options["path"],
+                    options["batch_size"],
+                    options["workers"],
+                    cluster=options["cluster"],
+                )
+                CoverageDataset.objects.create(
+                    version=options["release"],
+                    checksum=file_checksum(options["path"]),
+                    rows=rows,
+                )
+            elapsed = time.perf_counter() - start
             self.stdout.write(
-                self.style.SUCCESS("Successfully initialized DB")
+                self.style.SUCCESS(
+                    f"Successfully initialized DB with {rows} coverages "
+                    f"in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)"
+                )
             )
         else:
             self.stdout.write(self.style.SUCCESS("DB already initialized"))
@@ -31,34 +78,3 @@ class Command(BaseCommand):
             Operator(id=20820, name="Bouygue"),
         ]
         Operator.objects.bulk_create(operators)
-
-    @staticmethod
-    def read_init_data(path: str) -> list[dict]:
-        init_data = list()
-        with open(path) as f:
-            reader = csv.DictReader(f)
-            init_data = [row for row in reader]
-        return init_data
-
-    @staticmethod
-    def load_coverage_bulk(data: list[dict]) -> None:
-        operators_cvg = list()
-        for operator_cvg in data:
-            operator_id = operator_cvg["operator_id"]
-            operator_cvg.pop("operator_id")
-            location = Point(
-                float(operator_cvg["longitude"]),
-                float(operator_cvg["latitude"]),
-                srid=Coverage.SRID_WGS84,
-            )
-            operator_cvg.pop("latitude")
-            operator_cvg.pop("longitude")
-
-            operators_cvg.append(
-                Coverage(
-                    operator_id=Operator.objects.get(id=operator_id),
-                    location=location,
-                    **operator_cvg
-                )
-            )
-        Coverage.objects.bulk_create(operators_cvg)
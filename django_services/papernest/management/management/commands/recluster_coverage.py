@@ -0,0 +1,30 @@
+import argparse
+import time
+from typing import Any, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from operators.datasets import recluster
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrites the Coverage table in the Hilbert order of its points, so "
+        "neighbours share heap pages, without blocking lookups."
+    )
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument("--batch-size", type=int, default=50000)
+
+    def handle(self, *args: Tuple, **options: Any) -> None:
+        if connection.vendor != "postgresql":
+            raise CommandError("recluster_coverage needs PostgreSQL")
+
+        start = time.perf_counter()
+        rows = recluster(options["batch_size"])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reclustered {rows} coverages in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,126 @@
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Any, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from operators.datasets import (
+    create_staging,
+    file_checksum,
+    index_staging,
+    publish_staging,
+    rollback,
+    staging_table,
+)
+from operators.delta import publish_delta
+from operators.loaders import load_coverage
+from operators.models import Operator, CoverageDataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Publishes a new coverage release without downtime: loads it into a "
+        "staging table, indexes it and swaps it with the live one."
+    )
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--path",
+            help="Raw coverage file, plain or compressed (.gz, .zst)",
+        )
+        parser.add_argument(
+            "--cluster",
+            action=argparse.BooleanOptionalAction,
+            default=False,
+            help="Sorts the rows along a Hilbert curve before loading them, "
+            "in memory",
+        )
+        parser.add_argument(
+            "--release",
+            help="Version recorded for the dataset, load time by default",
+        )
+        parser.add_argument("--batch-size", type=int, default=50000)
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Reload a file with the same checksum as the live dataset",
+        )
+        parser.add_argument(
+            "--delta",
+            action="store_true",
+            help=(
+                "Applies only the inserts, deletes and flag changes to the "
+                "live table, instead of swapping a full copy"
+            ),
+        )
+        parser.add_argument(
+            "--rollback",
+            action="store_true",
+            help="Swaps the previous dataset back in",
+        )
+
+    def handle(self, *args: Tuple, **options: Any) -> None:
+        if connection.vendor != "postgresql" and not options["delta"]:
+            raise CommandError("Only --delta is supported without PostgreSQL")
+
+        if options["rollback"]:
+            try:
+                restored = rollback()
+            except LookupError as error:
+                raise CommandError(str(error))
+            self.stdout.write(
+                self.style.SUCCESS(f"Restored dataset {restored.version}")
+            )
+            return
+
+        path = options["path"]
+        if not path:
+            raise CommandError("Missing --path")
+        if not Operator.objects.exists():
+            raise CommandError("No operators, run init_db first")
+
+        checksum = file_checksum(path)
+        active = CoverageDataset.active()
+        if active and active.checksum == checksum and not options["force"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"Dataset {active.version} already live")
+            )
+            return
+
+        start = time.perf_counter()
+        dataset = CoverageDataset(
+            version=options["release"]
+            or datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S"),
+            checksum=checksum,
+        )
+        if options["delta"]:
+            delta = publish_delta(path, dataset, options["batch_size"])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Updated dataset {dataset.version} with {delta} "
+                    f"in {elapsed:.1f}s"
+                )
+            )
+            return
+
+        create_staging()
+        rows = load_coverage(
+            path,
+            options["batch_size"],
+            options["workers"],
+            staging_table(),
+            options["cluster"],
+        )
+        index_staging()
+        dataset.rows = rows
+        publish_staging(dataset)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Published dataset {dataset.version} with {rows} coverages "
+                f"in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,14 @@
+from django.db.models import Model, CharField, DateTimeField, FloatField
+
+
+class BootstrapStep(Model):
+    """State the database was last brought to by a bootstrap step."""
+
+    name = CharField(max_length=64, primary_key=True)
+    # sha256 of the inputs of the step when it last ran
+    fingerprint = CharField(max_length=64)
+    seconds = FloatField(default=0)
+    updated_at = DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.fingerprint[:12]})"
@@ -3,7 +3,11 @@ from django.contrib import admin
 from .models import (
     Operator,
     Coverage,
+    CompactCoverage,
+    CoverageDataset,
 )
 
 admin.site.register(Operator)
 admin.site.register(Coverage)
+admin.site.register(CompactCoverage)
+admin.site.register(CoverageDataset)
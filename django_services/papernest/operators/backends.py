@@ -0,0 +1,106 @@
+from typing import Optional, Protocol, Tuple
+
+from django.conf import settings
+
+from .models import BaseCoverage, Coverage, coverage_model
+from .snapshot import get_snapshot_watcher
+from .spatial_index import CoverageIndex
+
+
+def coverage_flags(g2: bool, g3: bool, g4: bool) -> dict[str, bool]:
+    return {
+        "2G": g2,
+        "3G": g3,
+        "4G": g4,
+    }
+
+
+class CoverageBackend(Protocol):
+    def closest(
+        self, coordinates: Tuple, max_dist: float = Coverage.MAX_DIST_METERS
+    ) -> dict[str, dict[str, bool]]:
+        ...
+
+    def closest_many(
+        self,
+        coordinates: list[Tuple],
+        max_dists: Optional[list[float]] = None,
+    ) -> list[dict[str, dict[str, bool]]]:
+        ...
+
+
+class SQLCoverageBackend:
+    """Runs the closest coverage lookup in the database."""
+
+    def closest(
+        self, coordinates: Tuple, max_dist: float = Coverage.MAX_DIST_METERS
+    ) -> dict[str, dict[str, bool]]:
+        return self.to_response(
+            coverage_model().get_closest_coverage(coordinates, max_dist)
+        )
+
+    def closest_many(
+        self,
+        coordinates: list[Tuple],
+        max_dists: Optional[list[float]] = None,
+    ) -> list[dict[str, dict[str, bool]]]:
+        return [
+            self.to_response(cvgs)
+            for cvgs in coverage_model().get_closest_coverage_batch(
+                coordinates, max_dists
+            )
+        ]
+
+    @staticmethod
+    def to_response(cvgs: list[BaseCoverage]) -> dict[str, dict[str, bool]]:
+        response = dict()
+        for cvg in cvgs:
+            response[cvg.operator_name] = coverage_flags(
+                cvg.g2, cvg.g3, cvg.g4
+            )
+        return response
+
+
+class MemoryCoverageBackend:
+    """
+    Answers the lookup from the in-memory index of the worker, or from the
+    coverage snapshot all the workers map when one is configured.
+    """
+
+    @staticmethod
+    def index() -> CoverageIndex:
+        watcher = get_snapshot_watcher()
+        index = watcher.get() if watcher is not None else None
+        return index if index is not None else CoverageIndex.get()
+
+    def closest(
+        self, coordinates: Tuple, max_dist: float = Coverage.MAX_DIST_METERS
+    ) -> dict[str, dict[str, bool]]:
+        response = dict()
+        for match in self.index().closest(coordinates, max_dist):
+            response[match.operator_name] = coverage_flags(
+                match.g2, match.g3, match.g4
+            )
+        return response
+
+    def closest_many(
+        self,
+        coordinates: list[Tuple],
+        max_dists: Optional[list[float]] = None,
+    ) -> list[dict[str, dict[str, bool]]]:
+        if max_dists is None:
+            max_dists = [Coverage.MAX_DIST_METERS] * len(coordinates)
+        return [
+            self.closest(point, max_dist)
+            for point, max_dist in zip(coordinates, max_dists)
+        ]
+
+
+COVERAGE_BACKENDS: dict[str, type[CoverageBackend]] = {
+    "sql": SQLCoverageBackend,
+    "memory": MemoryCoverageBackend,
+}
+
+
+def get_coverage_backend() -> CoverageBackend:
+    return COVERAGE_BACKENDS[settings.COVERAGE_BACKEND]()
@@ -0,0 +1,274 @@
+import hashlib
+import re
+from typing import Tuple
+
+import numpy as np
+
+from django.db import connection, transaction
+from django.db.backends.utils import CursorWrapper
+
+from .models import CoverageDataset, coverage_model
+from .scripts.utils import hilbert_keys
+
+# Tables next to the Coverage table, the release being loaded and the one
+# it replaced
+STAGING_SUFFIX = "_staging"
+PREVIOUS_SUFFIX = "_previous"
+# Indexes and index backed constraints of the staging and previous tables
+# are named after the ones of the live table plus this suffix, index names
+# being unique per schema
+ALT_SUFFIX = "_alt"
+# The previous table takes the ALT_SUFFIX names when swapped out. They are
+# parked under this suffix before a staging table is indexed with them.
+PARKED_SUFFIX = "_prev"
+SWAP_LOCK_TIMEOUT = "5s"
+
+INDEX_DEFINITION = re.compile(
+    r"^(CREATE (?:UNIQUE )?INDEX )(\S+)( ON (?:ONLY )?)(\S+)(.*)$"
+)
+
+
+def live_table() -> str:
+    return coverage_model()._meta.db_table
+
+
+def staging_table() -> str:
+    return f"{live_table()}{STAGING_SUFFIX}"
+
+
+def previous_table() -> str:
+    return f"{live_table()}{PREVIOUS_SUFFIX}"
+
+
+def file_checksum(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def quote(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def table_exists(cursor: CursorWrapper, table: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [table])
+    return cursor.fetchone()[0]
+
+
+def indexes(cursor: CursorWrapper, table: str) -> list[Tuple[str, str]]:
+    """Name and definition of the indexes not backing a constraint."""
+    cursor.execute(
+        """
+        SELECT indexname, indexdef
+        FROM pg_indexes
+        WHERE tablename = %s
+          AND indexname NOT IN (
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = %s::regclass
+          )
+        ORDER BY indexname
+        """,
+        [table, table],
+    )
+    return cursor.fetchall()
+
+
+def constraints(
+    cursor: CursorWrapper, table: str, types: str
+) -> list[Tuple[str, str, str]]:
+    """Name, type and definition of the constraints of the given types."""
+    cursor.execute(
+        """
+        SELECT conname, contype, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype::text = ANY(%s)
+        ORDER BY conname
+        """,
+        [table, list(types)],
+    )
+    return cursor.fetchall()
+
+
+def create_staging() -> None:
+    """
+    Creates an empty staging table shaped like the Coverage table, without
+    indexes so it loads fast.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {quote(staging_table())}")
+        cursor.execute(
+            f"CREATE TABLE {quote(staging_table())} "
+            f"(LIKE {quote(live_table())} INCLUDING DEFAULTS "
+            "INCLUDING IDENTITY INCLUDING CONSTRAINTS)"
+        )
+
+
+def index_staging() -> None:
+    """
+    Adds the keys, foreign keys and indexes of the Coverage table to the
+    loaded staging table, then analyzes it.
+    """
+    live, staging = live_table(), staging_table()
+    with connection.cursor() as cursor:
+        if table_exists(cursor, previous_table()):
+            rename_indexes(cursor, previous_table(), ALT_SUFFIX, PARKED_SUFFIX)
+        for name, kind, definition in constraints(cursor, live, "puf"):
+            # Foreign key names are only unique per table
+            alt = name if kind == "f" else f"{name}{ALT_SUFFIX}"
+            cursor.execute(
+                f"ALTER TABLE {quote(staging)} "
+                f"ADD CONSTRAINT {quote(alt)} {definition}"
+            )
+        for name, definition in indexes(cursor, live):
+            match = INDEX_DEFINITION.match(definition)
+            if match is None:
+                raise ValueError(f"Unexpected index definition: {definition}")
+            cursor.execute(
+                f"{match.group(1)}{quote(name + ALT_SUFFIX)}"
+                f"{match.group(3)}{quote(staging)}{match.group(5)}"
+            )
+        cursor.execute(f"ANALYZE {quote(staging)}")
+
+
+def rename_indexes(
+    cursor: CursorWrapper, table: str, old_suffix: str, new_suffix: str
+) -> None:
+    """
+    Renames the indexes and index backed constraints of the table ending
+    with the old suffix, replacing it with the new one.
+    """
+    for name, _, _ in constraints(cursor, table, "pu"):
+        if not name.endswith(old_suffix):
+            continue
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} RENAME CONSTRAINT {quote(name)} "
+            f"TO {quote(renamed(name, old_suffix, new_suffix))}"
+        )
+    for name, _ in indexes(cursor, table):
+        if not name.endswith(old_suffix):
+            continue
+        cursor.execute(
+            f"ALTER INDEX {quote(name)} "
+            f"RENAME TO {quote(renamed(name, old_suffix, new_suffix))}"
+        )
+
+
+def renamed(name: str, old_suffix: str, new_suffix: str) -> str:
+    if old_suffix and name.endswith(old_suffix):
+        name = name[: -len(old_suffix)]
+    return f"{name}{new_suffix}"
+
+
+def swap(other: str) -> None:
+    """
+    Swaps the Coverage table with the other one, along with the names of
+    their indexes. Renames only touch the catalog, so readers wait for the
+    lock a few milliseconds at most. Queries queued behind it then run
+    against the new table. The other table may have its names parked, when
+    it is the previous one.
+    """
+    live = live_table()
+    parked = f"{live}_swap"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+        cursor.execute(f"LOCK TABLE {quote(live)}, {quote(other)}")
+        rename_indexes(cursor, live, "", "_swap")
+        rename_indexes(cursor, other, ALT_SUFFIX, "")
+        rename_indexes(cursor, other, PARKED_SUFFIX, "")
+        rename_indexes(cursor, live, "_swap", ALT_SUFFIX)
+        cursor.execute(f"ALTER TABLE {quote(live)} RENAME TO {quote(parked)}")
+        cursor.execute(f"ALTER TABLE {quote(other)} RENAME TO {quote(live)}")
+        cursor.execute(f"ALTER TABLE {quote(parked)} RENAME TO {quote(other)}")
+
+
+def publish_staging(dataset: CoverageDataset) -> None:
+    """
+    Swaps the loaded staging table in. The replaced data is kept in the
+    previous table, for a rollback.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {quote(previous_table())}")
+            cursor.execute(
+                f"ALTER TABLE {quote(staging_table())} "
+                f"RENAME TO {quote(previous_table())}"
+            )
+        swap(previous_table())
+        CoverageDataset.objects.filter(status=CoverageDataset.PREVIOUS).update(
+            status=CoverageDataset.RETIRED
+        )
+        CoverageDataset.objects.filter(status=CoverageDataset.ACTIVE).update(
+            status=CoverageDataset.PREVIOUS
+        )
+        dataset.status = CoverageDataset.ACTIVE
+        dataset.save()
+
+
+def rollback() -> CoverageDataset:
+    """Swaps the previous table back in, returns the restored dataset."""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if not table_exists(cursor, previous_table()):
+                raise LookupError("No previous coverage dataset to restore")
+        swap(previous_table())
+        restored = CoverageDataset.objects.filter(
+            status=CoverageDataset.PREVIOUS
+        ).last()
+        CoverageDataset.objects.filter(status=CoverageDataset.ACTIVE).update(
+            status=CoverageDataset.PREVIOUS
+        )
+        if restored is None:
+            restored = CoverageDataset(version="unknown", checksum="")
+        restored.status = CoverageDataset.ACTIVE
+        restored.save()
+    return restored
+
+
+def hilbert_ids(cursor: CursorWrapper, batch_size: int) -> np.ndarray:
+    """Ids of the Coverage table sorted along the Hilbert curve."""
+    cursor.execute(
+        f"SELECT id, ST_X(geom), ST_Y(geom) FROM {quote(live_table())}"
+    )
+    ids, x, y = list(), list(), list()
+    while rows := cursor.fetchmany(batch_size):
+        batch = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        ids.append(batch[:, 0].astype(np.int64))
+        x.append(batch[:, 1])
+        y.append(batch[:, 2])
+    if not ids:
+        return np.empty(0, dtype=np.int64)
+    keys = hilbert_keys(np.concatenate(x), np.concatenate(y))
+    return np.concatenate(ids)[np.argsort(keys, kind="stable")]
+
+
+def recluster(batch_size: int) -> int:
+    """
+    Rewrites the Coverage table in the Hilbert order of its points. The
+    rows, ids included, are copied in order to the staging table, which is
+    indexed and swapped in. The previous dataset is left untouched, for a
+    rollback. Returns the rows copied.
+    """
+    live, staging = quote(live_table()), quote(staging_table())
+    create_staging()
+    with connection.cursor() as cursor:
+        ids = hilbert_ids(cursor, batch_size)
+        for start in range(0, len(ids), batch_size):
+            cursor.execute(
+                f"INSERT INTO {staging} SELECT coverage.* "
+                "FROM unnest(%s::bigint[]) WITH ORDINALITY AS sorted(id, n) "
+                f"JOIN {live} AS coverage USING (id) ORDER BY sorted.n",
+                [ids[start : start + batch_size].tolist()],
+            )
+        # Rows keep their ids, the identity of the copy starts after them
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"GREATEST((SELECT max(id) FROM {staging}), 1))",
+            [staging_table()],
+        )
+    index_staging()
+    swap(staging_table())
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {staging}")
+    return len(ids)
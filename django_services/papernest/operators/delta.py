@@ -0,0 +1,198 @@
+from typing import Iterator, NamedTuple, Tuple
+
+import numpy as np
+from django.db import connection, transaction
+
+from .loaders import coverage_chunks, get_coverage_loader, operator_ids
+from .models import CoverageDataset, coverage_model
+from .scripts.columnar import pack_flags, unpack_flags
+from .scripts.utils import LAMBERT93_BOUNDS, hilbert_order
+
+# A coverage is identified by its operator and Lambert-93 coordinates in
+# meters, packed in one integer: operator id, then x and y from the corner
+# of the Lambert-93 bounds
+COORD_BITS = 21
+COORD_MASK = (1 << COORD_BITS) - 1
+
+
+class CoverageDelta(NamedTuple):
+    # Raw rows to insert: operator, x, y, 2G, 3G, 4G
+    inserts: np.ndarray
+    # Ids of the rows to delete
+    deletes: np.ndarray
+    # Ids of the rows whose flags changed, and their new 2G/3G/4G bitmask
+    updates: np.ndarray
+    flags: np.ndarray
+
+    def __str__(self) -> str:
+        return (
+            f"{len(self.inserts)} inserts, {len(self.deletes)} deletes, "
+            f"{len(self.updates)} updates"
+        )
+
+
+def coverage_keys(
+    operators: np.ndarray, x: np.ndarray, y: np.ndarray
+) -> np.ndarray:
+    min_x, min_y, _, _ = LAMBERT93_BOUNDS
+    x = np.rint(x).astype(np.int64) - min_x
+    y = np.rint(y).astype(np.int64) - min_y
+    return (
+        (operators.astype(np.int64) << (2 * COORD_BITS))
+        | (x << COORD_BITS)
+        | y
+    )
+
+
+def key_rows(keys: np.ndarray, flags: np.ndarray) -> np.ndarray:
+    """Raw rows of packed keys and flags."""
+    min_x, min_y, _, _ = LAMBERT93_BOUNDS
+    return np.column_stack(
+        [
+            keys >> (2 * COORD_BITS),
+            ((keys >> COORD_BITS) & COORD_MASK) + min_x,
+            (keys & COORD_MASK) + min_y,
+            unpack_flags(flags),
+        ]
+    ).astype(np.int64)
+
+
+def occurrences(keys: np.ndarray) -> np.ndarray:
+    """Rank of every key among the equal ones before it, keys sorted."""
+    positions = np.arange(len(keys))
+    starts = np.ones(len(keys), dtype=bool)
+    starts[1:] = keys[1:] != keys[:-1]
+    return positions - np.maximum.accumulate(np.where(starts, positions, 0))
+
+
+def read_incoming(path: str, batch_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keys and flags of the raw file rows of known operators, sorted by key
+    in file order.
+    """
+    known = operator_ids()
+    keys, flags = list(), list()
+    for chunk in coverage_chunks(path, batch_size):
+        chunk = chunk[np.isin(chunk[:, 0], known)]
+        keys.append(coverage_keys(chunk[:, 0], chunk[:, 1], chunk[:, 2]))
+        flags.append(pack_flags(chunk[:, 3:]))
+    all_keys = np.concatenate([np.empty(0, dtype=np.int64), *keys])
+    all_flags = np.concatenate([np.empty(0, dtype=np.uint8), *flags])
+    order = np.argsort(all_keys, kind="stable")
+    return all_keys[order], all_flags[order]
+
+
+def live_batches(batch_size: int) -> Iterator[np.ndarray]:
+    """Id, operator, Lambert-93 x and y and flags bitmask of the live rows."""
+    model = coverage_model()
+    table = connection.ops.quote_name(model._meta.db_table)
+    operator = model._meta.get_field(model.OPERATOR_FIELD).column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id, {operator}, ST_X(geom), ST_Y(geom), "
+            f"{model.flags_sql()} FROM {table}"
+        )
+        while rows := cursor.fetchmany(batch_size):
+            yield np.array(rows, dtype=np.float64).reshape(-1, 5)
+
+
+def read_live(
+    batch_size: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Ids, keys and flags of the live table, sorted by key and id."""
+    ids, keys, flags = list(), list(), list()
+    for rows in live_batches(batch_size):
+        ids.append(rows[:, 0].astype(np.int64))
+        keys.append(coverage_keys(rows[:, 1], rows[:, 2], rows[:, 3]))
+        flags.append(rows[:, 4].astype(np.uint8))
+    all_ids = np.concatenate([np.empty(0, dtype=np.int64), *ids])
+    all_keys = np.concatenate([np.empty(0, dtype=np.int64), *keys])
+    all_flags = np.concatenate([np.empty(0, dtype=np.uint8), *flags])
+    order = np.lexsort((all_ids, all_keys))
+    return all_ids[order], all_keys[order], all_flags[order]
+
+
+def diff(
+    ids: np.ndarray,
+    keys: np.ndarray,
+    flags: np.ndarray,
+    new_keys: np.ndarray,
+    new_flags: np.ndarray,
+) -> CoverageDelta:
+    """
+    Changes turning the live rows into the new ones, both sorted by key.
+    Rows sharing a key are paired in order, so duplicated points in a
+    release are kept as many times as they appear.
+    """
+    ranks = occurrences(keys)
+    left = np.searchsorted(new_keys, keys, "left")
+    right = np.searchsorted(new_keys, keys, "right")
+    matched = ranks < right - left
+    positions = (left + ranks)[matched]
+
+    changed = new_flags[positions] != flags[matched]
+    new = np.ones(len(new_keys), dtype=bool)
+    new[positions] = False
+    return CoverageDelta(
+        inserts=key_rows(new_keys[new], new_flags[new]),
+        deletes=ids[~matched],
+        updates=ids[matched][changed],
+        flags=new_flags[positions][changed],
+    )
+
+
+def diff_coverage(path: str, batch_size: int) -> CoverageDelta:
+    """Changes turning the live table into the raw file."""
+    new_keys, new_flags = read_incoming(path, batch_size)
+    return diff(*read_live(batch_size), new_keys, new_flags)
+
+
+def batches(values: np.ndarray, size: int) -> Iterator[list]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size].tolist()
+
+
+def apply_delta(delta: CoverageDelta, batch_size: int) -> None:
+    """
+    Applies the changes in batches, keeping the indexes of the table so
+    their maintenance is proportional to the changes.
+    """
+    max_params = connection.features.max_query_params
+    if max_params is not None:
+        batch_size = min(batch_size, max_params)
+
+    model = coverage_model()
+    with transaction.atomic():
+        for ids in batches(delta.deletes, batch_size):
+            model.objects.filter(id__in=ids).delete()
+        for value in np.unique(delta.flags).tolist():
+            for ids in batches(
+                delta.updates[delta.flags == value], batch_size
+            ):
+                model.objects.filter(id__in=ids).update(
+                    **model.flag_values(value)
+                )
+        inserts = delta.inserts[hilbert_order(delta.inserts)]
+        with get_coverage_loader(drop_indexes=False) as loader:
+            for start in range(0, len(inserts), batch_size):
+                loader.write(inserts[start : start + batch_size])
+
+
+def publish_delta(
+    path: str, dataset: CoverageDataset, batch_size: int
+) -> CoverageDelta:
+    """
+    Updates the Coverage table in place to the raw file and records it as
+    the active dataset. The previous dataset, if any, stays the one a
+    rollback restores.
+    """
+    delta = diff_coverage(path, batch_size)
+    with transaction.atomic():
+        apply_delta(delta, batch_size)
+        CoverageDataset.objects.filter(status=CoverageDataset.ACTIVE).update(
+            status=CoverageDataset.RETIRED
+        )
+        dataset.rows = coverage_model().objects.count()
+        dataset.status = CoverageDataset.ACTIVE
+        dataset.save()
+    return delta
@@ -0,0 +1,28 @@
+from typing import Tuple
+
+from django import forms
+
+from .models import Coverage
+
+
+class RadiusForm(forms.Form):
+    radius = forms.FloatField(
+        required=False, min_value=1, max_value=Coverage.MAX_RADIUS_METERS
+    )
+
+    def errors_text(self) -> str:
+        return "; ".join(
+            f"{field}: {' '.join(errors)}"
+            for field, errors in self.errors.items()
+        )
+
+    def cleaned_radius(self) -> float:
+        return self.cleaned_data.get("radius") or Coverage.MAX_DIST_METERS
+
+
+class CoordinatesForm(RadiusForm):
+    lat = forms.FloatField(min_value=-90, max_value=90)
+    lon = forms.FloatField(min_value=-180, max_value=180)
+
+    def cleaned_coordinates(self) -> Tuple[float, float]:
+        return self.cleaned_data["lat"], self.cleaned_data["lon"]
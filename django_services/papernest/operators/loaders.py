@@ -0,0 +1,365 @@
+import io
+from functools import partial
+from types import TracebackType
+from typing import Any, Iterator, Optional, Protocol, Tuple, Type
+
+import numpy as np
+from django.contrib.gis.geos import Point
+from django.db import connection
+
+from .datasets import indexes
+from .models import (
+    BaseCoverage,
+    CompactCoverage,
+    Coverage,
+    Operator,
+    coverage_model,
+)
+from .scripts.columnar import ColumnarCoverage, is_columnar, pack_flags
+from .scripts.utils import (
+    INIT_COLUMNS,
+    CoordTransformer,
+    hilbert_order,
+    is_compressed,
+    map_init_ranges,
+    map_ordered,
+    read_init_chunks,
+    read_init_range,
+)
+
+# Little endian EWKB point with a SRID
+EWKB_POINT = np.dtype(
+    [
+        ("order", "u1"),
+        ("type", "<u4"),
+        ("srid", "<u4"),
+        ("x", "<f8"),
+        ("y", "<f8"),
+    ]
+)
+EWKB_POINT_SRID = 0x20000001
+
+
+def ewkb_points(x: np.ndarray, y: np.ndarray, srid: int) -> list[str]:
+    """Hex EWKB of the points, as the geometry input of PostGIS reads it."""
+    points = np.empty(len(x), dtype=EWKB_POINT)
+    points["order"] = 1
+    points["type"] = EWKB_POINT_SRID
+    points["srid"] = srid
+    points["x"] = x
+    points["y"] = y
+    hexed = points.tobytes().hex()
+    size = 2 * EWKB_POINT.itemsize
+    return [hexed[i : i + size] for i in range(0, len(hexed), size)]
+
+
+class CoverageLoader(Protocol):
+    rows: int
+
+    def __enter__(self) -> "CoverageLoader":
+        ...
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        ...
+
+    @staticmethod
+    def encode(chunk: np.ndarray) -> Any:
+        """
+        Prepares rows of operator id, Lambert-93 x and y, 2G, 3G and 4G for
+        write_encoded. Doesn't touch the database, so it can run in other
+        processes.
+        """
+        ...
+
+    def write_encoded(self, encoded: Any) -> None:
+        ...
+
+    def write(self, chunk: np.ndarray) -> None:
+        ...
+
+
+class ORMCoverageLoader:
+    """Inserts batches with bulk_create, for any database backend."""
+
+    def __init__(self) -> None:
+        self.rows = 0
+
+    def __enter__(self) -> "ORMCoverageLoader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        pass
+
+    @staticmethod
+    def encode(
+        chunk: np.ndarray,
+    ) -> Tuple[list[list[int]], list[float], list[float]]:
+        lat, long = CoordTransformer().transform_many(chunk[:, 1], chunk[:, 2])
+        return chunk.tolist(), lat.tolist(), long.tolist()
+
+    def write_encoded(
+        self, encoded: Tuple[list[list[int]], list[float], list[float]]
+    ) -> None:
+        rows, lats, longs = encoded
+        Coverage.objects.bulk_create(
+            [
+                Coverage(
+                    operator_id_id=operator_id,
+                    location=Point(lng, lat, srid=Coverage.SRID_WGS84),
+                    geom=Point(x, y, srid=Coverage.SRID_LAMBERT93),
+                    g2=g2 == 1,
+                    g3=g3 == 1,
+                    g4=g4 == 1,
+                )
+                for (operator_id, x, y, g2, g3, g4), lat, lng in zip(
+                    rows, lats, longs
+                )
+            ]
+        )
+        self.rows += len(rows)
+
+    def write(self, chunk: np.ndarray) -> None:
+        self.write_encoded(self.encode(chunk))
+
+
+class ORMCompactCoverageLoader(ORMCoverageLoader):
+    """Inserts batches of CompactCoverage rows with bulk_create."""
+
+    @staticmethod
+    def encode(  # type: ignore[override]
+        chunk: np.ndarray,
+    ) -> list[list[int]]:
+        return np.column_stack(
+            [compact_operators(chunk), chunk[:, 1:3], pack_flags(chunk[:, 3:])]
+        ).tolist()
+
+    def write_encoded(  # type: ignore[override]
+        self, encoded: list[list[int]]
+    ) -> None:
+        CompactCoverage.objects.bulk_create(
+            [
+                CompactCoverage(
+                    operator=operator,
+                    geom=Point(x, y, srid=CompactCoverage.SRID_LAMBERT93),
+                    flags=flags,
+                )
+                for operator, x, y, flags in encoded
+            ]
+        )
+        self.rows += len(encoded)
+
+
+class CopyCoverageLoader:
+    """
+    Streams batches to PostgreSQL with COPY FROM STDIN, geometries encoded
+    as hex EWKB. The secondary indexes of the table are dropped while
+    loading, rebuilt once at the end and the table analyzed, unless
+    drop_indexes is False.
+    """
+
+    MODEL: type[BaseCoverage] = Coverage
+    COLUMNS = ["operator_id_id", "location", "geom", "g2", "g3", "g4"]
+
+    def __init__(
+        self, table: Optional[str] = None, drop_indexes: bool = True
+    ) -> None:
+        self.rows = 0
+        self.table = table or self.MODEL._meta.db_table
+        self.drop_indexes = drop_indexes
+        self.indexes: list[Tuple[str, str]] = list()
+
+    def __enter__(self) -> "CopyCoverageLoader":
+        if not self.drop_indexes:
+            return self
+        with connection.cursor() as cursor:
+            self.indexes = indexes(cursor, self.table)
+            for name, _ in self.indexes:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is not None or not self.drop_indexes:
+            return
+        with connection.cursor() as cursor:
+            for _, definition in self.indexes:
+                cursor.execute(definition)
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(self.table)}")
+
+    @staticmethod
+    def encode(chunk: np.ndarray) -> Tuple[str, int]:
+        """COPY text payload of the rows, and their number."""
+        lat, long = CoordTransformer().transform_many(chunk[:, 1], chunk[:, 2])
+        locations = ewkb_points(long, lat, Coverage.SRID_WGS84)
+        geoms = ewkb_points(chunk[:, 1], chunk[:, 2], Coverage.SRID_LAMBERT93)
+        flags = np.where(chunk[:, 3:] == 1, "t", "f").tolist()
+
+        data = io.StringIO()
+        for operator_id, location, geom, (g2, g3, g4) in zip(
+            chunk[:, 0].tolist(), locations, geoms, flags
+        ):
+            data.write(
+                f"{operator_id}\t{location}\t{geom}\t{g2}\t{g3}\t{g4}\n"
+            )
+        return data.getvalue(), len(chunk)
+
+    def write_encoded(self, encoded: Tuple[str, int]) -> None:
+        payload, rows = encoded
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {connection.ops.quote_name(self.table)} "
+                f"({', '.join(self.COLUMNS)}) FROM STDIN",
+                io.StringIO(payload),
+            )
+        self.rows += rows
+
+    def write(self, chunk: np.ndarray) -> None:
+        self.write_encoded(self.encode(chunk))
+
+
+class CompactCopyCoverageLoader(CopyCoverageLoader):
+    """CopyCoverageLoader of the CompactCoverage table."""
+
+    MODEL = CompactCoverage
+    COLUMNS = ["operator", "geom", "flags"]
+
+    @staticmethod
+    def encode(chunk: np.ndarray) -> Tuple[str, int]:
+        geoms = ewkb_points(
+            chunk[:, 1], chunk[:, 2], CompactCoverage.SRID_LAMBERT93
+        )
+        data = io.StringIO()
+        for operator, geom, flags in zip(
+            compact_operators(chunk).tolist(),
+            geoms,
+            pack_flags(chunk[:, 3:]).tolist(),
+        ):
+            data.write(f"{operator}\t{geom}\t{flags}\n")
+        return data.getvalue(), len(chunk)
+
+
+def compact_operators(chunk: np.ndarray) -> np.ndarray:
+    operators = chunk[:, 0]
+    if len(operators) and operators.max() > np.iinfo(np.int16).max:
+        raise ValueError("Operator ids don't fit the compact layout")
+    return operators
+
+
+def get_coverage_loader(
+    table: Optional[str] = None, drop_indexes: bool = True
+) -> CoverageLoader:
+    """
+    Loader of the coverage table of the layout, or of a table shaped like
+    it on PostgreSQL.
+    """
+    compact = coverage_model() is CompactCoverage
+    if connection.vendor == "postgresql":
+        if compact:
+            return CompactCopyCoverageLoader(table, drop_indexes)
+        return CopyCoverageLoader(table, drop_indexes)
+    if table is not None:
+        raise ValueError("Only the Coverage table can be loaded with the ORM")
+    return ORMCompactCoverageLoader() if compact else ORMCoverageLoader()
+
+
+def load_coverage(
+    path: str,
+    batch_size: int,
+    workers: int = 1,
+    table: Optional[str] = None,
+    cluster: bool = False,
+) -> int:
+    """
+    Loads the raw or processed file into the Coverage table, or the given
+    table, one batch at a time, streamed in file order with flat memory.
+    Clustered, the whole file is read and sorted along a Hilbert curve
+    first, so points close on the ground share heap pages. With
+    several workers, line ranges of a raw file are parsed, and batches
+    reprojected and encoded, by a pool of processes while this one writes
+    them in order. Returns the rows loaded.
+    """
+    known = operator_ids()
+    with get_coverage_loader(table) as loader:
+        if cluster:
+            rows = read_coverage(path, batch_size, workers, known)
+            rows = rows[hilbert_order(rows)]
+            batches = [
+                (rows[start : start + batch_size],)
+                for start in range(0, len(rows), batch_size)
+            ]
+            if workers > 1:
+                for encoded in map_ordered(loader.encode, batches, workers):
+                    loader.write_encoded(encoded)
+            else:
+                for (batch,) in batches:
+                    loader.write(batch)
+        elif parallel_parsing(path, workers):
+            encode = partial(encode_range, type(loader), known)
+            for encoded in map_init_ranges(encode, path, workers):
+                loader.write_encoded(encoded)
+        else:
+            for chunk in coverage_chunks(path, batch_size):
+                loader.write(chunk[np.isin(chunk[:, 0], known)])
+    return loader.rows
+
+
+def read_coverage(
+    path: str, batch_size: int, workers: int, known: np.ndarray
+) -> np.ndarray:
+    """
+    Rows of the known operators in the file, in one array of int32, small
+    enough to be sorted in memory. Raw files are parsed in parallel with
+    several workers.
+    """
+    if parallel_parsing(path, workers):
+        chunks = map_init_ranges(read_init_range, path, workers)
+    else:
+        chunks = coverage_chunks(path, batch_size)
+    return np.concatenate(
+        [np.empty((0, INIT_COLUMNS), dtype=np.int32)]
+        + [
+            chunk[np.isin(chunk[:, 0], known)].astype(np.int32)
+            for chunk in chunks
+        ]
+    )
+
+
+def parallel_parsing(path: str, workers: int) -> bool:
+    """Whether the file can be split in line ranges for the workers."""
+    return workers > 1 and not is_compressed(path) and not is_columnar(path)
+
+
+def coverage_chunks(path: str, batch_size: int) -> Iterator[np.ndarray]:
+    """Rows of a raw or processed coverage file, by batches."""
+    if is_columnar(path):
+        return ColumnarCoverage(path).chunks(batch_size)
+    return read_init_chunks(path, batch_size)
+
+
+def operator_ids() -> np.ndarray:
+    """Ids of the operators, to drop rows of unknown ones before loading."""
+    return np.array(Operator.objects.values_list("id", flat=True))
+
+
+def encode_range(
+    loader: Type[CoverageLoader],
+    known: np.ndarray,
+    path: str,
+    start: int,
+    end: int,
+) -> Any:
+    """
+    Parses, validates and encodes a line range of the raw file for the
+    loader, in a worker process.
+    """
+    chunk = read_init_range(path, start, end)
+    return loader.encode(chunk[np.isin(chunk[:, 0], known)])
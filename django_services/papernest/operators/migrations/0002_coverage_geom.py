@@ -0,0 +1,45 @@
+import django.contrib.gis.db.models.fields
+from django.apps.registry import Apps
+from django.contrib.gis.db.models.functions import Transform
+from django.db import migrations
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def backfill_geom(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    Coverage = apps.get_model("operators", "Coverage")
+    Coverage.objects.using(schema_editor.connection.alias).update(
+        geom=Transform("location", 2154)
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operators", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="coverage",
+            name="operators_c_locatio_facbdb_idx",
+        ),
+        migrations.AlterField(
+            model_name="coverage",
+            name="location",
+            field=django.contrib.gis.db.models.fields.PointField(
+                spatial_index=False, srid=4326
+            ),
+        ),
+        migrations.AddField(
+            model_name="coverage",
+            name="geom",
+            field=django.contrib.gis.db.models.fields.PointField(
+                null=True, srid=2154
+            ),
+        ),
+        migrations.RunPython(backfill_geom, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="coverage",
+            name="geom",
+            field=django.contrib.gis.db.models.fields.PointField(srid=2154),
+        ),
+    ]
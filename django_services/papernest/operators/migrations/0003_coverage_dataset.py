@@ -0,0 +1,42 @@
+# Generated by Django 5.0.2 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operators", "0002_coverage_geom"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CoverageDataset",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.CharField(max_length=64)),
+                ("checksum", models.CharField(max_length=64)),
+                ("rows", models.PositiveBigIntegerField(default=0)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("active", "Active"),
+                            ("previous", "Previous"),
+                            ("retired", "Retired"),
+                        ],
+                        default="active",
+                        max_length=16,
+                    ),
+                ),
+                ("loaded_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
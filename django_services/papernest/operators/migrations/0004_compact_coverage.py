@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-18 17:50
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operators", "0003_coverage_dataset"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CompactCoverage",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("operator", models.SmallIntegerField()),
+                (
+                    "geom",
+                    django.contrib.gis.db.models.fields.PointField(srid=2154),
+                ),
+                ("flags", models.SmallIntegerField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["operator"],
+                        name="operators_c_operato_80276e_idx",
+                    )
+                ],
+            },
+        ),
+    ]
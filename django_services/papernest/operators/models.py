@@ -1,20 +1,31 @@
-from typing import Tuple
+from typing import Any, Optional, Tuple
+from django.conf import settings
+from django.db import connection
 from django.db.models import (
     Model,
+    AutoField,
+    SmallIntegerField,
     IntegerField,
     BooleanField,
     CASCADE,
     ForeignKey,
     CharField,
+    DateTimeField,
+    PositiveBigIntegerField,
     Index,
     OuterRef,
     Subquery,
+    Func,
+    F,
 )
 
-from django.db.models.query import QuerySet
 from django.contrib.gis.db import models as gis_models
 from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance, Transform
+from django.contrib.gis.db.models.functions import (
+    Distance,
+    GeometryDistance,
+)
+from django.contrib.gis.measure import D
 
 
 class Operator(Model):
@@ -25,51 +36,279 @@ class Operator(Model):
         return self.name
 
 
-class Coverage(Model):
+class BaseCoverage(Model):
+    """
+    Lookups shared by the coverage layouts. Rows of every layout expose
+    operator_id, geom, location and the g2, g3 and g4 flags.
+    """
+
     SRID_WGS84 = 4326
     SRID_WEB_MERCATOR = 3857
+    SRID_LAMBERT93 = 2154
     MAX_DIST_METERS = 200
+    MAX_RADIUS_METERS = 1000
 
-    operator_id = ForeignKey(Operator, on_delete=CASCADE)
-    location = gis_models.PointField(srid=SRID_WGS84)
-    g2 = BooleanField()
-    g3 = BooleanField()
-    g4 = BooleanField()
+    # Field holding the id of the operator
+    OPERATOR_FIELD: str
+    # Field holding the 2G/3G/4G bitmask, None for one boolean per network
+    FLAGS_FIELD: Optional[str]
 
-    def __str__(self) -> str:
-        return f"{self.operator_id}, ({self.location.y}, {self.location.x}), {self.g2}, {self.g3}, {self.g4}"
+    # Set on the rows returned by get_closest_coverage
+    operator_name: str
+    point_index: int
+
+    @classmethod
+    def lambert93(cls, location: Point) -> Point:
+        return location.transform(cls.SRID_LAMBERT93, clone=True)
+
+    @staticmethod
+    def distance_to(location: Point) -> Func:
+        # PostGIS can answer <-> ordering from the GiST index
+        if connection.ops.postgis:
+            return GeometryDistance("geom", location)
+        return Distance("geom", location)
 
     @classmethod
-    def get_closest_coverage(cls, coordinates: Tuple) -> QuerySet["Coverage"]:
-        user_location = Point(
-            coordinates[1], coordinates[0], srid=cls.SRID_WGS84
+    def flags_sql(cls) -> str:
+        """SQL of the 2G/3G/4G bitmask of a row."""
+        if cls.FLAGS_FIELD is not None:
+            return cls.FLAGS_FIELD
+        return (
+            "CAST(g2 AS INTEGER) + 2 * CAST(g3 AS INTEGER) "
+            "+ 4 * CAST(g4 AS INTEGER)"
+        )
+
+    @classmethod
+    def flag_values(cls, flags: int) -> dict[str, Any]:
+        """Field values of a 2G/3G/4G bitmask, for updates."""
+        if cls.FLAGS_FIELD is not None:
+            return {cls.FLAGS_FIELD: flags}
+        return {
+            "g2": bool(flags & 1),
+            "g3": bool(flags & 2),
+            "g4": bool(flags & 4),
+        }
+
+    @classmethod
+    def operator_name_expression(cls) -> Any:
+        return Subquery(
+            Operator.objects.filter(id=OuterRef(cls.OPERATOR_FIELD)).values(
+                "name"
+            )[:1]
+        )
+
+    @classmethod
+    def get_closest_coverage(
+        cls, coordinates: Tuple, max_dist: float = MAX_DIST_METERS
+    ) -> list["BaseCoverage"]:
+        """
+        Closest coverage per operator, at most max_dist meters away from the
+        (lat, lng) coordinates. Every row carries an operator_name attribute.
+        """
+        if connection.ops.postgis:
+            return cls.get_closest_coverage_batch([coordinates], [max_dist])[0]
+
+        user_location = cls.lambert93(
+            Point(coordinates[1], coordinates[0], srid=cls.SRID_WGS84)
         )
-        user_location.transform(cls.SRID_WEB_MERCATOR)
         closest_rows = (
-            Coverage.objects.annotate(
-                transformed_location=Transform(
-                    "location", cls.SRID_WEB_MERCATOR
-                )
-            )
-            .annotate(distance=Distance("transformed_location", user_location))
-            .filter(distance__lt=cls.MAX_DIST_METERS)
+            cls.objects.filter(geom__dwithin=(user_location, D(m=max_dist)))
+            .annotate(distance=cls.distance_to(user_location))
             .order_by("distance")
         )
 
         min_distance_subquery = (
-            closest_rows.filter(operator_id=OuterRef("operator_id"))
+            closest_rows.filter(
+                **{cls.OPERATOR_FIELD: OuterRef(cls.OPERATOR_FIELD)}
+            )
             .order_by("distance")
             .values("distance")[:1]
         )
 
-        closest_rows = closest_rows.filter(
-            distance=Subquery(min_distance_subquery)
-        ).order_by("operator_id", "distance")
+        closest_rows = (
+            closest_rows.filter(distance=Subquery(min_distance_subquery))
+            .annotate(operator_name=cls.operator_name_expression())
+            .order_by(cls.OPERATOR_FIELD, "distance")
+        )
+
+        return list(closest_rows)
+
+    @classmethod
+    def get_closest_coverage_batch(
+        cls,
+        coordinates: list[Tuple],
+        max_dists: Optional[list[float]] = None,
+    ) -> list[list["BaseCoverage"]]:
+        """
+        get_closest_coverage for many (lat, lng) coordinates, each one with
+        its own max distance. On PostGIS all of them are resolved in one
+        statement, one index-bounded KNN probe per point and operator.
+        Results keep the order of the coordinates.
+        """
+        if max_dists is None:
+            max_dists = [cls.MAX_DIST_METERS] * len(coordinates)
+        if not connection.ops.postgis:
+            return [
+                cls.get_closest_coverage(point, max_dist)
+                for point, max_dist in zip(coordinates, max_dists)
+            ]
+
+        operator = cls._meta.get_field(cls.OPERATOR_FIELD).column
+        query = f"""
+            SELECT cvg.*, op.name AS operator_name, pts.idx AS point_index
+            FROM unnest(
+                %(lngs)s::float8[], %(lats)s::float8[], %(max_dists)s::float8[]
+            ) WITH ORDINALITY AS pts(lng, lat, max_dist, idx)
+            CROSS JOIN LATERAL (
+                SELECT ST_Transform(
+                    ST_SetSRID(ST_MakePoint(pts.lng, pts.lat), %(srid_in)s),
+                    %(srid)s
+                ) AS geom
+            ) user_location
+            CROSS JOIN {Operator._meta.db_table} op
+            CROSS JOIN LATERAL (
+                SELECT *
+                FROM {cls._meta.db_table} c
+                WHERE c.{operator} = op.id
+                AND ST_DWithin(c.geom, user_location.geom, pts.max_dist)
+                ORDER BY c.geom <-> user_location.geom
+                LIMIT 1
+            ) cvg
+            ORDER BY pts.idx, op.id
+        """
+        params = {
+            "lngs": [float(point[1]) for point in coordinates],
+            "lats": [float(point[0]) for point in coordinates],
+            "max_dists": [float(max_dist) for max_dist in max_dists],
+            "srid_in": cls.SRID_WGS84,
+            "srid": cls.SRID_LAMBERT93,
+        }
+
+        closest_cvgs: list[list["BaseCoverage"]] = [[] for _ in coordinates]
+        for cvg in cls.objects.raw(query, params):
+            closest_cvgs[cvg.point_index - 1].append(cvg)
+        return closest_cvgs
+
+    class Meta:
+        abstract = True
+
+
+class Coverage(BaseCoverage):
+    OPERATOR_FIELD = "operator_id"
+    FLAGS_FIELD = None
+
+    operator_id = ForeignKey(Operator, on_delete=CASCADE)
+    location = gis_models.PointField(
+        srid=BaseCoverage.SRID_WGS84, spatial_index=False
+    )
+    # Lambert-93 projection of location, in meters. Spatial lookups run
+    # against this column so they can use its GiST index.
+    geom = gis_models.PointField(srid=BaseCoverage.SRID_LAMBERT93)
+    g2 = BooleanField()
+    g3 = BooleanField()
+    g4 = BooleanField()
+
+    def __str__(self) -> str:
+        return f"{self.operator_id}, ({self.location.y}, {self.location.x}), {self.g2}, {self.g3}, {self.g4}"
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        if self.geom is None and self.location is not None:
+            self.geom = Coverage.lambert93(self.location)
+        super().save(*args, **kwargs)
 
-        return closest_rows
+    @classmethod
+    def operator_name_expression(cls) -> Any:
+        return F("operator_id__name")
 
     class Meta:
         indexes = [
             Index(fields=["operator_id"]),
-            Index(fields=["location"]),
         ]
+
+
+class CompactCoverage(BaseCoverage):
+    """
+    Compact layout of the coverage rows: a smallint operator code without
+    foreign key, the Lambert-93 point only and one smallint bitmask of
+    2G/3G/4G. The key is a 4-byte serial, delta updates and reclustering
+    address rows by it.
+    """
+
+    OPERATOR_FIELD = "operator"
+    FLAGS_FIELD = "flags"
+    G2 = 1
+    G3 = 2
+    G4 = 4
+
+    id = AutoField(primary_key=True)
+    # Operator id, MCC-MNC codes of French operators fit in a smallint
+    operator = SmallIntegerField()
+    geom = gis_models.PointField(srid=BaseCoverage.SRID_LAMBERT93)
+    flags = SmallIntegerField()
+
+    def __str__(self) -> str:
+        return f"{self.operator}, ({self.geom.x}, {self.geom.y}), {self.g2}, {self.g3}, {self.g4}"
+
+    @property
+    def operator_id_id(self) -> int:
+        return self.operator
+
+    @property
+    def location(self) -> Point:
+        return self.geom.transform(self.SRID_WGS84, clone=True)
+
+    @property
+    def g2(self) -> bool:
+        return bool(self.flags & self.G2)
+
+    @property
+    def g3(self) -> bool:
+        return bool(self.flags & self.G3)
+
+    @property
+    def g4(self) -> bool:
+        return bool(self.flags & self.G4)
+
+    class Meta:
+        indexes = [
+            Index(fields=["operator"]),
+        ]
+
+
+COVERAGE_LAYOUTS: dict[str, type[BaseCoverage]] = {
+    "wide": Coverage,
+    "compact": CompactCoverage,
+}
+
+
+def coverage_model() -> type[BaseCoverage]:
+    """Model of the coverage rows, per the COVERAGE_LAYOUT setting."""
+    return COVERAGE_LAYOUTS[settings.COVERAGE_LAYOUT]
+
+
+class CoverageDataset(Model):
+    """Release of the coverage data loaded in the Coverage table."""
+
+    ACTIVE = "active"
+    # Kept in the previous table, for a rollback
+    PREVIOUS = "previous"
+    RETIRED = "retired"
+    STATUSES = [
+        (ACTIVE, "Active"),
+        (PREVIOUS, "Previous"),
+        (RETIRED, "Retired"),
+    ]
+
+    version = CharField(max_length=64)
+    # sha256 of the source file
+    checksum = CharField(max_length=64)
+    rows = PositiveBigIntegerField(default=0)
+    status = CharField(max_length=16, choices=STATUSES, default=ACTIVE)
+    loaded_at = DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.version} ({self.status})"
+
+    @classmethod
+    def active(cls) -> Optional["CoverageDataset"]:
+        return cls.objects.filter(status=cls.ACTIVE).last()
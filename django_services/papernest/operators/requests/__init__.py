@@ -1 +1,7 @@
-from .geolocation import get_coordinates
+from .geolocation import (
+    aget_coordinates,
+    get_coordinates,
+    get_coordinates_batch,
+    AddressNotFound,
+    GeocoderError,
+)
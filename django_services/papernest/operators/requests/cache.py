@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Cached for queries the API has no result for
+NOT_FOUND: Tuple = ()
+
+
+def normalize_query(query: str) -> str:
+    """Folds accents, case and whitespace, so equivalent queries share keys."""
+    decomposed = unicodedata.normalize("NFKD", query)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+class GeocodingCache:
+    """
+    Two tier cache of geocoded coordinates: a bounded LRU dict local to the
+    process, in front of a Django cache shared by every worker and task.
+    """
+
+    def __init__(
+        self,
+        alias: str,
+        local_maxsize: int,
+        ttl: int,
+        negative_ttl: int,
+    ) -> None:
+        self.alias = alias
+        self.local_maxsize = local_maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local: OrderedDict[str, Tuple[float, Tuple]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats: Counter = Counter()
+
+    @staticmethod
+    def shared_key(key: str) -> str:
+        return f"geocoding:{hashlib.sha1(key.encode()).hexdigest()}"
+
+    @classmethod
+    def lock_key(cls, key: str) -> str:
+        return f"{cls.shared_key(key)}:lock"
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[Tuple]:
+        """
+        Returns the cached coordinates, NOT_FOUND for negative entries or
+        None on a miss.
+        """
+        coordinates = self._get_local(key)
+        if coordinates is not None:
+            return coordinates
+        return self._promote(
+            key, caches[self.alias].get(self.shared_key(key)), count_miss
+        )
+
+    async def aget(self, key: str, count_miss: bool = True) -> Optional[Tuple]:
+        coordinates = self._get_local(key)
+        if coordinates is not None:
+            return coordinates
+        return self._promote(
+            key,
+            await caches[self.alias].aget(self.shared_key(key)),
+            count_miss,
+        )
+
+    def set(self, key: str, coordinates: Tuple) -> None:
+        ttl = self.ttl if coordinates else self.negative_ttl
+        caches[self.alias].set(self.shared_key(key), coordinates, ttl)
+        self._set_local(key, coordinates)
+
+    async def aset(self, key: str, coordinates: Tuple) -> None:
+        ttl = self.ttl if coordinates else self.negative_ttl
+        await caches[self.alias].aset(self.shared_key(key), coordinates, ttl)
+        self._set_local(key, coordinates)
+
+    def acquire(self, key: str, timeout: float) -> bool:
+        """
+        Takes the lock of the key in the shared cache, held until release or
+        for timeout seconds at most.
+        """
+        return caches[self.alias].add(self.lock_key(key), 1, timeout)
+
+    async def aacquire(self, key: str, timeout: float) -> bool:
+        return await caches[self.alias].aadd(self.lock_key(key), 1, timeout)
+
+    def release(self, key: str) -> None:
+        caches[self.alias].delete(self.lock_key(key))
+
+    async def arelease(self, key: str) -> None:
+        await caches[self.alias].adelete(self.lock_key(key))
+
+    def poll(
+        self, key: str, timeout: float, interval: float
+    ) -> Optional[Tuple]:
+        """
+        Waits for the holder of the lock to cache the key. A poll that
+        times out counts as a single miss.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            coordinates = self.get(key, count_miss=False)
+            if coordinates is not None:
+                return coordinates
+            if time.monotonic() >= deadline:
+                self.stats["misses"] += 1
+                return None
+            time.sleep(interval)
+
+    async def apoll(
+        self, key: str, timeout: float, interval: float
+    ) -> Optional[Tuple]:
+        deadline = time.monotonic() + timeout
+        while True:
+            coordinates = await self.aget(key, count_miss=False)
+            if coordinates is not None:
+                return coordinates
+            if time.monotonic() >= deadline:
+                self.stats["misses"] += 1
+                return None
+            await asyncio.sleep(interval)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.local.clear()
+            self.stats.clear()
+
+    def _get_local(self, key: str) -> Optional[Tuple]:
+        with self.lock:
+            entry = self.local.get(key)
+            if entry is None:
+                return None
+            expires_at, coordinates = entry
+            if expires_at <= time.monotonic():
+                del self.local[key]
+                return None
+            self.local.move_to_end(key)
+            self.stats["local_hits"] += 1
+            return coordinates
+
+    def _promote(
+        self, key: str, coordinates: Optional[Tuple], count_miss: bool
+    ) -> Optional[Tuple]:
+        if coordinates is None:
+            if count_miss:
+                self.stats["misses"] += 1
+            return None
+        self.stats["shared_hits"] += 1
+        self._set_local(key, tuple(coordinates))
+        return tuple(coordinates)
+
+    def _set_local(self, key: str, coordinates: Tuple) -> None:
+        ttl = self.ttl if coordinates else self.negative_ttl
+        with self.lock:
+            self.local[key] = (time.monotonic() + ttl, coordinates)
+            self.local.move_to_end(key)
+            while len(self.local) > self.local_maxsize:
+                self.local.popitem(last=False)
+
+
+_geocoding_cache: Optional[GeocodingCache] = None
+
+
+def get_geocoding_cache() -> GeocodingCache:
+    global _geocoding_cache
+    if _geocoding_cache is None:
+        cfg = settings.GEOCODING_CACHE
+        _geocoding_cache = GeocodingCache(
+            alias=cfg["ALIAS"],
+            local_maxsize=cfg["LOCAL_MAXSIZE"],
+            ttl=cfg["TTL"],
+            negative_ttl=cfg["NEGATIVE_TTL"],
+        )
+    return _geocoding_cache
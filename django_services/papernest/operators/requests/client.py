@@ -0,0 +1,214 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryBudget:
+    """
+    Token bucket that caps retries to a ratio of the requests sent, so an
+    outage of the geocoder doesn't multiply the load sent to it.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class GeocoderClient:
+    """
+    HTTP client of the geocoding API. Keeps a pool of keep-alive
+    connections, bounds every call with connect/read timeouts and retries
+    transient errors with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: Tuple[float, float],
+        pool_size: int,
+        max_retries: int,
+        backoff: float,
+        backoff_max: float,
+        retry_budget: RetryBudget,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, path: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def request(
+        self, method: str, path: str, **kwargs: Any
+    ) -> requests.Response:
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(
+                    method,
+                    f"{self.base_url}{path}",
+                    timeout=self.timeout,
+                    **kwargs,
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                if not self._retry(attempt):
+                    response.raise_for_status()
+            except (requests.ConnectionError, requests.Timeout):
+                if not self._retry(attempt):
+                    raise
+            attempt += 1
+
+    def _retry(self, attempt: int) -> bool:
+        if attempt >= self.max_retries or not self.retry_budget.withdraw():
+            return False
+        delay = min(self.backoff_max, self.backoff * 2**attempt)
+        time.sleep(random.uniform(0, delay))
+        return True
+
+
+class AsyncGeocoderClient:
+    """
+    Asyncio counterpart of GeocoderClient, for the views served under ASGI.
+    Retries the same errors and draws from the same kind of budget.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: Tuple[float, float],
+        pool_size: int,
+        max_retries: int,
+        backoff: float,
+        backoff_max: float,
+        retry_budget: RetryBudget,
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget
+
+        connect_timeout, read_timeout = timeout
+        self.session = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+        )
+
+    async def get(self, path: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def request(
+        self, method: str, path: str, **kwargs: Any
+    ) -> httpx.Response:
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = await self.session.request(method, path, **kwargs)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                if not await self._retry(attempt):
+                    response.raise_for_status()
+            except httpx.TransportError:
+                if not await self._retry(attempt):
+                    raise
+            attempt += 1
+
+    async def _retry(self, attempt: int) -> bool:
+        if attempt >= self.max_retries or not self.retry_budget.withdraw():
+            return False
+        delay = min(self.backoff_max, self.backoff * 2**attempt)
+        await asyncio.sleep(random.uniform(0, delay))
+        return True
+
+
+def client_kwargs() -> dict[str, Any]:
+    cfg = settings.GEOCODER
+    return dict(
+        base_url=cfg["BASE_URL"],
+        timeout=(cfg["CONNECT_TIMEOUT"], cfg["READ_TIMEOUT"]),
+        pool_size=cfg["POOL_SIZE"],
+        max_retries=cfg["MAX_RETRIES"],
+        backoff=cfg["BACKOFF"],
+        backoff_max=cfg["BACKOFF_MAX"],
+        retry_budget=RetryBudget(
+            ratio=cfg["RETRY_BUDGET_RATIO"],
+            max_tokens=cfg["RETRY_BUDGET_MAX_TOKENS"],
+        ),
+    )
+
+
+_client: Optional[Tuple[int, GeocoderClient]] = None
+_async_client: Optional[
+    Tuple[asyncio.AbstractEventLoop, AsyncGeocoderClient]
+] = None
+
+
+def get_geocoder_client() -> GeocoderClient:
+    """
+    Client of the current process. Connections are never shared with a
+    parent process, so it is safe to use after gunicorn forks its workers.
+    """
+    global _client
+    if _client is None or _client[0] != os.getpid():
+        _client = (os.getpid(), GeocoderClient(**client_kwargs()))
+    return _client[1]
+
+
+def get_async_geocoder_client() -> AsyncGeocoderClient:
+    """
+    Client of the running event loop, httpx connections can't be awaited
+    from another loop.
+    """
+    global _async_client
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client[0] is not loop:
+        _async_client = (loop, AsyncGeocoderClient(**client_kwargs()))
+    return _async_client[1]
+
+
+def reset_geocoder_client() -> None:
+    global _client, _async_client
+    if _client is not None:
+        _client[1].session.close()
+    _client = None
+    _async_client = None
@@ -1,10 +1,208 @@
-from typing import Tuple
+import csv
+import io
+from typing import Optional, Tuple
+
 import requests
+from django.conf import settings
+
+from ..singleflight import AsyncSingleFlight, SingleFlight
+from .cache import NOT_FOUND, get_geocoding_cache, normalize_query
+from .client import get_async_geocoder_client, get_geocoder_client
+from .local_geocoder import get_local_geocoder
+
+
+# Concurrent misses of the same key share one call to the API
+geocode_flight = SingleFlight()
+ageocode_flight = AsyncSingleFlight()
+
+
+class AddressNotFound(Exception):
+    pass
+
+
+class GeocoderError(Exception):
+    """The API answered with a body it doesn't document."""
 
 
 def get_coordinates(query: str, limit: int = 1) -> Tuple:
+    coordinates = geocode_locally(query)
+    if coordinates is not None:
+        return coordinates
+
+    cache = get_geocoding_cache()
+    key = normalize_query(query)
+
+    coordinates = cache.get(key)
+    if coordinates is None:
+        coordinates = geocode_flight.do(
+            key, load_coordinates, query, key, limit
+        )
+
+    if coordinates == NOT_FOUND:
+        raise AddressNotFound(query)
+    return coordinates
+
+
+async def aget_coordinates(query: str, limit: int = 1) -> Tuple:
+    coordinates = geocode_locally(query)
+    if coordinates is not None:
+        return coordinates
+
+    cache = get_geocoding_cache()
+    key = normalize_query(query)
+
+    coordinates = await cache.aget(key)
+    if coordinates is None:
+        coordinates = await ageocode_flight.do(
+            key, aload_coordinates, query, key, limit
+        )
+
+    if coordinates == NOT_FOUND:
+        raise AddressNotFound(query)
+    return coordinates
+
+
+def geocode_locally(query: str) -> Optional[Tuple]:
+    """
+    Coordinates from the local address index, when there is one. The
+    remote API is only called for the queries it misses.
+    """
+    index = get_local_geocoder()
+    if index is None:
+        return None
+    return index.geocode(query)
+
+
+def load_coordinates(query: str, key: str, limit: int = 1) -> Tuple:
+    """
+    Geocodes and caches a miss. With the shared lock, one worker calls the
+    API for the key while the others wait for its result in the cache.
+    """
+    cache = get_geocoding_cache()
+    cfg = settings.SINGLEFLIGHT
+    locked = cfg["SHARED_LOCK"] and cache.acquire(key, cfg["LOCK_TIMEOUT"])
+    if cfg["SHARED_LOCK"] and not locked:
+        coordinates = cache.poll(
+            key, cfg["LOCK_TIMEOUT"], cfg["POLL_INTERVAL"]
+        )
+        if coordinates is not None:
+            return coordinates
+
+    try:
+        coordinates = fetch_coordinates(query, limit)
+        cache.set(key, coordinates)
+        return coordinates
+    finally:
+        if locked:
+            cache.release(key)
+
+
+async def aload_coordinates(query: str, key: str, limit: int = 1) -> Tuple:
+    cache = get_geocoding_cache()
+    cfg = settings.SINGLEFLIGHT
+    locked = cfg["SHARED_LOCK"] and await cache.aacquire(
+        key, cfg["LOCK_TIMEOUT"]
+    )
+    if cfg["SHARED_LOCK"] and not locked:
+        coordinates = await cache.apoll(
+            key, cfg["LOCK_TIMEOUT"], cfg["POLL_INTERVAL"]
+        )
+        if coordinates is not None:
+            return coordinates
+
+    try:
+        coordinates = await afetch_coordinates(query, limit)
+        await cache.aset(key, coordinates)
+        return coordinates
+    finally:
+        if locked:
+            await cache.arelease(key)
+
+
+def fetch_coordinates(query: str, limit: int = 1) -> Tuple:
     payload: dict[str, str] = {"q": query, "limit": str(limit)}
-    r = requests.get("https://api-adresse.data.gouv.fr/search", params=payload)
-    coordinates = r.json()["features"][0]["geometry"]["coordinates"]
-    # lat, lng
-    return coordinates[1], coordinates[0]
+    r = get_geocoder_client().get("/search", params=payload)
+    r.raise_for_status()
+    return parse_search(r.json())
+
+
+async def afetch_coordinates(query: str, limit: int = 1) -> Tuple:
+    payload: dict[str, str] = {"q": query, "limit": str(limit)}
+    r = await get_async_geocoder_client().get("/search", params=payload)
+    r.raise_for_status()
+    try:
+        response = r.json()
+    except ValueError:
+        raise GeocoderError(f"Unexpected search response: {r.text:.200}")
+    return parse_search(response)
+
+
+def parse_search(response: dict) -> Tuple:
+    try:
+        features = response["features"]
+        if not features:
+            return NOT_FOUND
+        coordinates = features[0]["geometry"]["coordinates"]
+        # lat, lng
+        return coordinates[1], coordinates[0]
+    except (KeyError, IndexError, TypeError):
+        raise GeocoderError(f"Unexpected search response: {response!r:.200}")
+
+
+def get_coordinates_batch(queries: list[str]) -> list[Optional[Tuple]]:
+    """
+    Geocodes the queries missing from the cache with a single call to the
+    CSV endpoint of the API. Results keep the order of the queries, None
+    when nothing was found.
+    """
+    cache = get_geocoding_cache()
+    keys = [normalize_query(query) for query in queries]
+    originals = dict(zip(keys, queries))
+
+    cached: dict[str, Optional[Tuple]] = dict()
+    for key in keys:
+        if key not in cached:
+            cached[key] = geocode_locally(originals[key]) or cache.get(key)
+    missing = [
+        key for key, coordinates in cached.items() if coordinates is None
+    ]
+    fetched = fetch_coordinates_batch([originals[key] for key in missing])
+    if len(fetched) != len(missing):
+        raise requests.RequestException(
+            f"Geocoded {len(fetched)} rows for {len(missing)} queries"
+        )
+    for key, coordinates in zip(missing, fetched):
+        cache.set(key, coordinates)
+        cached[key] = coordinates
+
+    return [cached[key] or None for key in keys]
+
+
+def fetch_coordinates_batch(queries: list[str]) -> list[Tuple]:
+    if not queries:
+        return []
+
+    data = io.StringIO()
+    writer = csv.writer(data)
+    writer.writerow(["q"])
+    for query in queries:
+        writer.writerow([query])
+
+    r = get_geocoder_client().post(
+        "/search/csv/",
+        files={"data": ("queries.csv", data.getvalue())},
+        data={"columns": "q"},
+    )
+    r.raise_for_status()
+    r.encoding = "utf-8"
+
+    coordinates: list[Tuple] = list()
+    for row in csv.DictReader(io.StringIO(r.text)):
+        if row.get("latitude") and row.get("longitude"):
+            # lat, lng
+            coordinates.append(
+                (float(row["latitude"]), float(row["longitude"]))
+            )
+        else:
+            coordinates.append(NOT_FOUND)
+    return coordinates
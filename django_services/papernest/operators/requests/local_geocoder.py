@@ -0,0 +1,443 @@
+import bisect
+import csv
+import gzip
+import json
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .cache import normalize_query
+
+INDEX_VERSION = 1
+
+# Street types spelled out the way the BAN writes them
+ABBREVIATIONS = {
+    "all": "allee",
+    "av": "avenue",
+    "ave": "avenue",
+    "bd": "boulevard",
+    "bld": "boulevard",
+    "bvd": "boulevard",
+    "ch": "chemin",
+    "chem": "chemin",
+    "crs": "cours",
+    "fbg": "faubourg",
+    "imp": "impasse",
+    "pas": "passage",
+    "pl": "place",
+    "pte": "porte",
+    "qu": "quai",
+    "r": "rue",
+    "rte": "route",
+    "sq": "square",
+    "st": "saint",
+    "ste": "sainte",
+}
+STOP_TOKENS = {"france"}
+# Words a query may add to or drop from the street name of the BAN
+PARTICLES = {
+    "a",
+    "au",
+    "aux",
+    "d",
+    "de",
+    "des",
+    "du",
+    "en",
+    "l",
+    "la",
+    "le",
+    "les",
+    "sur",
+}
+HOUSE_NUMBER = re.compile(r"^(\d{1,5})([a-z]*)$")
+POSTCODE = re.compile(r"^\d{5}$")
+
+
+def tokenize(text: str) -> list[str]:
+    """Normalized words of an address, abbreviations spelled out."""
+    words = re.sub(r"[^\w]+", " ", normalize_query(text)).split()
+    return [ABBREVIATIONS.get(word, word) for word in words]
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Trigrams of the words of the text, padded like pg_trgm does. Numbers
+    are left out, postcodes are matched exactly.
+    """
+    grams: set[str] = set()
+    for word in text.split():
+        if word.isdigit():
+            continue
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_hash(gram: str) -> int:
+    return zlib.crc32(gram.encode())
+
+
+def similarity(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class Strings(Sequence):
+    """Sorted strings stored as one utf-8 blob plus offsets, for bisect."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray) -> None:
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):  # type: ignore[override]
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return bytes(self.blob[start:end]).decode()
+
+    @staticmethod
+    def pack(strings: list[str]) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = [string.encode() for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return blob, offsets
+
+
+class AddressIndex:
+    """
+    Local geocoder over a BAN extract, stored as a directory of .npy files
+    which are memory mapped, so every worker shares the page cache.
+
+    Streets are keyed by "<street> <postcode> <city>" and sorted, so full
+    or partial keys are found by binary search. Fuzzy queries fall back on
+    a trigram index of the keys, and only keep the streets whose postcode
+    and city agree with the query. House numbers are searched among the
+    addresses of the matched street.
+    """
+
+    ARRAYS = [
+        "street_text",
+        "street_offsets",
+        "street_postcode",
+        "street_addresses",
+        "street_lat",
+        "street_lon",
+        "address_number",
+        "address_rep",
+        "address_lat",
+        "address_lon",
+        "trigram_keys",
+        "trigram_offsets",
+        "trigram_streets",
+    ]
+    street_text: np.ndarray
+    street_offsets: np.ndarray
+    street_postcode: np.ndarray
+    street_addresses: np.ndarray
+    street_lat: np.ndarray
+    street_lon: np.ndarray
+    address_number: np.ndarray
+    address_rep: np.ndarray
+    address_lat: np.ndarray
+    address_lon: np.ndarray
+    trigram_keys: np.ndarray
+    trigram_offsets: np.ndarray
+    trigram_streets: np.ndarray
+
+    # Candidates rescored after the trigram search
+    CANDIDATES = 50
+    # Trigrams shared by more streets are too common to select candidates
+    MAX_POSTINGS = 50000
+
+    def __init__(
+        self, path: str, min_similarity: float = 0.5, mmap: bool = True
+    ) -> None:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != INDEX_VERSION:
+            raise ValueError(
+                f"Address index version {meta['version']} is not supported"
+            )
+        self.reps: list[str] = meta["reps"]
+        self.min_similarity = min_similarity
+        for name in self.ARRAYS:
+            setattr(
+                self,
+                name,
+                np.load(
+                    os.path.join(path, f"{name}.npy"),
+                    mmap_mode="r" if mmap else None,
+                ),
+            )
+        self.streets = Strings(self.street_text, self.street_offsets)
+
+    def geocode(self, query: str) -> Optional[Tuple[float, float]]:
+        """(lat, lng) of the address, None when it is not in the index."""
+        tokens = [t for t in tokenize(query) if t not in STOP_TOKENS]
+        number, rep, tokens = self.split_house_number(tokens)
+        if not tokens:
+            return None
+
+        street = self.find_street(tokens)
+        if street is None:
+            return None
+        if number is None:
+            return self.point(self.street_lat, self.street_lon, street)
+
+        start = self.street_addresses[street]
+        end = self.street_addresses[street + 1]
+        numbers = self.address_number[start:end]
+        first = int(np.searchsorted(numbers, number, side="left"))
+        last = int(np.searchsorted(numbers, number, side="right"))
+        if first == last:
+            return None
+        reps = self.address_rep[start + first : start + last]
+        matches = np.flatnonzero(reps == self.reps.index(rep or ""))
+        found = start + first + (int(matches[0]) if len(matches) else 0)
+        return self.point(self.address_lat, self.address_lon, found)
+
+    def split_house_number(
+        self, tokens: list[str]
+    ) -> Tuple[Optional[int], Optional[str], list[str]]:
+        if not tokens:
+            return None, None, tokens
+        match = HOUSE_NUMBER.match(tokens[0])
+        if match is None or POSTCODE.match(tokens[0]):
+            return None, None, tokens
+        number, rep = int(match.group(1)), match.group(2)
+        rest = tokens[1:]
+        if not rep and len(rest) > 1 and rest[0] in self.reps:
+            rep, rest = rest[0], rest[1:]
+        if rep not in self.reps:
+            rep = ""
+        return number, rep, rest
+
+    def find_street(self, tokens: list[str]) -> Optional[int]:
+        postcodes = [
+            i for i, token in enumerate(tokens) if POSTCODE.match(token)
+        ]
+        if postcodes:
+            position = postcodes[-1]
+            prefix = " ".join(tokens[: position + 1])
+            candidates = self.prefixed(f"{prefix} ")
+            text = " ".join(tokens)
+            exact = [c for c in candidates if self.streets[c] == text]
+            if exact:
+                return exact[0]
+            candidates = self.same_place(tokens, candidates)
+            if len(candidates) == 1:
+                return candidates[0]
+            if candidates:
+                return self.best(text, candidates)
+            postcode: Optional[int] = int(tokens[position])
+        else:
+            postcode = None
+
+        text = " ".join(tokens)
+        return self.best(
+            text,
+            self.same_place(tokens, self.trigram_candidates(text, postcode)),
+        )
+
+    def same_place(
+        self, tokens: list[str], candidates: list[int]
+    ) -> list[int]:
+        """
+        Candidates whose key accounts for every word of the query: its
+        postcode matches, and other words are close to a word of the street
+        or the city. A street of the same name in another city is a miss.
+        """
+        postcodes = {token for token in tokens if POSTCODE.match(token)}
+        words = [
+            token
+            for token in tokens
+            if not token.isdigit() and token not in PARTICLES
+        ]
+        kept = list()
+        for candidate in candidates:
+            key = self.streets[candidate].split()
+            if postcodes and postcodes != {
+                f"{self.street_postcode[candidate]:05d}"
+            }:
+                continue
+            grams = [trigrams(word) for word in key if not word.isdigit()]
+            if all(
+                word in key
+                or any(
+                    similarity(trigrams(word), other) >= self.min_similarity
+                    for other in grams
+                )
+                for word in words
+            ):
+                kept.append(candidate)
+        return kept
+
+    def prefixed(self, prefix: str) -> list[int]:
+        start = bisect.bisect_left(self.streets, prefix)
+        end = bisect.bisect_left(self.streets, prefix + "\U0010ffff")
+        return list(range(start, end))
+
+    def trigram_candidates(
+        self, text: str, postcode: Optional[int]
+    ) -> list[int]:
+        hashes = np.unique(
+            np.array([trigram_hash(g) for g in trigrams(text)], np.uint32)
+        )
+        positions = np.searchsorted(self.trigram_keys, hashes)
+        found = positions < len(self.trigram_keys)
+        found[found] = self.trigram_keys[positions[found]] == hashes[found]
+
+        postings = list()
+        for position in positions[found]:
+            start = self.trigram_offsets[position]
+            end = self.trigram_offsets[position + 1]
+            if end - start <= self.MAX_POSTINGS:
+                postings.append(self.trigram_streets[start:end])
+        if not postings:
+            return list()
+
+        streets, counts = np.unique(
+            np.concatenate(postings), return_counts=True
+        )
+        if postcode is not None:
+            same_postcode = self.street_postcode[streets] == postcode
+            streets, counts = streets[same_postcode], counts[same_postcode]
+        best = np.argsort(-counts, kind="stable")[: self.CANDIDATES]
+        return [int(street) for street in streets[best]]
+
+    def best(self, text: str, candidates: Iterable[int]) -> Optional[int]:
+        grams = trigrams(text)
+        scored = [
+            (similarity(grams, trigrams(self.streets[c])), -c)
+            for c in candidates
+        ]
+        if not scored:
+            return None
+        score, street = max(scored)
+        return -street if score >= self.min_similarity else None
+
+    @staticmethod
+    def point(
+        lat: np.ndarray, lng: np.ndarray, index: int
+    ) -> Tuple[float, float]:
+        return round(float(lat[index]), 6), round(float(lng[index]), 6)
+
+
+def read_ban(paths: Iterable[str]) -> Iterator[dict]:
+    """Rows of BAN CSV extracts, plain or gzipped, ";" delimited."""
+    for path in paths:
+        if path.endswith(".gz"):
+            f = gzip.open(path, "rt", encoding="utf-8", newline="")
+        else:
+            f = open(path, "r", encoding="utf-8", newline="")
+        with f:
+            yield from csv.DictReader(f, delimiter=";")
+
+
+def build_address_index(rows: Iterable[dict], path: str) -> dict[str, int]:
+    """Writes the index of the BAN rows to the path directory."""
+    addresses: defaultdict = defaultdict(list)
+    postcodes: dict[str, int] = dict()
+    for row in rows:
+        if not row.get("lat") or not row.get("lon"):
+            continue
+        key = " ".join(
+            tokenize(row["nom_voie"])
+            + [row["code_postal"]]
+            + tokenize(row.get("libelle_acheminement") or row["nom_commune"])
+        )
+        postcodes[key] = int(row["code_postal"])
+        rep = " ".join(tokenize(row.get("rep") or ""))
+        addresses[key].append(
+            (
+                int(row["numero"] or 0),
+                rep,
+                float(row["lat"]),
+                float(row["lon"]),
+            )
+        )
+
+    keys = sorted(addresses)
+    reps = sorted({""} | {a[1] for k in keys for a in addresses[k]})
+    rep_codes = {rep: code for code, rep in enumerate(reps)}
+
+    street_addresses = np.zeros(len(keys) + 1, dtype=np.int64)
+    numbers: list[int] = list()
+    rep_column: list[int] = list()
+    lats: list[float] = list()
+    lngs: list[float] = list()
+    street_lat = np.zeros(len(keys), dtype=np.float32)
+    street_lon = np.zeros(len(keys), dtype=np.float32)
+    grams, grams_streets = list(), list()
+    for street, key in enumerate(keys):
+        points = sorted(addresses[key], key=lambda a: (a[0], rep_codes[a[1]]))
+        numbers.extend(p[0] for p in points)
+        rep_column.extend(rep_codes[p[1]] for p in points)
+        lats.extend(p[2] for p in points)
+        lngs.extend(p[3] for p in points)
+        street_addresses[street + 1] = len(numbers)
+        street_lat[street] = np.mean([p[2] for p in points])
+        street_lon[street] = np.mean([p[3] for p in points])
+        for gram in trigrams(key):
+            grams.append(trigram_hash(gram))
+            grams_streets.append(street)
+
+    gram_keys = np.array(grams, dtype=np.uint32)
+    gram_streets = np.array(grams_streets, dtype=np.uint32)
+    order = np.argsort(gram_keys, kind="stable")
+    gram_keys, gram_streets = gram_keys[order], gram_streets[order]
+    trigram_keys, trigram_starts = np.unique(gram_keys, return_index=True)
+
+    street_text, street_offsets = Strings.pack(keys)
+    arrays = {
+        "street_text": street_text,
+        "street_offsets": street_offsets,
+        "street_postcode": np.array(
+            [postcodes[key] for key in keys], dtype=np.int32
+        ),
+        "street_addresses": street_addresses,
+        "street_lat": street_lat,
+        "street_lon": street_lon,
+        "address_number": np.array(numbers, dtype=np.uint32),
+        "address_rep": np.array(rep_column, dtype=np.uint8),
+        "address_lat": np.array(lats, dtype=np.float32),
+        "address_lon": np.array(lngs, dtype=np.float32),
+        "trigram_keys": trigram_keys,
+        "trigram_offsets": np.append(trigram_starts, len(gram_keys)).astype(
+            np.int64
+        ),
+        "trigram_streets": gram_streets,
+    }
+
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"version": INDEX_VERSION, "reps": reps}, f)
+
+    return {"streets": len(keys), "addresses": len(numbers)}
+
+
+_local_geocoder: Optional[Tuple[str, Optional[AddressIndex]]] = None
+
+
+def get_local_geocoder() -> Optional[AddressIndex]:
+    """Index of the LOCAL_GEOCODER setting, None when it isn't set."""
+    global _local_geocoder
+    cfg = settings.LOCAL_GEOCODER
+    if _local_geocoder is None or _local_geocoder[0] != cfg["INDEX"]:
+        index = None
+        if cfg["INDEX"]:
+            index = AddressIndex(cfg["INDEX"], cfg["MIN_SIMILARITY"])
+        _local_geocoder = (cfg["INDEX"], index)
+    return _local_geocoder[1]
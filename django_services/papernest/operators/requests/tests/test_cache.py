@@ -0,0 +1,135 @@
+import threading
+from unittest import mock
+
+import requests
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from operators.requests import geolocation, AddressNotFound
+from operators.requests.cache import (
+    GeocodingCache,
+    NOT_FOUND,
+    get_geocoding_cache,
+    normalize_query,
+)
+
+
+class GeocodingCacheTest(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        get_geocoding_cache().clear()
+
+    def test_normalize_query(self):
+        self.assertEqual(
+            normalize_query("  15 Pl. VENDÔME,\t75001   Paris "),
+            "15 pl. vendome, 75001 paris",
+        )
+        self.assertEqual(
+            normalize_query("Rue de l'Église"),
+            normalize_query("rue de l'eglise"),
+        )
+
+    def test_local_tier(self):
+        cache = GeocodingCache(
+            "default", local_maxsize=2, ttl=60, negative_ttl=1
+        )
+        cache.set("a", (1.0, 2.0))
+        cache.set("b", (3.0, 4.0))
+        cache.get("a")
+        cache.set("c", (5.0, 6.0))
+
+        # "b" was the least recently used key
+        self.assertEqual(list(cache.local), ["a", "c"])
+        self.assertEqual(cache.get("a"), (1.0, 2.0))
+        self.assertEqual(cache.stats["local_hits"], 2)
+
+        # Evicted keys are still served by the shared tier
+        self.assertEqual(cache.get("b"), (3.0, 4.0))
+        self.assertEqual(cache.stats["shared_hits"], 1)
+        self.assertIsNone(cache.get("d"))
+        self.assertEqual(cache.stats["misses"], 1)
+
+    def test_poll_counts_one_miss(self):
+        cache = get_geocoding_cache()
+        self.assertIsNone(cache.poll("nowhere", timeout=0.05, interval=0.01))
+        self.assertEqual(cache.stats["misses"], 1)
+
+    def test_expiration(self):
+        cache = GeocodingCache(
+            "default", local_maxsize=10, ttl=60, negative_ttl=1
+        )
+        with mock.patch("time.monotonic", return_value=0):
+            cache.set("a", (1.0, 2.0))
+        with mock.patch("time.monotonic", return_value=61):
+            caches["default"].clear()
+            self.assertIsNone(cache.get("a"))
+
+    @mock.patch.object(geolocation, "fetch_coordinates")
+    def test_get_coordinates(self, fetch_coordinates):
+        fetch_coordinates.return_value = (48.8675, 2.3291)
+        first = geolocation.get_coordinates("15 Pl. Vendôme, 75001 Paris")
+        second = geolocation.get_coordinates("15 pl. vendome,  75001 PARIS")
+        self.assertEqual(first, second)
+        self.assertEqual(fetch_coordinates.call_count, 1)
+
+        # Queries without result are cached too
+        fetch_coordinates.return_value = NOT_FOUND
+        for _ in range(2):
+            with self.assertRaises(AddressNotFound):
+                geolocation.get_coordinates("nowhere")
+        self.assertEqual(fetch_coordinates.call_count, 2)
+
+    @mock.patch.object(geolocation, "fetch_coordinates_batch")
+    def test_get_coordinates_batch(self, fetch_coordinates_batch):
+        get_geocoding_cache().set("paris", (48.85, 2.35))
+        fetch_coordinates_batch.return_value = [(45.76, 4.83), NOT_FOUND]
+
+        result = geolocation.get_coordinates_batch(
+            ["Lyon", "Paris", "nowhere", "LYON"]
+        )
+        self.assertEqual(
+            result, [(45.76, 4.83), (48.85, 2.35), None, (45.76, 4.83)]
+        )
+        fetch_coordinates_batch.assert_called_once_with(["LYON", "nowhere"])
+
+    @mock.patch.object(geolocation, "fetch_coordinates_batch")
+    def test_get_coordinates_batch_missing_rows(self, fetch_coordinates_batch):
+        fetch_coordinates_batch.return_value = [(45.76, 4.83)]
+
+        with self.assertRaises(requests.RequestException):
+            geolocation.get_coordinates_batch(["Lyon", "nowhere"])
+        self.assertIsNone(get_geocoding_cache().get("nowhere"))
+
+    @override_settings(
+        SINGLEFLIGHT={
+            "SHARED_LOCK": True,
+            "LOCK_TIMEOUT": 1,
+            "POLL_INTERVAL": 0.01,
+        }
+    )
+    @mock.patch.object(geolocation, "fetch_coordinates")
+    def test_get_coordinates_shared_lock(self, fetch_coordinates):
+        fetch_coordinates.return_value = (45.76, 4.83)
+        cache = get_geocoding_cache()
+
+        # Another worker holds the lock and caches the result
+        self.assertTrue(cache.acquire("paris", 1))
+        holder = threading.Timer(
+            0.05,
+            caches["default"].set,
+            [cache.shared_key("paris"), (48.85, 2.35)],
+        )
+        holder.start()
+        self.assertEqual(geolocation.get_coordinates("Paris"), (48.85, 2.35))
+        holder.join()
+        fetch_coordinates.assert_not_called()
+
+        # The holder never caches the result, the waiter gives up on it
+        self.assertTrue(cache.acquire("lyon", 1))
+        self.assertEqual(geolocation.get_coordinates("Lyon"), (45.76, 4.83))
+        fetch_coordinates.assert_called_once()
+
+        # Without contention the lock is released after the call
+        geolocation.get_coordinates("Marseille")
+        self.assertTrue(cache.acquire("marseille", 1))
@@ -0,0 +1,133 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.test import TestCase, override_settings
+
+from operators.requests import geolocation
+from operators.requests.cache import get_geocoding_cache
+from operators.requests.client import (
+    GeocoderClient,
+    RetryBudget,
+    reset_geocoder_client,
+)
+
+
+SEARCH_RESPONSE = {
+    "features": [
+        {"geometry": {"coordinates": [2.329, 48.8675]}},
+    ]
+}
+
+
+class StubGeocoderHandler(BaseHTTPRequestHandler):
+    # Status codes answered to the next requests, then 200
+    statuses: list[int] = []
+    response: dict = SEARCH_RESPONSE
+    requests_count = 0
+
+    def do_GET(self):
+        StubGeocoderHandler.requests_count += 1
+        status = self.statuses.pop(0) if self.statuses else 200
+        body = json.dumps(self.response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GeocoderClientTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGeocoderHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubGeocoderHandler.statuses = []
+        StubGeocoderHandler.response = SEARCH_RESPONSE
+        StubGeocoderHandler.requests_count = 0
+        get_geocoding_cache().clear()
+
+    def geocoder_client(self, max_retries=2, max_tokens=10):
+        return GeocoderClient(
+            base_url=self.base_url,
+            timeout=(1, 1),
+            pool_size=2,
+            max_retries=max_retries,
+            backoff=0,
+            backoff_max=0,
+            retry_budget=RetryBudget(ratio=0.2, max_tokens=max_tokens),
+        )
+
+    def test_retries(self):
+        StubGeocoderHandler.statuses = [503, 502]
+        response = self.geocoder_client().get("/search")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StubGeocoderHandler.requests_count, 3)
+
+        StubGeocoderHandler.statuses = [503, 503, 503]
+        with self.assertRaises(requests.HTTPError):
+            self.geocoder_client().get("/search")
+
+    def test_retry_budget(self):
+        # Only one retry left in the budget
+        client = self.geocoder_client(max_tokens=1)
+        StubGeocoderHandler.statuses = [503, 200, 503]
+        self.assertEqual(client.get("/search").status_code, 200)
+        with self.assertRaises(requests.HTTPError):
+            client.get("/search")
+        self.assertEqual(StubGeocoderHandler.requests_count, 3)
+
+    def test_connection_error(self):
+        client = GeocoderClient(
+            base_url="http://127.0.0.1:1",
+            timeout=(0.5, 0.5),
+            pool_size=1,
+            max_retries=1,
+            backoff=0,
+            backoff_max=0,
+            retry_budget=RetryBudget(ratio=0.2, max_tokens=10),
+        )
+        with self.assertRaises(requests.ConnectionError):
+            client.get("/search")
+
+    def geocoder_settings(self):
+        reset_geocoder_client()
+        self.addCleanup(reset_geocoder_client)
+        return override_settings(
+            GEOCODER={
+                "BASE_URL": self.base_url,
+                "CONNECT_TIMEOUT": 1,
+                "READ_TIMEOUT": 1,
+                "POOL_SIZE": 1,
+                "MAX_RETRIES": 0,
+                "BACKOFF": 0,
+                "BACKOFF_MAX": 0,
+                "RETRY_BUDGET_RATIO": 0.2,
+                "RETRY_BUDGET_MAX_TOKENS": 10,
+            }
+        )
+
+    def test_get_coordinates(self):
+        with self.geocoder_settings():
+            coordinates = geolocation.get_coordinates("1 rue du stub")
+        self.assertEqual(coordinates, (48.8675, 2.329))
+
+    def test_malformed_response(self):
+        StubGeocoderHandler.response = {"code": 400, "message": "Bad q"}
+        with self.geocoder_settings():
+            with self.assertRaises(geolocation.GeocoderError):
+                geolocation.get_coordinates("2 rue du stub")
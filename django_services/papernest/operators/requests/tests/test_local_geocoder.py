@@ -0,0 +1,121 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from operators.requests import geolocation
+from operators.requests.cache import get_geocoding_cache
+from operators.requests.local_geocoder import (
+    AddressIndex,
+    build_address_index,
+    read_ban,
+    tokenize,
+)
+
+BAN_EXTRACT = "operators/requests/tests/data/ban_extract.csv"
+
+
+class LocalGeocoderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.counts = build_address_index(
+            read_ban([BAN_EXTRACT]), cls.directory.name
+        )
+        cls.index = AddressIndex(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches["default"].clear()
+        get_geocoding_cache().clear()
+
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize("15 Pl. Vendôme, 75001 Paris"),
+            ["15", "place", "vendome", "75001", "paris"],
+        )
+
+    def test_build(self):
+        self.assertEqual(self.counts, {"streets": 5, "addresses": 9})
+        self.assertEqual(self.index.reps, ["", "bis"])
+
+    def test_geocode(self):
+        vendome = (48.867565, 2.329117)
+        for query in [
+            "15 Pl. Vendôme, 75001 Paris, France",
+            "15 place vendome 75001",
+            "15 place vendome paris",
+        ]:
+            self.assertEqual(self.index.geocode(query), vendome)
+
+        # Repetition indices, with or without a space
+        self.assertEqual(
+            self.index.geocode("1 bis rue de la Paix 75002 Paris"),
+            (48.869415, 2.330225),
+        )
+        self.assertEqual(
+            self.index.geocode("1bis rue de la Paix Paris"),
+            (48.869415, 2.330225),
+        )
+
+        # Typos are matched by trigrams
+        self.assertEqual(
+            self.index.geocode("42 rue Oberkamf Paris"),
+            (48.865337, 2.367496),
+        )
+
+        # Streets without number resolve to the middle of their addresses
+        self.assertEqual(
+            self.index.geocode("Rue de la République 69002 Lyon"),
+            (45.764259, 4.835837),
+        )
+
+        # Unknown numbers and streets are misses
+        self.assertIsNone(self.index.geocode("99 rue Oberkampf 75011 Paris"))
+        self.assertIsNone(self.index.geocode("10 rue Nowhere 75011 Paris"))
+
+    def test_geocode_other_city(self):
+        # Streets of the same name in another city are misses
+        for query in [
+            "5 rue de la republique marseille",
+            "Rue de la République 13001 Marseille",
+            "42 rue oberkampf lyon",
+            "42 rue Oberkampf 75011 Lyon",
+        ]:
+            self.assertIsNone(self.index.geocode(query))
+
+    @mock.patch.object(geolocation, "fetch_coordinates")
+    def test_get_coordinates(self, fetch_coordinates):
+        fetch_coordinates.return_value = (43.2965, 5.3698)
+        with override_settings(
+            LOCAL_GEOCODER={
+                "INDEX": self.directory.name,
+                "MIN_SIMILARITY": 0.5,
+            }
+        ):
+            self.assertEqual(
+                geolocation.get_coordinates("15 place Vendôme Paris"),
+                (48.867565, 2.329117),
+            )
+            fetch_coordinates.assert_not_called()
+
+            # Misses fall back on the API
+            self.assertEqual(
+                geolocation.get_coordinates("Vieux-Port, Marseille"),
+                (43.2965, 5.3698),
+            )
+            fetch_coordinates.assert_called_once()
+
+            self.assertEqual(
+                geolocation.get_coordinates(
+                    "5 rue de la République Marseille"
+                ),
+                (43.2965, 5.3698),
+            )
+            self.assertEqual(fetch_coordinates.call_count, 2)
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+# Columnar files: a magic, the length of a JSON header, the header, then
+# one column per field. Columns start on page boundaries so they can be
+# memory mapped.
+MAGIC = b"CVGCOL\x00\x00"
+VERSION = 1
+PAGE_SIZE = 4096
+# Lambert-93 coordinates are stored in meters, operators as indexes in the
+# operator table of the header and 2G/3G/4G as a bitmask
+COLUMNS: dict[str, np.dtype] = {
+    "operator": np.dtype("<u2"),
+    "x": np.dtype("<i4"),
+    "y": np.dtype("<i4"),
+    "flags": np.dtype("u1"),
+}
+G2 = 1
+G3 = 2
+G4 = 4
+BLOCK_SIZE = 1024 * 1024
+# Room left in the header for the offsets of the columns
+HEADER_SLACK = 256
+
+
+def pack_flags(flags: np.ndarray) -> np.ndarray:
+    """2G/3G/4G columns, as 0/1 or booleans, packed in a bitmask."""
+    flags = flags.astype(np.uint8)
+    return flags[:, 0] * G2 | flags[:, 1] * G3 | flags[:, 2] * G4
+
+
+def unpack_flags(mask: np.ndarray) -> np.ndarray:
+    """2G/3G/4G columns of 0/1 of the bitmasks."""
+    return np.column_stack(
+        [(mask & G2) > 0, (mask & G3) > 0, (mask & G4) > 0]
+    ).astype(np.int64)
+
+
+def aligned(offset: int) -> int:
+    return -(-offset // PAGE_SIZE) * PAGE_SIZE
+
+
+def is_columnar(path: str, magic: bytes = MAGIC) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(magic)) == magic
+
+
+def read_header(path: str, magic: bytes = MAGIC) -> dict[str, Any]:
+    with open(path, "rb") as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} isn't a {magic!r} columnar file")
+        (size,) = struct.unpack("<I", f.read(4))
+        return json.loads(f.read(size))
+
+
+def map_columns(
+    path: str,
+    header: dict[str, Any],
+    schema: dict[str, np.dtype],
+    mmap: bool = True,
+) -> dict[str, np.ndarray]:
+    """Columns of the file, memory mapped or read."""
+    rows = header["rows"]
+    columns = dict()
+    for name, dtype in schema.items():
+        offset = header["offsets"][name]
+        if rows == 0:
+            columns[name] = np.empty(0, dtype=dtype)
+        elif mmap:
+            columns[name] = np.memmap(
+                path, dtype=dtype, mode="r", offset=offset, shape=(rows,)
+            )
+        else:
+            columns[name] = np.fromfile(
+                path, dtype=dtype, count=rows, offset=offset
+            )
+    return columns
+
+
+def columns_sha256(columns: dict[str, np.ndarray]) -> str:
+    sha256 = hashlib.sha256()
+    for column in columns.values():
+        data = column.view(np.uint8)
+        for start in range(0, len(data), BLOCK_SIZE):
+            sha256.update(data[start : start + BLOCK_SIZE].tobytes())
+    return sha256.hexdigest()
+
+
+def write_columns(
+    path: str,
+    magic: bytes,
+    header: dict[str, Any],
+    schema: dict[str, np.dtype],
+    rows: int,
+    blocks: dict[str, Iterable[bytes]],
+) -> None:
+    """
+    Writes the header, completed with the rows, offsets and SHA-256 of the
+    columns, and the blocks of bytes of every column of the schema.
+    """
+    header = dict(header, rows=rows, sha256="0" * 64)
+    header["offsets"] = {name: 0 for name in schema}
+    offset = aligned(len(magic) + 4 + len(json.dumps(header)) + HEADER_SLACK)
+    for name, dtype in schema.items():
+        header["offsets"][name] = offset
+        offset = aligned(offset + rows * dtype.itemsize)
+
+    sha256 = hashlib.sha256()
+    with open(path, "wb") as out:
+        for name in schema:
+            out.seek(header["offsets"][name])
+            for block in blocks[name]:
+                sha256.update(block)
+                out.write(block)
+        out.truncate(offset)
+        header["sha256"] = sha256.hexdigest()
+        encoded = json.dumps(header).encode()
+        if len(magic) + 4 + len(encoded) > min(header["offsets"].values()):
+            raise ValueError("Columnar header too large")
+        out.seek(0)
+        out.write(magic + struct.pack("<I", len(encoded)) + encoded)
+
+
+def file_blocks(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(BLOCK_SIZE), b"")
+
+
+def array_blocks(array: np.ndarray) -> Iterator[bytes]:
+    data = np.ascontiguousarray(array).view(np.uint8)
+    for start in range(0, len(data), BLOCK_SIZE):
+        yield data[start : start + BLOCK_SIZE].tobytes()
+
+
+class ColumnarCoverage:
+    """
+    Processed coverage file. Columns are memory mapped by default, so the
+    rows are only read when used and workers share their pages.
+    """
+
+    def __init__(
+        self, path: str, mmap: bool = True, verify: bool = True
+    ) -> None:
+        self.path = path
+        header = read_header(path)
+        if header["version"] != VERSION:
+            raise ValueError(
+                f"Unsupported columnar coverage version {header['version']}"
+            )
+
+        self.rows: int = header["rows"]
+        self.checksum: str = header["sha256"]
+        self.operators = np.array(header["operators"], dtype=np.int64)
+        self.columns = map_columns(path, header, COLUMNS, mmap)
+        if verify and columns_sha256(self.columns) != self.checksum:
+            raise ValueError(f"Checksum mismatch in {path}")
+
+    def __len__(self) -> int:
+        return self.rows
+
+    @property
+    def operator_ids(self) -> np.ndarray:
+        return self.operators[self.columns["operator"]]
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.columns["x"]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.columns["y"]
+
+    @property
+    def flags(self) -> np.ndarray:
+        return self.columns["flags"]
+
+    def chunks(self, chunk_size: int) -> Iterator[np.ndarray]:
+        """Rows by chunks, as the raw file reader yields them."""
+        for start in range(0, self.rows, chunk_size):
+            end = start + chunk_size
+            yield np.column_stack(
+                [
+                    self.operators[self.columns["operator"][start:end]],
+                    self.x[start:end],
+                    self.y[start:end],
+                    unpack_flags(self.flags[start:end]),
+                ]
+            ).astype(np.int64)
+
+
+def write_columnar(path: str, chunks: Iterable[np.ndarray]) -> int:
+    """
+    Writes chunks of raw rows (operator, x, y, 2G, 3G, 4G) to a columnar
+    coverage file. Columns are spooled next to it, so memory stays flat.
+    Returns the rows written.
+    """
+    operators: list[int] = list()
+    rows = 0
+    with tempfile.TemporaryDirectory(
+        dir=os.path.dirname(os.path.abspath(path))
+    ) as spool:
+        files = {
+            name: open(os.path.join(spool, name), "wb") for name in COLUMNS
+        }
+        try:
+            for chunk in chunks:
+                for operator_id in np.unique(chunk[:, 0]).tolist():
+                    if operator_id not in operators:
+                        operators.append(operator_id)
+                if len(operators) > np.iinfo(COLUMNS["operator"]).max + 1:
+                    raise ValueError("Too many operators for the format")
+                table = np.array(operators, dtype=np.int64)
+                order = np.argsort(table)
+                codes = order[np.searchsorted(table[order], chunk[:, 0])]
+                values = {
+                    "operator": codes,
+                    "x": chunk[:, 1],
+                    "y": chunk[:, 2],
+                    "flags": pack_flags(chunk[:, 3:]),
+                }
+                for name, dtype in COLUMNS.items():
+                    files[name].write(values[name].astype(dtype).tobytes())
+                rows += len(chunk)
+        finally:
+            for f in files.values():
+                f.close()
+
+        write_columns(
+            path,
+            MAGIC,
+            {"version": VERSION, "operators": operators},
+            COLUMNS,
+            rows,
+            {name: file_blocks(os.path.join(spool, name)) for name in COLUMNS},
+        )
+    return rows
@@ -1,15 +1,44 @@
-from utils import process_init_file
-import csv
+import argparse
 
+from columnar import write_columnar
+from utils import (
+    CHUNK_SIZE,
+    is_compressed,
+    map_init_ranges,
+    read_init_chunks,
+    read_init_range,
+)
 
-def process_init_data() -> None:
-    init_data = process_init_file("data/operators_cvg.csv")
-    with open("data/operators_cvg_processed.csv", "w", newline="") as f:
-        writer = csv.DictWriter(f, init_data[0].keys())
-        writer.writeheader()
-        for row in init_data:
-            writer.writerow(row)
+
+def process_init_data(
+    input_path: str = "data/operators_cvg.csv",
+    output_path: str = "data/operators_cvg_processed.cvg",
+    chunk_size: int = CHUNK_SIZE,
+    workers: int = 1,
+) -> int:
+    """
+    Streams the valid rows of the raw file to a columnar one chunk by
+    chunk, so memory stays flat with full national datasets. With several
+    workers, line ranges of uncompressed files are parsed in parallel.
+    Returns the rows written.
+    """
+    if workers > 1 and not is_compressed(input_path):
+        chunks = map_init_ranges(read_init_range, input_path, workers)
+    else:
+        chunks = read_init_chunks(input_path, chunk_size)
+    return write_columnar(output_path, chunks)
 
 
 if __name__ == "__main__":
-    process_init_data()
+    parser = argparse.ArgumentParser(
+        description=(
+            "Validates the raw coverage file and packs it in the columnar "
+            "format init_db and refresh_coverage load"
+        )
+    )
+    parser.add_argument("--input", default="data/operators_cvg.csv")
+    parser.add_argument("--output", default="data/operators_cvg_processed.cvg")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    process_init_data(args.input, args.output, args.chunk_size, args.workers)
@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+import numpy as np
+from django.test import TestCase
+
+from operators.scripts.columnar import (
+    PAGE_SIZE,
+    ColumnarCoverage,
+    is_columnar,
+    write_columnar,
+)
+
+ROWS = np.array(
+    [
+        [20801, 102980, 6847973, 1, 1, 0],
+        [20810, 103113, 6848661, 0, 0, 1],
+        [20820, -357823, 7230727, 1, 1, 1],
+        [20801, 1313632, 6037008, 0, 0, 0],
+    ]
+)
+
+
+class ColumnarTest(TestCase):
+    def test_write_columnar(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "coverage.cvg")
+            self.assertEqual(write_columnar(path, [ROWS[:3], ROWS[3:]]), 4)
+            self.assertTrue(is_columnar(path))
+
+            coverage = ColumnarCoverage(path)
+            self.assertEqual(len(coverage), 4)
+            self.assertIsInstance(coverage.x, np.memmap)
+            self.assertEqual(
+                coverage.operators.tolist(), [20801, 20810, 20820]
+            )
+            self.assertEqual(
+                coverage.operator_ids.tolist(), [20801, 20810, 20820, 20801]
+            )
+            self.assertEqual(coverage.flags.tolist(), [3, 4, 7, 0])
+            self.assertEqual(
+                [chunk.tolist() for chunk in coverage.chunks(3)],
+                [ROWS[:3].tolist(), ROWS[3:].tolist()],
+            )
+
+            # Columns start on pages, so they can be mapped
+            for column in coverage.columns.values():
+                self.assertEqual(column.offset % PAGE_SIZE, 0)
+
+            in_memory = ColumnarCoverage(path, mmap=False)
+            self.assertNotIsInstance(in_memory.x, np.memmap)
+            self.assertEqual(in_memory.y.tolist(), ROWS[:, 2].tolist())
+
+    def test_checksum(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "coverage.cvg")
+            write_columnar(path, [ROWS])
+            offset = ColumnarCoverage(path).columns["y"].offset
+
+            with open(path, "r+b") as f:
+                f.seek(offset)
+                f.write(b"\xff")
+
+            with self.assertRaises(ValueError):
+                ColumnarCoverage(path)
+            self.assertEqual(len(ColumnarCoverage(path, verify=False)), 4)
+
+    def test_empty(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "coverage.cvg")
+            write_columnar(path, [])
+            coverage = ColumnarCoverage(path)
+            self.assertEqual(len(coverage), 0)
+            self.assertEqual(list(coverage.chunks(10)), [])
+
+            raw = os.path.join(directory, "coverage.csv")
+            with open(raw, "w") as f:
+                f.write("Operateur;x;y;2G;3G;4G\n")
+            self.assertFalse(is_columnar(raw))
@@ -1,6 +1,24 @@
+import gzip
+import os
+import tempfile
+
+import numpy as np
+import zstandard
 from django.test import TestCase
 
-from operators.scripts.utils import CoordTransformer
+from operators.scripts.utils import (
+    LAMBERT93_BOUNDS,
+    CoordTransformer,
+    hilbert_keys,
+    hilbert_order,
+    line_ranges,
+    map_init_ranges,
+    parse_init_lines,
+    process_init_chunks,
+    process_init_file,
+    process_init_range,
+    read_init_chunks,
+)
 
 
 class UtilsTest(TestCase):
@@ -16,3 +34,150 @@ class UtilsTest(TestCase):
         first_result = transformer.transform(first_input[0], first_input[1])
         first_expected = (-5.983837626281218, -1.3630822422782436)
         self.assertEqual(first_result, first_expected)
+
+    def test_lambert_many(self):
+        transformer = CoordTransformer()
+
+        x = np.array([102980, 103113, 700000])
+        y = np.array([6847973, 6848661, 6600000])
+        lat, long = transformer.transform_many(x, y)
+        for i in range(len(x)):
+            expected = transformer.transform(int(x[i]), int(y[i]))
+            self.assertAlmostEqual(lat[i], expected[0], places=9)
+            self.assertAlmostEqual(long[i], expected[1], places=9)
+
+    def test_process_init_chunks(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write(
+                "Operateur;x;y;2G;3G;4G\n"
+                "20801;102980;6847973;1;1;0\n"
+                "20815;#N/A;#N/A;0;1;0\n"
+                "20820;103114;6848664;1;1;1\n"
+            )
+            f.flush()
+
+            chunks = list(process_init_chunks(f.name, chunk_size=2))
+            self.assertEqual(
+                [chunk.tolist() for chunk, _, _ in chunks],
+                [
+                    [[20801, 102980, 6847973, 1, 1, 0]],
+                    [[20820, 103114, 6848664, 1, 1, 1]],
+                ],
+            )
+
+            data = process_init_file(f.name)
+            self.assertEqual(
+                [row["operator_id"] for row in data], [20801, 20820]
+            )
+            self.assertEqual(
+                (data[1]["g2"], data[1]["g3"], data[1]["g4"]),
+                (True, True, True),
+            )
+
+    def test_read_init_chunks_compressed(self):
+        data = (
+            "Operateur;x;y;2G;3G;4G\n"
+            "20801;102980;6847973;1;1;0\n"
+            "20815;103113;6848661;2;0;1\n"
+            "20820;103114;-6848664;1;1;1\n"
+            "20810;103113;6848661;0;0;1\n"
+        ).encode()
+        compressors = {
+            ".gz": gzip.compress,
+            ".zst": zstandard.ZstdCompressor().compress,
+        }
+        for suffix, compress in compressors.items():
+            with tempfile.NamedTemporaryFile(suffix=suffix) as f:
+                f.write(compress(data))
+                f.flush()
+
+                chunks = list(read_init_chunks(f.name, chunk_size=3))
+                # Flags other than 1 are read as 0, rows out of bounds
+                # are dropped
+                self.assertEqual(
+                    [chunk.tolist() for chunk in chunks],
+                    [
+                        [
+                            [20801, 102980, 6847973, 1, 1, 0],
+                            [20815, 103113, 6848661, 0, 0, 1],
+                        ],
+                        [[20810, 103113, 6848661, 0, 0, 1]],
+                    ],
+                )
+
+    def test_parse_init_lines_flags(self):
+        rows = parse_init_lines(
+            [
+                "20801;102980;6847973;1;;x\n",
+                "20815;#N/A;#N/A;0;1;0\n",
+                "20810;103113;6848661;0;1;1\n",
+            ]
+        )
+        self.assertEqual(
+            rows.tolist(),
+            [
+                [20801, 102980, 6847973, 1, 0, 0],
+                [20810, 103113, 6848661, 0, 1, 1],
+            ],
+        )
+
+    def test_map_init_ranges(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write("Operateur;x;y;2G;3G;4G\n")
+            for i in range(1000):
+                f.write(f"{20801 + i % 4};{102980 + i};6847973;1;0;1\n")
+            f.write("20815;#N/A;#N/A;0;1;0\n")
+            f.flush()
+
+            ranges = line_ranges(f.name, 7)
+            self.assertEqual(ranges[0][0], len("Operateur;x;y;2G;3G;4G\n"))
+            self.assertEqual(ranges[-1][1], os.path.getsize(f.name))
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, start)
+
+            parallel = [
+                chunk.tolist()
+                for chunk, _, _ in map_init_ranges(
+                    process_init_range, f.name, workers=2
+                )
+            ]
+            sequential = [chunk.tolist() for chunk in read_init_chunks(f.name)]
+            self.assertEqual(sum(parallel, list()), sum(sequential, list()))
+            self.assertEqual(len(sum(parallel, list())), 1000)
+
+    def test_hilbert_keys(self):
+        min_x, min_y, max_x, max_y = LAMBERT93_BOUNDS
+        x, y = np.meshgrid(np.arange(8), np.arange(8))
+        keys = hilbert_keys(x.ravel() + min_x, y.ravel() + min_y, order=3)
+        self.assertEqual(sorted(keys.tolist()), list(range(64)))
+
+        # Consecutive keys are neighbouring cells
+        order = np.argsort(keys)
+        steps = np.abs(np.diff(x.ravel()[order])) + np.abs(
+            np.diff(y.ravel()[order])
+        )
+        self.assertTrue(np.all(steps == 1))
+
+        corners = hilbert_keys(
+            np.array([min_x, max_x]), np.array([min_y, max_y])
+        )
+        self.assertEqual(corners[0], 0)
+        self.assertLess(corners[1], 4**21)
+
+    def test_hilbert_order(self):
+        rows = np.array(
+            [
+                [20801, 700000, 6600000, 1, 1, 0],
+                [20810, 102980, 6847973, 0, 0, 1],
+                [20815, 700001, 6600000, 1, 0, 1],
+                [20820, 102981, 6847973, 1, 1, 1],
+            ]
+        )
+        order = hilbert_order(rows)
+        # Points a meter apart end up next to each other
+        self.assertEqual(
+            abs(order.tolist().index(0) - order.tolist().index(2)), 1
+        )
+        self.assertEqual(
+            abs(order.tolist().index(1) - order.tolist().index(3)), 1
+        )
@@ -1,41 +1,260 @@
+import gzip
+import io
+import itertools
+import math
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Generator,
+    IO,
+    Iterable,
+    Iterator,
+    Tuple,
+)
+
+import numpy as np
 import pyproj
-from typing import Generator, IO
+import zstandard
+
+# Lines parsed and reprojected at once
+CHUNK_SIZE = 100_000
+# operator, x, y, 2G, 3G, 4G
+INIT_COLUMNS = 6
+# Largest byte range of the raw file handled by a worker at once
+RANGE_BYTES = 4 * 1024 * 1024
+# Projected bounds of Lambert-93 (EPSG:2154)
+LAMBERT93_BOUNDS = (-357823, 6037008, 1313632, 7230727)
+# Bits per axis of the Hilbert curve, covering the bounds to the meter
+HILBERT_ORDER = 21
+
+
+@lru_cache(maxsize=None)
+def lambert_to_wgs84() -> pyproj.Transformer:
+    lambert = pyproj.Proj(
+        "+proj=lcc +lat_1=49 +lat_2=44 +lat_0=46.5 +lon_0=3 +x_0=700000 +y_0=6600000 +ellps=GRS80 +towgs84=0,0,0,0,0,0,0 +units=m +no_defs"
+    )
+    wgs84 = pyproj.Proj("+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs")
+    return pyproj.Transformer.from_proj(lambert, wgs84, always_xy=True)
 
 
 class CoordTransformer:
     def __init__(self) -> None:
-        self.lambert = pyproj.Proj(
-            "+proj=lcc +lat_1=49 +lat_2=44 +lat_0=46.5 +lon_0=3 +x_0=700000 +y_0=6600000 +ellps=GRS80 +towgs84=0,0,0,0,0,0,0 +units=m +no_defs"
-        )
-        self.wgs84 = pyproj.Proj(
-            "+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs"
-        )
+        self.transformer = lambert_to_wgs84()
 
     def transform(self, x: int, y: int) -> tuple[float, float]:
-        long, lat = pyproj.transform(self.lambert, self.wgs84, x, y)
+        long, lat = self.transformer.transform(x, y)
+        return lat, long
+
+    def transform_many(
+        self, x: np.ndarray, y: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Reprojects arrays of coordinates in one call, returns lat, long."""
+        long, lat = self.transformer.transform(
+            np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        )
         return lat, long
 
 
 def process_init_file(path: str) -> list[dict]:
     init_data = list()
-    with open(path, "r") as file:
+    for chunk, lat, long in process_init_chunks(path):
+        for fields, coordinates in zip(chunk.tolist(), zip(lat, long)):
+            init_data.append(operator(fields, coordinates))
+    return init_data
+
+
+def process_init_chunks(
+    path: str, chunk_size: int = CHUNK_SIZE
+) -> Iterator[Tuple[np.ndarray, list[float], list[float]]]:
+    """Rows of the raw file by chunks, with their latitudes and longitudes."""
+    transformer = CoordTransformer()
+    for chunk in read_init_chunks(path, chunk_size):
+        lat, long = transformer.transform_many(chunk[:, 1], chunk[:, 2])
+        yield chunk, lat.tolist(), long.tolist()
+
+
+def process_init_range(
+    path: str, start: int, end: int
+) -> Tuple[np.ndarray, list[float], list[float]]:
+    """process_init_chunks for one line range, run by the worker processes."""
+    chunk = read_init_range(path, start, end)
+    lat, long = CoordTransformer().transform_many(chunk[:, 1], chunk[:, 2])
+    return chunk, lat.tolist(), long.tolist()
+
+
+def read_init_chunks(
+    path: str, chunk_size: int = CHUNK_SIZE
+) -> Iterator[np.ndarray]:
+    """
+    Valid rows of the raw file by chunks of chunk_size lines at most, so
+    memory stays flat whatever the size of the file.
+    """
+    with open_text(path) as file:
+        file.readline()
+        while True:
+            lines = list(itertools.islice(file, chunk_size))
+            if not lines:
+                return
+            yield validate_init_rows(parse_init_lines(lines))
+
+
+def is_compressed(path: str) -> bool:
+    return path.endswith((".gz", ".zst"))
+
+
+def line_ranges(path: str, parts: int) -> list[Tuple[int, int]]:
+    """
+    Splits an uncompressed file, header excluded, in byte ranges of about
+    the same size, starting and ending on line boundaries.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as file:
         file.readline()
-        transformer = CoordTransformer()
-        for line in file:
+        start = file.tell()
+        step = min(RANGE_BYTES, max(1, math.ceil((size - start) / parts)))
+
+        ranges = list()
+        while start < size:
+            file.seek(min(size, start + step))
+            file.readline()
+            end = min(size, file.tell())
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def read_init_range(path: str, start: int, end: int) -> np.ndarray:
+    """Valid rows of the lines between the start and end offsets."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        lines = file.read(end - start).decode().splitlines()
+    if not lines:
+        return np.empty((0, INIT_COLUMNS), dtype=np.int64)
+    return validate_init_rows(parse_init_lines(lines))
+
+
+def map_init_ranges(
+    fn: Callable[[str, int, int], Any], path: str, workers: int
+) -> Iterator[Any]:
+    """
+    Runs fn(path, start, end) over the line ranges of the file in a pool
+    of processes. Results come back in file order, and at most two ranges
+    per worker are in flight, so memory stays bounded.
+    """
+    return map_ordered(
+        fn,
+        ((path, start, end) for start, end in line_ranges(path, workers * 4)),
+        workers,
+    )
+
+
+def map_ordered(
+    fn: Callable[..., Any], calls: Iterable[Tuple], workers: int
+) -> Iterator[Any]:
+    """
+    Runs fn(*args) for the arguments of every call in a pool of processes.
+    Results come back in order, and at most two calls per worker are in
+    flight, so memory stays bounded.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Future] = deque()
+        for args in calls:
+            pending.append(executor.submit(fn, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def hilbert_keys(
+    x: np.ndarray, y: np.ndarray, order: int = HILBERT_ORDER
+) -> np.ndarray:
+    """
+    Position of the Lambert-93 points along a Hilbert curve over the grid
+    of meters of the Lambert-93 bounds. Points close on the curve are close
+    on the ground, so rows sorted by key are stored near their neighbours.
+    """
+    min_x, min_y, _, _ = LAMBERT93_BOUNDS
+    size = 1 << order
+    x = np.clip(np.rint(x).astype(np.int64) - min_x, 0, size - 1)
+    y = np.clip(np.rint(y).astype(np.int64) - min_y, 0, size - 1)
+    keys = np.zeros(len(x), dtype=np.int64)
+    s = size >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        keys += s * s * ((3 * rx) ^ ry)
+        # Rotates the quadrant so the curve stays continuous
+        flip = rx & ~ry
+        x = np.where(flip, size - 1 - x, x)
+        y = np.where(flip, size - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s >>= 1
+    return keys
+
+
+def hilbert_order(rows: np.ndarray) -> np.ndarray:
+    """Positions sorting raw rows along the Hilbert curve."""
+    return np.argsort(hilbert_keys(rows[:, 1], rows[:, 2]), kind="stable")
+
+
+def open_text(path: str) -> IO[str]:
+    """Opens a text file, decompressing .gz and .zst files on the fly."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    if path.endswith(".zst"):
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+        return io.TextIOWrapper(reader)
+    return open(path, "r")
+
+
+def parse_init_lines(lines: list[str]) -> np.ndarray:
+    """
+    Integer array of the lines, one row per line. Lines whose operator or
+    coordinates aren't integers, like the #N/A coordinates, are skipped.
+    Flags other than "1" are read as 0.
+    """
+    try:
+        return np.loadtxt(lines, delimiter=";", dtype=np.int64, ndmin=2)
+    except ValueError:
+        rows = list()
+        for line in lines:
             fields = line.strip().split(";")
+            if len(fields) < INIT_COLUMNS:
+                continue
             try:
-                x = int(fields[1])
-                y = int(fields[2])
+                row = [int(field) for field in fields[:3]]
             except ValueError:
                 continue
-            init_data.append(operator(fields, transformer.transform(x, y)))
-    return init_data
+            rows.append(row + [int(field == "1") for field in fields[3:6]])
+        return np.array(rows, dtype=np.int64).reshape(-1, INIT_COLUMNS)
+
+
+def validate_init_rows(rows: np.ndarray) -> np.ndarray:
+    """
+    Reads flags other than 1 as 0, like the flags that aren't integers,
+    and drops the rows out of Lambert-93 bounds.
+    """
+    min_x, min_y, max_x, max_y = LAMBERT93_BOUNDS
+    rows[:, 3:] = rows[:, 3:] == 1
+    valid = (
+        (rows[:, 1] >= min_x)
+        & (rows[:, 1] <= max_x)
+        & (rows[:, 2] >= min_y)
+        & (rows[:, 2] <= max_y)
+    )
+    return rows[valid]
 
 
 def operator(fields: list, coordinates: tuple) -> dict:
-    is_2g = fields[3] == "1"
-    is_3g = fields[4] == "1"
-    is_4g = fields[5] == "1"
+    is_2g = fields[3] == 1
+    is_3g = fields[4] == 1
+    is_4g = fields[5] == 1
     return {
         "operator_id": fields[0],
         "latitude": coordinates[0],
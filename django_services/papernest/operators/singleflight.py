@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+class Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, the ones arriving while it runs wait and share its result or
+    exception.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.calls: dict[Hashable, Call] = dict()
+
+    def do(
+        self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Any:
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self.calls[key] = Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines of one event loop. Waiters are shielded, so
+    a cancelled request doesn't cancel the call the others are waiting on.
+    """
+
+    def __init__(self) -> None:
+        self.calls: dict[Hashable, asyncio.Future] = dict()
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[..., Awaitable[Any]],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        call = self.calls.get(key)
+        if call is None:
+            call = self.calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+            call.add_done_callback(lambda _: self.calls.pop(key, None))
+        return await asyncio.shield(call)
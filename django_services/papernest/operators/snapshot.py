@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+from django.conf import settings
+
+from .scripts.columnar import (
+    array_blocks,
+    columns_sha256,
+    map_columns,
+    read_header,
+    write_columns,
+)
+from .spatial_index import CoverageIndex
+
+# Snapshot of the in-memory index: its arrays, already sorted by cell, in
+# a columnar file workers memory map, sharing its pages
+MAGIC = b"CVGSNAP\x00"
+VERSION = 1
+COLUMNS: dict[str, np.dtype] = {
+    "keys": np.dtype("<i8"),
+    "x": np.dtype("<f8"),
+    "y": np.dtype("<f8"),
+    "operator_ids": np.dtype("<i4"),
+    "flags": np.dtype("u1"),
+}
+
+
+def snapshot_generation(path: str) -> Optional[int]:
+    """Generation of the snapshot, None when there is none."""
+    try:
+        return read_header(path, MAGIC)["generation"]
+    except FileNotFoundError:
+        return None
+
+
+def export_snapshot(
+    path: str, index: CoverageIndex, generation: int, dataset: str = ""
+) -> None:
+    """
+    Writes the index to a read-only snapshot. It is written next to the
+    path and renamed over it, so workers never map a partial file and the
+    ones still using the previous snapshot keep their mapping.
+    """
+    tmp = f"{path}.tmp"
+    write_columns(
+        tmp,
+        MAGIC,
+        {
+            "version": VERSION,
+            "generation": generation,
+            "dataset": dataset,
+            "cell_size": index.cell_size,
+            "operator_names": {
+                str(operator_id): name
+                for operator_id, name in index.operator_names.items()
+            },
+        },
+        COLUMNS,
+        len(index),
+        {name: array_blocks(getattr(index, name)) for name in COLUMNS},
+    )
+    os.chmod(tmp, 0o444)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path: str, verify: bool = True) -> CoverageIndex:
+    header = read_header(path, MAGIC)
+    if header["version"] != VERSION:
+        raise ValueError(
+            f"Unsupported coverage snapshot version {header['version']}"
+        )
+    columns = map_columns(path, header, COLUMNS)
+    if verify and columns_sha256(columns) != header["sha256"]:
+        raise ValueError(f"Checksum mismatch in {path}")
+    return CoverageIndex(
+        columns["keys"],
+        columns["x"],
+        columns["y"],
+        columns["operator_ids"],
+        columns["flags"],
+        {
+            int(operator_id): name
+            for operator_id, name in header["operator_names"].items()
+        },
+        header["cell_size"],
+        header["generation"],
+    )
+
+
+class SnapshotWatcher:
+    """
+    Index mapped from the snapshot. Its generation is checked at most once
+    per interval, and a new one is mapped in place of the current one
+    without restarting the worker.
+    """
+
+    def __init__(self, path: str, interval: float) -> None:
+        self.path = path
+        self.interval = interval
+        self.index: Optional[CoverageIndex] = None
+        self.checked = -float("inf")
+        self.lock = threading.Lock()
+
+    def get(self) -> Optional[CoverageIndex]:
+        """The current index, None while there is no snapshot."""
+        if time.monotonic() - self.checked < self.interval:
+            return self.index
+        with self.lock:
+            if time.monotonic() - self.checked >= self.interval:
+                generation = snapshot_generation(self.path)
+                if generation is not None and (
+                    self.index is None or generation != self.index.generation
+                ):
+                    self.index = load_snapshot(self.path)
+                self.checked = time.monotonic()
+        return self.index
+
+
+_snapshot_watcher: Optional[SnapshotWatcher] = None
+
+
+def get_snapshot_watcher() -> Optional[SnapshotWatcher]:
+    """Watcher of the COVERAGE_SNAPSHOT setting, None when it isn't set."""
+    global _snapshot_watcher
+    cfg = settings.COVERAGE_SNAPSHOT
+    if not cfg["PATH"]:
+        return None
+    if _snapshot_watcher is None or _snapshot_watcher.path != cfg["PATH"]:
+        _snapshot_watcher = SnapshotWatcher(cfg["PATH"], cfg["CHECK_INTERVAL"])
+    return _snapshot_watcher
@@ -0,0 +1,250 @@
+import math
+import threading
+import time
+from typing import NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db.models import IntegerField
+from django.db.models.expressions import RawSQL
+
+from .models import Operator, Coverage, CoverageDataset, coverage_model
+from .scripts.columnar import ColumnarCoverage
+
+
+class CoverageMatch(NamedTuple):
+    operator_id: int
+    operator_name: str
+    g2: bool
+    g3: bool
+    g4: bool
+    distance: float
+
+
+class CoverageIndex:
+    """
+    In-memory grid index over the Coverage table.
+
+    Points are kept in flat NumPy arrays sorted by grid cell, so a lookup
+    only scans the cells that intersect the search radius.
+    """
+
+    G2 = 1
+    G3 = 2
+    G4 = 4
+
+    CELL_OFFSET = 2**24
+    CELL_SPAN = 2**25
+
+    _instance: Optional["CoverageIndex"] = None
+    # Active dataset the instance was built from, and when it was checked
+    _dataset: Optional[int] = None
+    _checked = -float("inf")
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        keys: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        operator_ids: np.ndarray,
+        flags: np.ndarray,
+        operator_names: dict[int, str],
+        cell_size: float = Coverage.MAX_DIST_METERS,
+        generation: int = 0,
+    ) -> None:
+        """Arrays of the points sorted by cell key, see build."""
+        self.keys = keys
+        self.x = x
+        self.y = y
+        self.operator_ids = operator_ids
+        self.flags = flags
+        self.operator_names = operator_names
+        self.cell_size = float(cell_size)
+        # Snapshot the arrays were mapped from, if any
+        self.generation = generation
+
+    @classmethod
+    def build(
+        cls,
+        x: np.ndarray,
+        y: np.ndarray,
+        operator_ids: np.ndarray,
+        flags: np.ndarray,
+        operator_names: dict[int, str],
+        cell_size: float = Coverage.MAX_DIST_METERS,
+    ) -> "CoverageIndex":
+        keys = cls._cell_keys(
+            np.floor(x / cell_size).astype(np.int64),
+            np.floor(y / cell_size).astype(np.int64),
+        )
+        order = np.argsort(keys, kind="stable")
+        return cls(
+            keys[order],
+            np.ascontiguousarray(x[order], dtype=np.float64),
+            np.ascontiguousarray(y[order], dtype=np.float64),
+            np.ascontiguousarray(operator_ids[order], dtype=np.int32),
+            np.ascontiguousarray(flags[order], dtype=np.uint8),
+            operator_names,
+            cell_size,
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def get(cls) -> "CoverageIndex":
+        """
+        Return the index of this worker, building it on first use. The
+        active dataset is checked at most once per
+        COVERAGE_INDEX_CHECK_INTERVAL, and the index rebuilt once a
+        refresh, delta or rollback changed it. The other threads keep
+        answering from the current index meanwhile.
+        """
+        instance = cls._instance
+        interval = settings.COVERAGE_INDEX_CHECK_INTERVAL
+        if instance is not None and (
+            time.monotonic() - cls._checked < interval
+            or not cls._lock.acquire(blocking=False)
+        ):
+            return instance
+        if instance is None:
+            cls._lock.acquire()
+        try:
+            if (
+                cls._instance is None
+                or time.monotonic() - cls._checked >= interval
+            ):
+                active = CoverageDataset.active()
+                dataset = active.pk if active else None
+                if cls._instance is None or dataset != cls._dataset:
+                    cls._instance = cls.from_db()
+                    cls._dataset = dataset
+                cls._checked = time.monotonic()
+            return cls._instance
+        finally:
+            cls._lock.release()
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls._instance = None
+            cls._dataset = None
+            cls._checked = -float("inf")
+
+    @classmethod
+    def from_db(cls) -> "CoverageIndex":
+        model = coverage_model()
+        rows = model.objects.values_list(
+            model.OPERATOR_FIELD,
+            "geom",
+            RawSQL(model.flags_sql(), [], output_field=IntegerField()),
+        )
+
+        operator_ids = list()
+        x = list()
+        y = list()
+        flags = list()
+        for operator_id, geom, packed in rows.iterator():
+            operator_ids.append(operator_id)
+            x.append(geom.x)
+            y.append(geom.y)
+            flags.append(packed)
+
+        return cls.build(
+            np.array(x, dtype=np.float64),
+            np.array(y, dtype=np.float64),
+            np.array(operator_ids, dtype=np.int32),
+            np.array(flags, dtype=np.uint8),
+            dict(Operator.objects.values_list("id", "name")),
+        )
+
+    @classmethod
+    def from_columnar(cls, path: str) -> "CoverageIndex":
+        """Index of a processed coverage file, read without text parsing."""
+        coverage = ColumnarCoverage(path)
+        return cls.build(
+            coverage.x.astype(np.float64),
+            coverage.y.astype(np.float64),
+            coverage.operator_ids.astype(np.int32),
+            coverage.flags.astype(np.uint8),
+            dict(Operator.objects.values_list("id", "name")),
+        )
+
+    @classmethod
+    def pack_flags(cls, g2: bool, g3: bool, g4: bool) -> int:
+        return cls.G2 * bool(g2) | cls.G3 * bool(g3) | cls.G4 * bool(g4)
+
+    @classmethod
+    def _cell_keys(
+        cls, cx: np.ndarray, cy: Union[np.ndarray, int]
+    ) -> np.ndarray:
+        return (cx + cls.CELL_OFFSET) * cls.CELL_SPAN + (cy + cls.CELL_OFFSET)
+
+    @staticmethod
+    def project(coordinates: Tuple) -> Tuple[float, float]:
+        user_location = Coverage.lambert93(
+            Point(coordinates[1], coordinates[0], srid=Coverage.SRID_WGS84)
+        )
+        return user_location.x, user_location.y
+
+    def candidates(self, x: float, y: float, max_dist: float) -> np.ndarray:
+        """Return the positions of the points in the cells around (x, y)."""
+        reach = math.ceil(max_dist / self.cell_size)
+        cx = math.floor(x / self.cell_size)
+        cy = math.floor(y / self.cell_size)
+
+        columns = np.arange(cx - reach, cx + reach + 1, dtype=np.int64)
+        starts = np.searchsorted(
+            self.keys, self._cell_keys(columns, cy - reach), side="left"
+        )
+        ends = np.searchsorted(
+            self.keys, self._cell_keys(columns, cy + reach), side="right"
+        )
+        slices = [
+            np.arange(start, end)
+            for start, end in zip(starts, ends)
+            if end > start
+        ]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def closest(
+        self, coordinates: Tuple, max_dist: float = Coverage.MAX_DIST_METERS
+    ) -> list[CoverageMatch]:
+        """
+        Closest point per operator within max_dist of the (lat, lng)
+        coordinates, ordered by operator id like the SQL lookup.
+        """
+        x, y = self.project(coordinates)
+        positions = self.candidates(x, y, max_dist)
+
+        distances = np.hypot(self.x[positions] - x, self.y[positions] - y)
+        in_range = distances <= max_dist
+        positions = positions[in_range]
+        distances = distances[in_range]
+
+        order = np.lexsort((distances, self.operator_ids[positions]))
+        operator_ids = self.operator_ids[positions[order]]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = operator_ids[1:] != operator_ids[:-1]
+
+        matches = list()
+        for position, distance in zip(
+            positions[order][first], distances[order][first]
+        ):
+            flags = int(self.flags[position])
+            operator_id = int(self.operator_ids[position])
+            matches.append(
+                CoverageMatch(
+                    operator_id=operator_id,
+                    operator_name=self.operator_names[operator_id],
+                    g2=bool(flags & self.G2),
+                    g3=bool(flags & self.G3),
+                    g4=bool(flags & self.G4),
+                    distance=float(distance),
+                )
+            )
+        return matches
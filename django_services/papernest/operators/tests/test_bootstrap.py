@@ -0,0 +1,101 @@
+import io
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from management.bootstrap import migrations_fingerprint, static_fingerprint
+from management.models import BootstrapStep
+from operators.models import CompactCoverage, Coverage
+
+RAW_DATA = (
+    "Operateur;x;y;2G;3G;4G\n"
+    "20801;102980;6847973;1;1;0\n"
+    "20810;103113;6848661;0;0;1\n"
+)
+
+
+class FingerprintTest(SimpleTestCase):
+    def test_migrations_fingerprint(self):
+        self.assertEqual(migrations_fingerprint(), migrations_fingerprint())
+
+    def test_static_fingerprint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(STATICFILES_DIRS=[directory]):
+                before = static_fingerprint()
+                with open(os.path.join(directory, "site.css"), "w") as f:
+                    f.write("body {}")
+                self.assertNotEqual(static_fingerprint(), before)
+                self.assertEqual(static_fingerprint(), static_fingerprint())
+
+
+class BootstrapTest(TestCase):
+    def bootstrap(self, path: str) -> str:
+        out = io.StringIO()
+        call_command(
+            "bootstrap",
+            path=path,
+            skip=["migrate", "collectstatic"],
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_bootstrap(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "operators_cvg.csv")
+            with open(path, "w") as f:
+                f.write(RAW_DATA)
+            options = {
+                "path": path,
+                "username": "admin",
+                "email": "admin@example.com",
+                "password": "secret",
+                # Migrations already ran for the test database
+                "skip": ["migrate"],
+            }
+
+            with override_settings(
+                STATIC_ROOT=os.path.join(directory, "static")
+            ):
+                out = io.StringIO()
+                call_command("bootstrap", stdout=out, **options)
+                self.assertIn("init_db: done", out.getvalue())
+                self.assertIn("collectstatic: done", out.getvalue())
+                self.assertEqual(Coverage.objects.count(), 2)
+
+                out = io.StringIO()
+                call_command("bootstrap", stdout=out, **options)
+                for step in [
+                    "createcachetable",
+                    "superuser",
+                    "collectstatic",
+                    "init_db",
+                ]:
+                    self.assertIn(
+                        f"{step}: up to date, skipped", out.getvalue()
+                    )
+
+        self.assertEqual(
+            sorted(BootstrapStep.objects.values_list("name", flat=True)),
+            ["createcachetable", "init_db", "superuser"],
+        )
+
+    def test_bootstrap_reloads_coverage(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "operators_cvg.csv")
+            with open(path, "w") as f:
+                f.write(RAW_DATA)
+            self.assertIn("init_db: done", self.bootstrap(path))
+
+            with open(path, "a") as f:
+                f.write("20815;103114;6848664;1;0;0\n")
+            self.assertIn("init_db: done", self.bootstrap(path))
+            self.assertEqual(Coverage.objects.count(), 3)
+
+            with override_settings(COVERAGE_LAYOUT="compact"):
+                self.assertIn("init_db: done", self.bootstrap(path))
+                self.assertEqual(CompactCoverage.objects.count(), 3)
+                self.assertIn(
+                    "init_db: up to date, skipped", self.bootstrap(path)
+                )
@@ -0,0 +1,86 @@
+import io
+import tempfile
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from operators.datasets import indexes, live_table, previous_table
+from operators.models import Coverage, CoverageDataset
+
+RELEASES = {
+    "initial": (
+        "Operateur;x;y;2G;3G;4G\n"
+        "20801;102980;6847973;1;1;0\n"
+        "20810;103113;6848661;0;0;1\n"
+    ),
+    "2024-06": (
+        "Operateur;x;y;2G;3G;4G\n"
+        "20801;102980;6847973;1;1;1\n"
+        "20810;103113;6848661;0;0;1\n"
+        "20815;103114;6848664;1;0;0\n"
+    ),
+    "2024-07": (
+        "Operateur;x;y;2G;3G;4G\n"
+        "20801;103113;6848661;1;0;0\n"
+        "20820;102980;6847973;0;1;0\n"
+    ),
+}
+
+
+@skipUnless(connection.vendor == "postgresql", "Swaps need PostgreSQL")
+class RefreshCoverageTest(TestCase):
+    def setUp(self):
+        self.load("init_db", "initial")
+
+    def load(self, command: str, release: str) -> None:
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write(RELEASES[release])
+            f.flush()
+            options = {} if command == "init_db" else {"release": release}
+            call_command(command, path=f.name, stdout=io.StringIO(), **options)
+
+    def coverage_ids(self) -> list[int]:
+        return sorted(Coverage.objects.values_list("operator_id", flat=True))
+
+    def index_names(self, table: str) -> list[str]:
+        with connection.cursor() as cursor:
+            return sorted(name for name, _ in indexes(cursor, table))
+
+    def test_refresh_twice_and_rollback(self):
+        live_names = self.index_names(live_table())
+
+        self.load("refresh_coverage", "2024-06")
+        self.assertEqual(self.coverage_ids(), [20801, 20810, 20815])
+        # The previous table took the names of the staging table
+        self.assertEqual(
+            self.index_names(previous_table()),
+            [f"{name}_alt" for name in live_names],
+        )
+
+        self.load("refresh_coverage", "2024-07")
+        self.assertEqual(self.coverage_ids(), [20801, 20820])
+        self.assertEqual(self.index_names(live_table()), live_names)
+
+        call_command("refresh_coverage", rollback=True, stdout=io.StringIO())
+        self.assertEqual(self.coverage_ids(), [20801, 20810, 20815])
+        self.assertEqual(self.index_names(live_table()), live_names)
+        self.assertEqual(CoverageDataset.active().version, "2024-06")
+
+    def test_recluster_after_refresh(self):
+        live_names = self.index_names(live_table())
+        self.load("refresh_coverage", "2024-06")
+
+        call_command("recluster_coverage", stdout=io.StringIO())
+        self.assertEqual(self.coverage_ids(), [20801, 20810, 20815])
+        self.assertEqual(self.index_names(live_table()), live_names)
+        # The previous dataset keeps its parked names and can be restored
+        self.assertEqual(
+            self.index_names(previous_table()),
+            [f"{name}_prev" for name in live_names],
+        )
+
+        call_command("refresh_coverage", rollback=True, stdout=io.StringIO())
+        self.assertEqual(self.coverage_ids(), [20801, 20810])
+        self.assertEqual(self.index_names(live_table()), live_names)
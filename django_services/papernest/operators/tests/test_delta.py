@@ -0,0 +1,117 @@
+import io
+import tempfile
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from operators.delta import coverage_keys, diff, key_rows
+from operators.models import Coverage, CoverageDataset, Operator
+from operators.scripts.columnar import pack_flags
+
+RAW_DATA = (
+    "Operateur;x;y;2G;3G;4G\n"
+    "20801;102980;6847973;1;1;0\n"
+    "20810;103113;6848661;0;0;1\n"
+    "20820;103114;6848664;1;1;1\n"
+)
+
+NEW_RAW_DATA = (
+    "Operateur;x;y;2G;3G;4G\n"
+    "20801;102980;6847973;1;1;0\n"
+    "20810;103113;6848661;1;0;1\n"
+    "20815;1313632;7230727;0;1;0\n"
+)
+
+
+class DiffTest(SimpleTestCase):
+    def test_keys(self):
+        rows = np.array(
+            [
+                [20801, 102980, 6847973, 1, 1, 0],
+                [20815, -357823, 6037008, 0, 0, 1],
+                [20820, 1313632, 7230727, 1, 0, 1],
+            ]
+        )
+        keys = coverage_keys(rows[:, 0], rows[:, 1], rows[:, 2])
+        flags = pack_flags(rows[:, 3:])
+        self.assertEqual(flags.tolist(), [3, 4, 5])
+        np.testing.assert_array_equal(key_rows(keys, flags), rows)
+
+        # Coordinates read back from the database are rounded to the meter
+        self.assertEqual(
+            coverage_keys(rows[:1, 0], np.array([102980.4]), rows[:1, 2]),
+            keys[:1],
+        )
+
+    def test_diff(self):
+        ids = np.array([1, 2, 3, 4, 5])
+        keys = np.array([10, 20, 20, 30, 40])
+        flags = np.array([1, 2, 2, 3, 4], dtype=np.uint8)
+        new_keys = np.array([10, 20, 30, 30, 50])
+        new_flags = np.array([1, 6, 3, 3, 7], dtype=np.uint8)
+
+        delta = diff(ids, keys, flags, new_keys, new_flags)
+
+        # Duplicated points are paired in order
+        self.assertEqual(delta.deletes.tolist(), [3, 5])
+        self.assertEqual(delta.updates.tolist(), [2])
+        self.assertEqual(delta.flags.tolist(), [6])
+        self.assertEqual(
+            coverage_keys(
+                delta.inserts[:, 0], delta.inserts[:, 1], delta.inserts[:, 2]
+            ).tolist(),
+            [30, 50],
+        )
+        self.assertEqual(pack_flags(delta.inserts[:, 3:]).tolist(), [3, 7])
+
+    def test_diff_unchanged(self):
+        keys = np.array([10, 20])
+        flags = np.array([1, 2], dtype=np.uint8)
+        delta = diff(np.array([1, 2]), keys, flags, keys, flags)
+        self.assertEqual(str(delta), "0 inserts, 0 deletes, 0 updates")
+
+
+class RefreshCoverageDeltaTest(TestCase):
+    def test_refresh_coverage_delta(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write(RAW_DATA)
+            f.flush()
+            call_command("init_db", path=f.name, stdout=io.StringIO())
+        unchanged = Coverage.objects.get(operator_id=20801).id
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write(NEW_RAW_DATA)
+            f.flush()
+            out = io.StringIO()
+            call_command(
+                "refresh_coverage",
+                path=f.name,
+                release="2024-06",
+                delta=True,
+                stdout=out,
+            )
+        self.assertIn("1 inserts, 1 deletes, 1 updates", out.getvalue())
+
+        self.assertEqual(Operator.objects.count(), 4)
+        coverages = Coverage.objects.order_by("operator_id")
+        self.assertEqual(
+            [
+                (cvg.operator_id_id, cvg.g2, cvg.g3, cvg.g4)
+                for cvg in coverages
+            ],
+            [
+                (20801, True, True, False),
+                (20810, True, False, True),
+                (20815, False, True, False),
+            ],
+        )
+        self.assertEqual(coverages[0].id, unchanged)
+        self.assertEqual(coverages[2].geom.coords, (1313632, 7230727))
+
+        dataset = CoverageDataset.active()
+        self.assertEqual((dataset.version, dataset.rows), ("2024-06", 3))
+        self.assertEqual(
+            CoverageDataset.objects.get(version="initial").status,
+            CoverageDataset.RETIRED,
+        )
@@ -0,0 +1,124 @@
+import gzip
+import io
+import os
+import tempfile
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from operators.models import (
+    Operator,
+    Coverage,
+    CompactCoverage,
+    CoverageDataset,
+)
+from operators.scripts.columnar import write_columnar
+from operators.scripts.utils import hilbert_keys, read_init_chunks
+
+RAW_DATA = (
+    "Operateur;x;y;2G;3G;4G\n"
+    "20801;102980;6847973;1;1;0\n"
+    "20810;103113;6848661;0;0;1\n"
+    "20815;#N/A;#N/A;0;1;0\n"
+    "20815;103113;6848661;2;0;1\n"
+    "99999;103114;6848664;1;1;1\n"
+    "20820;103114;6848664;1;1;1\n"
+)
+
+
+class InitDBTest(TestCase):
+    def test_init_db(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv.gz") as f:
+            f.write(gzip.compress(RAW_DATA.encode()))
+            f.flush()
+
+            out = io.StringIO()
+            call_command("init_db", path=f.name, batch_size=2, stdout=out)
+            self.assertIn("with 4 coverages", out.getvalue())
+
+            # Idempotent
+            call_command("init_db", path=f.name, stdout=io.StringIO())
+
+        self.assertEqual(Operator.objects.count(), 4)
+        dataset = CoverageDataset.active()
+        self.assertEqual((dataset.version, dataset.rows), ("initial", 4))
+        coverages = Coverage.objects.order_by("operator_id")
+        self.assertEqual(
+            [
+                (cvg.operator_id_id, cvg.g2, cvg.g3, cvg.g4)
+                for cvg in coverages
+            ],
+            [
+                (20801, True, True, False),
+                (20810, False, False, True),
+                # Unknown flags read as 0
+                (20815, False, False, True),
+                (20820, True, True, True),
+            ],
+        )
+
+        # Lambert-93 coordinates are stored as read
+        self.assertEqual(coverages[0].geom.coords, (102980, 6847973))
+        self.assertAlmostEqual(coverages[0].location.y, 48.45657456, 6)
+        self.assertAlmostEqual(coverages[0].location.x, -5.08885612, 6)
+
+    def test_init_db_columnar(self):
+        with tempfile.TemporaryDirectory() as directory:
+            raw = os.path.join(directory, "operators_cvg.csv")
+            with open(raw, "w") as f:
+                f.write(RAW_DATA)
+            processed = os.path.join(directory, "operators_cvg.cvg")
+            write_columnar(processed, read_init_chunks(raw))
+
+            out = io.StringIO()
+            call_command("init_db", path=processed, stdout=out)
+            self.assertIn("with 4 coverages", out.getvalue())
+
+        coverage = Coverage.objects.get(operator_id=20810)
+        self.assertEqual(coverage.geom.coords, (103113, 6848661))
+        self.assertEqual(
+            (coverage.g2, coverage.g3, coverage.g4), (False, False, True)
+        )
+
+    def test_init_db_cluster(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write(RAW_DATA)
+            f.flush()
+            call_command(
+                "init_db", path=f.name, cluster=True, stdout=io.StringIO()
+            )
+
+        points = np.array(
+            [cvg.geom.coords for cvg in Coverage.objects.order_by("id")]
+        )
+        keys = hilbert_keys(points[:, 0], points[:, 1])
+        self.assertEqual(len(keys), 4)
+        self.assertTrue(np.all(np.diff(keys) >= 0))
+
+    @override_settings(COVERAGE_LAYOUT="compact")
+    def test_init_db_compact(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write(RAW_DATA)
+            f.flush()
+            call_command("init_db", path=f.name, stdout=io.StringIO())
+
+        self.assertFalse(Coverage.objects.exists())
+        coverages = CompactCoverage.objects.order_by("operator")
+        self.assertEqual(
+            [(cvg.operator, cvg.flags) for cvg in coverages],
+            [(20801, 3), (20810, 4), (20815, 4), (20820, 7)],
+        )
+        self.assertEqual(coverages[0].geom.coords, (102980, 6847973))
+
+        cvgs = CompactCoverage.get_closest_coverage(
+            (coverages[3].location.y, coverages[3].location.x)
+        )
+        self.assertEqual(
+            [(cvg.operator_name, cvg.g2, cvg.g3, cvg.g4) for cvg in cvgs],
+            [
+                ("SFR", False, False, True),
+                ("Free", False, False, True),
+                ("Bouygue", True, True, True),
+            ],
+        )
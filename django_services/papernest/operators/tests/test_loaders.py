@@ -0,0 +1,54 @@
+import numpy as np
+from django.contrib.gis.geos import GEOSGeometry, Point
+from django.test import SimpleTestCase
+
+from operators.loaders import CompactCopyCoverageLoader, ewkb_points
+from operators.models import Coverage, CompactCoverage
+
+
+class LoadersTest(SimpleTestCase):
+    def test_ewkb_points(self):
+        x = np.array([102980, 700000.5])
+        y = np.array([6847973, 6600000.25])
+        hexed = ewkb_points(x, y, Coverage.SRID_LAMBERT93)
+
+        self.assertEqual(len(hexed), 2)
+        for i, value in enumerate(hexed):
+            expected = Point(x[i], y[i], srid=Coverage.SRID_LAMBERT93)
+            self.assertEqual(value.upper(), expected.hexewkb.decode())
+            point = GEOSGeometry(value)
+            self.assertEqual(point.srid, Coverage.SRID_LAMBERT93)
+            self.assertEqual(point.coords, (x[i], y[i]))
+
+    def test_compact_encode(self):
+        chunk = np.array(
+            [
+                [20801, 102980, 6847973, 1, 1, 0],
+                [20820, 103114, 6848664, 0, 0, 1],
+            ]
+        )
+        data, rows = CompactCopyCoverageLoader.encode(chunk)
+
+        self.assertEqual(rows, 2)
+        lines = [line.split("\t") for line in data.splitlines()]
+        self.assertEqual(
+            [(operator, flags) for operator, _, flags in lines],
+            [("20801", "3"), ("20820", "4")],
+        )
+        self.assertEqual(GEOSGeometry(lines[0][1]).coords, (102980, 6847973))
+
+        chunk[0, 0] = 99999
+        with self.assertRaises(ValueError):
+            CompactCopyCoverageLoader.encode(chunk)
+
+    def test_compact_flags(self):
+        coverage = CompactCoverage(
+            operator=20801,
+            geom=Point(102980, 6847973, srid=CompactCoverage.SRID_LAMBERT93),
+            flags=5,
+        )
+        self.assertEqual(
+            (coverage.g2, coverage.g3, coverage.g4), (True, False, True)
+        )
+        self.assertEqual(coverage.operator_id_id, 20801)
+        self.assertAlmostEqual(coverage.location.y, 48.45657456, 6)
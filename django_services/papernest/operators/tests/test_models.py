@@ -1,9 +1,9 @@
 import csv
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from django.contrib.gis.geos import Point
 
-from operators.models import Operator, Coverage
+from operators.models import CompactCoverage, Coverage, Operator
 from operators.scripts.utils import skip_comments
 
 
@@ -89,3 +89,13 @@ class CoverageTest(TestCase):
         second_coordinates = [-5.073201994866753, 48.45]
         second_close_cvgs = Coverage.get_closest_coverage(second_coordinates)
         self.assertEqual(len(second_close_cvgs), 0)
+
+
+class FlagsTest(SimpleTestCase):
+    def test_flags(self):
+        self.assertIn("CAST(g4 AS INTEGER)", Coverage.flags_sql())
+        self.assertEqual(
+            Coverage.flag_values(5), {"g2": True, "g3": False, "g4": True}
+        )
+        self.assertEqual(CompactCoverage.flags_sql(), "flags")
+        self.assertEqual(CompactCoverage.flag_values(5), {"flags": 5})
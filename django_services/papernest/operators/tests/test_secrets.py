@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from papernest.secrets import (
+    EnvSecrets,
+    LocalSecrets,
+    SSMSecrets,
+    get_secrets,
+    set_secrets,
+)
+
+VALUES = {"admin_db_password": "db", "superuser_password": "admin"}
+
+
+class CountingSSMSecrets(SSMSecrets):
+    """SSMSecrets counting its calls to SSM instead of making them."""
+
+    fetches = 0
+
+    def fetch(self) -> dict[str, str]:
+        CountingSSMSecrets.fetches += 1
+        return VALUES
+
+
+class SSMSecretsTest(SimpleTestCase):
+    def setUp(self):
+        CountingSSMSecrets.fetches = 0
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "passwords.json")
+
+    def test_fetched_once_per_task(self):
+        first = CountingSSMSecrets("passwords", self.path)
+        self.assertEqual(first.get("admin_db_password"), "db")
+        self.assertEqual(first.get("superuser_password"), "admin")
+        # Later processes of the task read the cache
+        second = CountingSSMSecrets("passwords", self.path)
+        self.assertEqual(second.get("admin_db_password"), "db")
+        self.assertEqual(CountingSSMSecrets.fetches, 1)
+
+    def test_cache_readable_by_its_user_only(self):
+        CountingSSMSecrets("passwords", self.path).get("admin_db_password")
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), VALUES)
+
+    def test_corrupt_cache_fetched_again(self):
+        with open(self.path, "w") as f:
+            f.write("{")
+        secrets = CountingSSMSecrets("passwords", self.path)
+        self.assertEqual(secrets.get("superuser_password"), "admin")
+        self.assertEqual(CountingSSMSecrets.fetches, 1)
+
+
+class GetSecretsTest(SimpleTestCase):
+    def setUp(self):
+        set_secrets(None)
+        self.addCleanup(set_secrets, None)
+
+    def test_env_without_parameter(self):
+        with mock.patch.dict(os.environ, {"DB_PASSWORD": "db"}):
+            os.environ.pop("PSS_PARAM_NAME", None)
+            secrets = get_secrets()
+            self.assertIsInstance(secrets, EnvSecrets)
+            self.assertEqual(secrets.get("admin_db_password"), "db")
+
+    def test_ssm_with_parameter(self):
+        environment = {
+            "PSS_PARAM_NAME": "papernest_passwords",
+            "SECRETS_CACHE_PATH": "/tmp/passwords.json",
+        }
+        with mock.patch.dict(os.environ, environment):
+            secrets = get_secrets()
+        self.assertIsInstance(secrets, SSMSecrets)
+        self.assertEqual(secrets.cache_path, "/tmp/passwords.json")
+        self.assertIs(get_secrets(), secrets)
+
+    def test_local_stand_in(self):
+        set_secrets(LocalSecrets(VALUES))
+        self.assertEqual(get_secrets().get("superuser_password"), "admin")
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+
+from operators.singleflight import AsyncSingleFlight, SingleFlight
+
+
+class SingleFlightTest(SimpleTestCase):
+    def test_do(self):
+        flight = SingleFlight()
+        started = threading.Barrier(9)
+        release = threading.Event()
+        calls = list()
+
+        def compute(value):
+            calls.append(value)
+            release.wait(5)
+            return value * 2
+
+        def request():
+            started.wait(5)
+            return flight.do("key", compute, 21)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(request) for _ in range(8)]
+            started.wait(5)
+            # Let every caller join the flight before it lands
+            time.sleep(0.1)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(calls, [21])
+        self.assertEqual(flight.calls, dict())
+
+        # A finished flight is not reused
+        self.assertEqual(flight.do("key", compute, 1), 2)
+
+    def test_do_error(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError("geocoder down")
+
+        with self.assertRaises(ValueError):
+            flight.do("key", fail)
+        self.assertEqual(flight.calls, dict())
+
+
+class AsyncSingleFlightTest(SimpleTestCase):
+    def test_do(self):
+        flight = AsyncSingleFlight()
+        calls = list()
+
+        async def compute(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value * 2
+
+        async def main():
+            return await asyncio.gather(
+                *[flight.do("key", compute, 21) for _ in range(8)]
+            )
+
+        self.assertEqual(asyncio.run(main()), [42] * 8)
+        self.assertEqual(calls, [21])
+        self.assertEqual(flight.calls, dict())
+
+    def test_do_cancelled_waiter(self):
+        flight = AsyncSingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            return "done"
+
+        async def main():
+            first = asyncio.ensure_future(flight.do("key", compute))
+            second = asyncio.ensure_future(flight.do("key", compute))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(main()), "done")
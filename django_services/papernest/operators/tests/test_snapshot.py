@@ -0,0 +1,111 @@
+import io
+import os
+import tempfile
+
+import numpy as np
+from django.contrib.gis.geos import Point
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from operators.backends import MemoryCoverageBackend
+from operators.models import Coverage, Operator
+from operators.scripts.utils import CoordTransformer
+from operators.snapshot import (
+    SnapshotWatcher,
+    export_snapshot,
+    load_snapshot,
+    snapshot_generation,
+)
+from operators.spatial_index import CoverageIndex
+
+OPERATOR_NAMES = {20801: "Orange", 20810: "SFR"}
+
+
+def build_index(g4: bool) -> CoverageIndex:
+    return CoverageIndex.build(
+        np.array([651800.0, 651900.0, 700000.0]),
+        np.array([6862500.0, 6862500.0, 6600000.0]),
+        np.array([20801, 20810, 20801]),
+        np.array([3, 4 if g4 else 0, 1]),
+        OPERATOR_NAMES,
+    )
+
+
+class SnapshotTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "coverage.snapshot")
+        self.coordinates = CoordTransformer().transform(651850, 6862550)
+
+    def test_export_snapshot(self):
+        self.assertIsNone(snapshot_generation(self.path))
+        index = build_index(g4=True)
+        export_snapshot(self.path, index, 3, "2024-06")
+
+        self.assertEqual(snapshot_generation(self.path), 3)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o444)
+        snapshot = load_snapshot(self.path)
+        self.assertEqual(snapshot.generation, 3)
+        self.assertIsInstance(snapshot.x, np.memmap)
+        self.assertEqual(snapshot.operator_names, OPERATOR_NAMES)
+        self.assertEqual(
+            snapshot.closest(self.coordinates), index.closest(self.coordinates)
+        )
+
+    def test_watcher(self):
+        watcher = SnapshotWatcher(self.path, interval=0)
+        self.assertIsNone(watcher.get())
+
+        export_snapshot(self.path, build_index(g4=True), 1)
+        first = watcher.get()
+        self.assertTrue(first.closest(self.coordinates)[1].g4)
+        self.assertIs(watcher.get(), first)
+
+        # Workers move to a new generation, the old mapping stays usable
+        export_snapshot(self.path, build_index(g4=False), 2)
+        second = watcher.get()
+        self.assertEqual(second.generation, 2)
+        self.assertFalse(second.closest(self.coordinates)[1].g4)
+        self.assertTrue(first.closest(self.coordinates)[1].g4)
+
+        # Not checked again before the interval
+        watcher.interval = 3600
+        export_snapshot(self.path, build_index(g4=True), 3)
+        self.assertIs(watcher.get(), second)
+
+
+class ExportCoverageSnapshotTest(TestCase):
+    def test_export_coverage_snapshot(self):
+        Operator.objects.create(id=20801, name="Orange")
+        Operator.objects.create(id=20810, name="SFR")
+        transformer = CoordTransformer()
+        for operator_id, x in [(20801, 651800), (20810, 651900)]:
+            lat, lng = transformer.transform(x, 6862500)
+            Coverage.objects.create(
+                operator_id_id=operator_id,
+                location=Point(lng, lat, srid=Coverage.SRID_WGS84),
+                geom=Point(x, 6862500, srid=Coverage.SRID_LAMBERT93),
+                g2=True,
+                g3=True,
+                g4=operator_id == 20810,
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "coverage.snapshot")
+            for generation in [1, 2]:
+                out = io.StringIO()
+                call_command("export_coverage_snapshot", path=path, stdout=out)
+                self.assertIn(f"generation {generation}", out.getvalue())
+
+            coordinates = transformer.transform(651850, 6862550)
+            with override_settings(
+                COVERAGE_SNAPSHOT={"PATH": path, "CHECK_INTERVAL": 0}
+            ):
+                self.assertEqual(
+                    MemoryCoverageBackend().closest(coordinates),
+                    {
+                        "Orange": {"2G": True, "3G": True, "4G": False},
+                        "SFR": {"2G": True, "3G": True, "4G": True},
+                    },
+                )
@@ -0,0 +1,110 @@
+import csv
+import math
+import os
+import tempfile
+
+import numpy as np
+
+from django.test import TestCase, override_settings
+from django.contrib.gis.geos import Point
+
+from operators.models import Operator, Coverage, CoverageDataset
+from operators.backends import SQLCoverageBackend, MemoryCoverageBackend
+from operators.spatial_index import CoverageIndex
+from operators.scripts.columnar import write_columnar
+from operators.scripts.utils import CoordTransformer, skip_comments
+
+
+class CoverageIndexTest(TestCase):
+    def setUp(self):
+        Operator.objects.create(id=20801, name="Orange")
+        Operator.objects.create(id=20810, name="SFR")
+        Operator.objects.create(id=20815, name="Free")
+        Operator.objects.create(id=20820, name="Bouygue")
+
+        with open("operators/tests/data/operators_cvg_processed.csv") as f:
+            reader = csv.DictReader(skip_comments(f))
+
+            for coverage in reader:
+                operator_id = coverage["operator_id"]
+                coverage.pop("operator_id")
+                location = Point(
+                    float(coverage["longitude"]),
+                    float(coverage["latitude"]),
+                    srid=Coverage.SRID_WGS84,
+                )
+                coverage.pop("latitude")
+                coverage.pop("longitude")
+
+                Coverage.objects.create(
+                    operator_id=Operator.objects.get(id=operator_id),
+                    location=location,
+                    **coverage
+                )
+
+        CoverageIndex.reset()
+        self.addCleanup(CoverageIndex.reset)
+
+    def test_same_results_as_sql(self):
+        sql_backend = SQLCoverageBackend()
+        memory_backend = MemoryCoverageBackend()
+
+        # Close to every point, far from each other
+        for coordinates in [
+            (48.86805465377864, 2.3289499313178696),
+            (48.8691, 2.3301),
+            (48.8665, 2.3270),
+            (48.45, -5.073201994866753),
+        ]:
+            self.assertEqual(
+                memory_backend.closest(coordinates),
+                sql_backend.closest(coordinates),
+            )
+
+    def test_closest(self):
+        index = CoverageIndex.get()
+        self.assertEqual(len(index), 3)
+
+        matches = index.closest((48.86805465377864, 2.3289499313178696))
+        self.assertEqual(
+            [match.operator_id for match in matches], [20801, 20810, 20815]
+        )
+        self.assertEqual(
+            (matches[0].g2, matches[0].g3, matches[0].g4), (True, True, False)
+        )
+        self.assertTrue(
+            all(
+                match.distance <= Coverage.MAX_DIST_METERS for match in matches
+            )
+        )
+
+        self.assertEqual(index.closest((48.45, -5.073201994866753)), [])
+
+    @override_settings(COVERAGE_INDEX_CHECK_INTERVAL=0)
+    def test_rebuilt_after_new_dataset(self):
+        index = CoverageIndex.get()
+        self.assertIs(CoverageIndex.get(), index)
+
+        Coverage.objects.filter(operator_id=20815).delete()
+        CoverageDataset.objects.create(version="2024-06", checksum="")
+        self.assertEqual(len(CoverageIndex.get()), 2)
+
+    def test_from_columnar(self):
+        rows = np.array(
+            [
+                [20801, 651800, 6862500, 1, 1, 0],
+                [20810, 651900, 6862500, 0, 0, 1],
+            ]
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "coverage.cvg")
+            write_columnar(path, [rows])
+            index = CoverageIndex.from_columnar(path)
+
+        self.assertEqual(len(index), 2)
+        matches = index.closest(CoordTransformer().transform(651850, 6862550))
+        self.assertEqual(
+            [(match.operator_id, match.g4) for match in matches],
+            [(20801, False), (20810, True)],
+        )
+        self.assertAlmostEqual(matches[0].distance, math.hypot(50, 50), 3)
@@ -1,11 +1,17 @@
 import csv
 import json
+from unittest import mock
 
-from django.test import TestCase
+import httpx
+import requests
+
+from django.test import RequestFactory, TestCase, TransactionTestCase
 from django.contrib.gis.geos import Point
 from django.urls import reverse
 
 from operators.models import Operator, Coverage
+from operators.requests import AddressNotFound, GeocoderError
+from operators.views import operators_cvg_async
 from operators.scripts.utils import skip_comments
 
 
@@ -77,3 +83,158 @@ class OperatorsCvgTest(TestCase):
         self.assertEqual(
             json.loads(third_response.content), third_expected_results
         )
+
+    @mock.patch("operators.views.get_coordinates")
+    def test_address_not_found(self, get_coordinates):
+        get_coordinates.side_effect = AddressNotFound("nowhere")
+
+        response = self.client.get(
+            reverse("operators:operators_coverage"), {"q": "nowhere"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @mock.patch("operators.views.get_coordinates")
+    def test_geocoder_errors(self, get_coordinates):
+        url = reverse("operators:operators_coverage")
+        get_coordinates.side_effect = requests.Timeout()
+        response = self.client.get(url, {"q": "Paris"})
+        self.assertEqual(response.status_code, 504)
+
+        get_coordinates.side_effect = requests.HTTPError()
+        response = self.client.get(url, {"q": "Paris"})
+        self.assertEqual(response.status_code, 502)
+
+        get_coordinates.side_effect = GeocoderError()
+        response = self.client.get(url, {"q": "Paris"})
+        self.assertEqual(response.status_code, 502)
+
+    def test_get_closest_coverage_batch(self):
+        url = reverse("operators:operators_coverage_batch")
+
+        # Test GET is not available
+        first_response = self.client.get(url)
+        self.assertEqual(first_response.status_code, 405)
+
+        # Test malformed body
+        second_response = self.client.post(
+            url, "not json", content_type="application/json"
+        )
+        self.assertEqual(second_response.status_code, 400)
+
+        # Test results keep the order of the items, with per item errors
+        third_data = {
+            "items": [
+                {"lat": 48.45, "lon": -5.073201994866753},
+                {"lat": 148.86805465377864, "lon": 2.3289499313178696},
+                "42 rue papernest 75011 Paris",
+                {"lat": 48.86805465377864, "lon": 2.3289499313178696},
+            ]
+        }
+        third_response = self.client.post(
+            url, third_data, content_type="application/json"
+        )
+        self.assertEqual(third_response.status_code, 200)
+
+        third_results = json.loads(third_response.content)["results"]
+        self.assertEqual(len(third_results), 4)
+        self.assertEqual(third_results[0], {"coverage": {}})
+        self.assertIn("error", third_results[1])
+        self.assertIn("error", third_results[2])
+        self.assertEqual(
+            third_results[3],
+            {
+                "coverage": {
+                    "Orange": {"2G": True, "3G": True, "4G": False},
+                    "SFR": {"2G": False, "3G": False, "4G": False},
+                    "Free": {"2G": True, "3G": False, "4G": True},
+                }
+            },
+        )
+
+    def test_get_closest_coverage_coordinates(self):
+        url = reverse("operators:operators_coverage")
+
+        # Test invalid coordinates and radius
+        for data in [
+            {"lat": 48.86805465377864},
+            {"lat": "north", "lon": 2.3289499313178696},
+            {"lat": 148.86805465377864, "lon": 2.3289499313178696},
+            {"lat": 48.86805465377864, "lon": 2.3289499313178696, "radius": 0},
+        ]:
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, 400)
+
+        # Test correct call, without geocoding
+        first_data = {"lat": 48.86805465377864, "lon": 2.3289499313178696}
+        first_response = self.client.get(url, first_data)
+        self.assertEqual(first_response.status_code, 200)
+        self.assertEqual(
+            json.loads(first_response.content),
+            {
+                "Orange": {"2G": True, "3G": True, "4G": False},
+                "SFR": {"2G": False, "3G": False, "4G": False},
+                "Free": {"2G": True, "3G": False, "4G": True},
+            },
+        )
+
+        # Test smaller radius only reaches the closest points
+        second_data = {**first_data, "radius": 80}
+        second_response = self.client.get(url, second_data)
+        self.assertEqual(
+            json.loads(second_response.content),
+            {
+                "Orange": {"2G": True, "3G": True, "4G": False},
+                "Free": {"2G": True, "3G": False, "4G": True},
+            },
+        )
+
+
+class OperatorsCvgAsyncTest(TransactionTestCase):
+    """
+    The async view looks coverages up in threads with connections of their
+    own, which only see committed rows.
+    """
+
+    setUp = OperatorsCvgTest.setUp
+
+    async def test_get_closest_coverage_async(self):
+        url = reverse("operators:operators_coverage")
+        factory = RequestFactory()
+
+        # Test POST is not available
+        first_response = await operators_cvg_async(factory.post(url))
+        self.assertEqual(first_response.status_code, 405)
+
+        # Test missing required parameter
+        second_response = await operators_cvg_async(factory.get(url))
+        self.assertEqual(second_response.status_code, 400)
+
+        # Test correct call, without geocoding
+        third_data = {"lat": 48.86805465377864, "lon": 2.3289499313178696}
+        third_response = await operators_cvg_async(
+            factory.get(url, third_data)
+        )
+        self.assertEqual(third_response.status_code, 200)
+        self.assertEqual(
+            json.loads(third_response.content),
+            {
+                "Orange": {"2G": True, "3G": True, "4G": False},
+                "SFR": {"2G": False, "3G": False, "4G": False},
+                "Free": {"2G": True, "3G": False, "4G": True},
+            },
+        )
+
+    @mock.patch("operators.views.aget_coordinates")
+    async def test_geocoder_errors_async(self, aget_coordinates):
+        request = RequestFactory().get(
+            reverse("operators:operators_coverage"), {"q": "nowhere"}
+        )
+        for error, status in [
+            (AddressNotFound("nowhere"), 404),
+            (httpx.ReadTimeout("timeout"), 504),
+            (httpx.ConnectError("refused"), 502),
+            (GeocoderError(), 502),
+        ]:
+            aget_coordinates.side_effect = error
+            response = await operators_cvg_async(request)
+            self.assertEqual(response.status_code, status)
@@ -1,12 +1,24 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import (
     IndexView,
     operators_cvg,
+    operators_cvg_async,
+    operators_cvg_batch,
 )
 
 app_name = "operators"
 urlpatterns = [
     path("", IndexView.as_view(), name="operators"),
-    path("coverage/", operators_cvg, name="operators_coverage"),
+    path(
+        "coverage/",
+        operators_cvg_async if settings.ASYNC_VIEWS else operators_cvg,
+        name="operators_coverage",
+    ),
+    path(
+        "coverage/batch/",
+        operators_cvg_batch,
+        name="operators_coverage_batch",
+    ),
 ]
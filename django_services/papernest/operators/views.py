@@ -1,14 +1,33 @@
+import json
+from typing import Optional, Tuple
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
 from django.views import generic
+from django.views.decorators.csrf import csrf_exempt
 from django.db.models import QuerySet
 from django.http import (
+    HttpResponse,
     JsonResponse,
     HttpRequest,
     HttpResponseNotAllowed,
     HttpResponseBadRequest,
+    HttpResponseNotFound,
 )
 
-from .requests import get_coordinates
-from .models import Operator, Coverage
+from .requests import (
+    AddressNotFound,
+    GeocoderError,
+    aget_coordinates,
+    get_coordinates,
+    get_coordinates_batch,
+)
+from .models import Operator
+from .backends import get_coverage_backend
+from .forms import RadiusForm, CoordinatesForm
 
 
 class IndexView(generic.ListView):
@@ -21,21 +40,155 @@ class IndexView(generic.ListView):
 
 
 def operators_cvg(request: HttpRequest) -> JsonResponse:
+    """
+    Coverage around the address in "q", or around the "lat"/"lon"
+    coordinates, which skips geocoding. "radius" optionally sets the search
+    distance in meters.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    form = coverage_form(request)
+    if form is None:
+        return HttpResponseBadRequest("Missing required parameter: 'q'")
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors_text())
+
+    if isinstance(form, CoordinatesForm):
+        coordinates = form.cleaned_coordinates()
+    else:
+        try:
+            coordinates = get_coordinates(request.GET["q"])
+        except AddressNotFound:
+            return HttpResponseNotFound("Address not found")
+        except requests.Timeout:
+            return HttpResponse("Geocoding service timed out", status=504)
+        except (requests.RequestException, GeocoderError):
+            return HttpResponse("Geocoding service unavailable", status=502)
+
+    response = get_coverage_backend().closest(
+        coordinates, form.cleaned_radius()
+    )
+
+    return JsonResponse(response)
+
+
+async def operators_cvg_async(request: HttpRequest) -> JsonResponse:
+    """
+    Same as operators_cvg, for ASGI servers: geocoding awaits the API
+    instead of holding a worker, the ORM lookup runs in a thread pool.
+    """
     if request.method != "GET":
         return HttpResponseNotAllowed(["GET"])
-    query = request.GET.get("q")
-    if query is None:
+    form = coverage_form(request)
+    if form is None:
         return HttpResponseBadRequest("Missing required parameter: 'q'")
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors_text())
 
-    coordinates = get_coordinates(query)
-    closest_cvgs = Coverage.get_closest_coverage(coordinates)
+    if isinstance(form, CoordinatesForm):
+        coordinates = form.cleaned_coordinates()
+    else:
+        try:
+            coordinates = await aget_coordinates(request.GET["q"])
+        except AddressNotFound:
+            return HttpResponseNotFound("Address not found")
+        except httpx.TimeoutException:
+            return HttpResponse("Geocoding service timed out", status=504)
+        except (httpx.HTTPError, GeocoderError):
+            return HttpResponse("Geocoding service unavailable", status=502)
 
-    response = dict()
-    for cvg in closest_cvgs:
-        response[cvg.operator_id.name] = {
-            "2G": cvg.g2,
-            "3G": cvg.g3,
-            "4G": cvg.g4,
-        }
+    # Read-only, lookups of concurrent requests run in parallel threads
+    response = await sync_to_async(closest_coverage, thread_sensitive=False)(
+        coordinates, form.cleaned_radius()
+    )
 
     return JsonResponse(response)
+
+
+def closest_coverage(
+    coordinates: Tuple, max_dist: float
+) -> dict[str, dict[str, bool]]:
+    """
+    Coverage lookup of the async view, run in a thread of the executor.
+    Request signals don't reach that thread, so it closes its expired or
+    broken connection itself.
+    """
+    close_old_connections()
+    return get_coverage_backend().closest(coordinates, max_dist)
+
+
+def coverage_form(request: HttpRequest) -> Optional[RadiusForm]:
+    """Form of the query parameters, None when no location was given."""
+    if "lat" in request.GET or "lon" in request.GET:
+        return CoordinatesForm(request.GET)
+    if "q" in request.GET:
+        return RadiusForm(request.GET)
+    return None
+
+
+@csrf_exempt
+def operators_cvg_batch(request: HttpRequest) -> JsonResponse:
+    """
+    Resolves a list of items, each either {"q": <address>} or
+    {"lat": <latitude>, "lon": <longitude>}, with an optional "radius".
+    Results keep the order of the items, with an "error" entry for the ones
+    that could not be resolved.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        items = json.loads(request.body)["items"]
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest(
+            "Body must be a JSON object with an 'items' list"
+        )
+    if not isinstance(items, list):
+        return HttpResponseBadRequest("'items' must be a list")
+    max_items = settings.COVERAGE_BATCH_MAX_ITEMS
+    if len(items) > max_items:
+        return HttpResponseBadRequest(f"At most {max_items} items allowed")
+
+    results: list[dict] = [dict() for _ in items]
+    coordinates: dict[int, Tuple] = dict()
+    radii: dict[int, float] = dict()
+    queries: dict[int, str] = dict()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index]["error"] = "Item must be a JSON object"
+            continue
+        if "q" in item and (
+            not isinstance(item["q"], str) or not item["q"].strip()
+        ):
+            results[index]["error"] = "'q' must be a non-empty string"
+            continue
+
+        form = RadiusForm(item) if "q" in item else CoordinatesForm(item)
+        if not form.is_valid():
+            results[index]["error"] = form.errors_text()
+            continue
+        radii[index] = form.cleaned_radius()
+        if isinstance(form, CoordinatesForm):
+            coordinates[index] = form.cleaned_coordinates()
+        else:
+            queries[index] = item["q"]
+
+    geocoded: list[Optional[Tuple]]
+    try:
+        geocoded = get_coordinates_batch(list(queries.values()))
+    except requests.RequestException:
+        geocoded = [None] * len(queries)
+        for index in queries:
+            results[index]["error"] = "Geocoding service unavailable"
+    for index, point in zip(queries, geocoded):
+        if point is not None:
+            coordinates[index] = point
+        elif "error" not in results[index]:
+            results[index]["error"] = "Address not found"
+
+    coverages = get_coverage_backend().closest_many(
+        list(coordinates.values()), [radii[index] for index in coordinates]
+    )
+    for index, coverage in zip(coordinates, coverages):
+        results[index]["coverage"] = coverage
+
+    return JsonResponse({"results": results})
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import connections
+from django.urls import get_resolver
+
+from .backends import MemoryCoverageBackend
+from .models import BaseCoverage
+from .requests.local_geocoder import get_local_geocoder
+from .scripts.utils import lambert_to_wgs84
+
+
+def warm_up() -> None:
+    """
+    Loads what workers would otherwise load on their first requests: the
+    URLs and views, the pyproj and GDAL transformations, the local
+    geocoder and, for the memory backend, the coverage index or snapshot.
+    Run in the gunicorn master before it forks, so workers share them.
+    """
+    get_resolver().url_patterns
+    lambert_to_wgs84()
+    BaseCoverage.lambert93(Point(2.35, 48.85, srid=BaseCoverage.SRID_WGS84))
+    get_local_geocoder()
+    if settings.COVERAGE_BACKEND == "memory":
+        MemoryCoverageBackend.index()
+    # Connections can't be shared with the forked workers
+    connections.close_all()
@@ -0,0 +1,119 @@
+"""
+Secrets of the service. In PROD they are a JSON object stored in the
+SecureString SSM parameter PSS_PARAM_NAME, fetched once per task: the
+first process caches them in a file only its user can read, on a tmpfs,
+and the gunicorn workers and management commands started after it read
+that file. Elsewhere they come from environment variables.
+"""
+
+import json
+import os
+import tempfile
+from typing import Optional, Protocol
+
+# tmpfs of the container, so the cache never reaches the disk
+SHM_DIR = "/dev/shm"
+
+# Environment variables standing in for the secrets outside of PROD
+ENV_NAMES = {
+    "admin_db_password": "DB_PASSWORD",
+    "superuser_password": "DJANGO_SUPERUSER_PASSWORD",
+}
+
+
+class Secrets(Protocol):
+    def get(self, name: str) -> str:
+        ...
+
+
+class LocalSecrets:
+    """Secrets held in memory, for tests."""
+
+    def __init__(self, values: dict[str, str]) -> None:
+        self.values = values
+
+    def get(self, name: str) -> str:
+        return self.values[name]
+
+
+class EnvSecrets:
+    """Secrets read from the environment variables of ENV_NAMES."""
+
+    def get(self, name: str) -> str:
+        return os.environ[ENV_NAMES.get(name, name.upper())]
+
+
+class SSMSecrets:
+    """Secrets of an SSM parameter, cached in a file for the task."""
+
+    def __init__(self, parameter: str, cache_path: str) -> None:
+        self.parameter = parameter
+        self.cache_path = cache_path
+        self.values: Optional[dict[str, str]] = None
+
+    def get(self, name: str) -> str:
+        if self.values is None:
+            self.values = self.load()
+        return self.values[name]
+
+    def load(self) -> dict[str, str]:
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+        values = self.fetch()
+        self.store(values)
+        return values
+
+    def fetch(self) -> dict[str, str]:
+        import boto3
+
+        response = boto3.client("ssm").get_parameter(
+            Name=self.parameter, WithDecryption=True
+        )
+        return json.loads(response["Parameter"]["Value"])
+
+    def store(self, values: dict[str, str]) -> None:
+        """
+        Writes the cache next to its path and renames it over it, so
+        processes starting together never read a partial file.
+        """
+        directory = os.path.dirname(self.cache_path)
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(values, f)
+            os.replace(tmp, self.cache_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def cache_path(parameter: str) -> str:
+    """SECRETS_CACHE_PATH, or a file named after the parameter in tmpfs."""
+    if os.environ.get("SECRETS_CACHE_PATH"):
+        return os.environ["SECRETS_CACHE_PATH"]
+    directory = SHM_DIR if os.path.isdir(SHM_DIR) else tempfile.gettempdir()
+    return os.path.join(directory, f"{parameter.strip('/')}.json")
+
+
+_secrets: Optional[Secrets] = None
+
+
+def get_secrets() -> Secrets:
+    """Secrets of the PSS_PARAM_NAME parameter when set, else of the env."""
+    global _secrets
+    if _secrets is None:
+        parameter = os.environ.get("PSS_PARAM_NAME")
+        if parameter:
+            _secrets = SSMSecrets(parameter, cache_path(parameter))
+        else:
+            _secrets = EnvSecrets()
+    return _secrets
+
+
+def set_secrets(secrets: Optional[Secrets]) -> None:
+    """Replaces the secrets get_secrets returns, None to select them again."""
+    global _secrets
+    _secrets = secrets
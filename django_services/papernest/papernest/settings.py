@@ -1,22 +1,16 @@
 from pathlib import Path
 import environ
 import os
-import boto3
-import json
+
+from papernest.secrets import get_secrets
 
 
 def get_db_config(environment: str) -> dict:
     AWS_DB_ENGINE = env("AWS_DB_ENGINE")
 
     if environment == "PROD":
-        PSS_PARAM_NAME = env("PSS_PARAM_NAME")
-        ssm_client = boto3.client("ssm")
-        response = ssm_client.get_parameter(
-            Name=PSS_PARAM_NAME, WithDecryption=True
-        )
-        admin_db_password = json.loads(response["Parameter"]["Value"])[
-            "admin_db_password"
-        ]
+        # Fetched from SSM once per task, see papernest/secrets.py
+        admin_db_password = get_secrets().get("admin_db_password")
     else:
         admin_db_password = env("DB_PASSWORD")
 
@@ -27,6 +21,20 @@ def get_db_config(environment: str) -> dict:
         "PASSWORD": admin_db_password,
         "HOST": env("DB_HOST"),
         "PORT": env("DB_PORT"),
+        # Connections are kept across requests instead of paying for the
+        # TCP, TLS and authentication round trips on each of them. Under
+        # ASGI they'd leak, requests not ending in the thread that queried.
+        "CONN_MAX_AGE": env.int(
+            "DB_CONN_MAX_AGE",
+            default=0 if env.bool("ASYNC_VIEWS", default=False) else 60,
+        ),
+        # Reused connections are checked once per request, so one closed
+        # by the database or the pooler fails no query
+        "CONN_HEALTH_CHECKS": env.bool("DB_CONN_HEALTH_CHECKS", default=True),
+        # pgbouncer in transaction mode may give every query of a request
+        # a different server connection, which cursors can't outlive
+        "DISABLE_SERVER_SIDE_CURSORS": env("DB_POOLER", default="")
+        == "pgbouncer",
     }
 
 
@@ -114,8 +122,102 @@ else:
         }
     }
 
+# Shared by every worker and task in PROD and COMPOSE, the table is created
+# with the createcachetable command.
+CACHES = {
+    "default": env.cache_url(
+        "CACHE_URL",
+        default=(
+            "dbcache://django_cache"
+            if ENVIRONMENT == "PROD" or ENVIRONMENT == "COMPOSE"
+            else "locmemcache://"
+        ),
+    )
+}
+
 DEBUG = True
 
+# HTTP client of the geocoding API. BASE_URL can point to a local stand-in
+# server for tests and load runs.
+GEOCODER = {
+    "BASE_URL": env(
+        "GEOCODER_BASE_URL", default="https://api-adresse.data.gouv.fr"
+    ),
+    "CONNECT_TIMEOUT": env.float("GEOCODER_CONNECT_TIMEOUT", default=1.0),
+    "READ_TIMEOUT": env.float("GEOCODER_READ_TIMEOUT", default=3.0),
+    "POOL_SIZE": env.int("GEOCODER_POOL_SIZE", default=10),
+    "MAX_RETRIES": env.int("GEOCODER_MAX_RETRIES", default=2),
+    "BACKOFF": env.float("GEOCODER_BACKOFF", default=0.1),
+    "BACKOFF_MAX": env.float("GEOCODER_BACKOFF_MAX", default=1.0),
+    # Retries allowed per request sent, on average
+    "RETRY_BUDGET_RATIO": env.float(
+        "GEOCODER_RETRY_BUDGET_RATIO", default=0.2
+    ),
+    "RETRY_BUDGET_MAX_TOKENS": env.float(
+        "GEOCODER_RETRY_BUDGET_MAX_TOKENS", default=10
+    ),
+}
+
+# Geocoded coordinates, cached per process and in the shared cache. Queries
+# without results are cached for NEGATIVE_TTL seconds.
+GEOCODING_CACHE = {
+    "ALIAS": "default",
+    "LOCAL_MAXSIZE": env.int("GEOCODING_CACHE_LOCAL_MAXSIZE", default=10000),
+    "TTL": env.int("GEOCODING_CACHE_TTL", default=7 * 24 * 3600),
+    "NEGATIVE_TTL": env.int("GEOCODING_CACHE_NEGATIVE_TTL", default=3600),
+}
+
+# Local geocoder: directory of the address index built from BAN extracts by
+# the build_address_index command. Queries it can't resolve, or matches less
+# similar than MIN_SIMILARITY, go to the geocoding API.
+LOCAL_GEOCODER = {
+    "INDEX": env("LOCAL_GEOCODER_INDEX", default=""),
+    "MIN_SIMILARITY": env.float("LOCAL_GEOCODER_MIN_SIMILARITY", default=0.5),
+}
+
+# Concurrent identical requests share one geocoding call and one coverage
+# query per worker. The shared lock extends it to every worker for geocoding:
+# one of them calls the API while the others poll the shared cache, for
+# LOCK_TIMEOUT seconds at most.
+SINGLEFLIGHT = {
+    "SHARED_LOCK": env.bool("SINGLEFLIGHT_SHARED_LOCK", default=False),
+    "LOCK_TIMEOUT": env.int("SINGLEFLIGHT_LOCK_TIMEOUT", default=5),
+    "POLL_INTERVAL": env.float("SINGLEFLIGHT_POLL_INTERVAL", default=0.05),
+}
+
+# Coverage lookups: "sql" queries the database on every request, "memory"
+# answers from an index built per worker from the Coverage table. Workers
+# rebuild it when they find, at most once per COVERAGE_INDEX_CHECK_INTERVAL
+# seconds, that the active dataset changed.
+COVERAGE_BACKEND = env("COVERAGE_BACKEND", default="sql")
+COVERAGE_INDEX_CHECK_INTERVAL = env.float(
+    "COVERAGE_INDEX_CHECK_INTERVAL", default=5.0
+)
+
+# With the memory backend, workers map the snapshot written by
+# export_coverage_snapshot instead of building their own index, and move
+# to a new generation within CHECK_INTERVAL seconds of its export. The
+# service tasks export it in entrypoint.sh before starting the server,
+# bootstrap --snapshot only helps with a path on a volume they share.
+COVERAGE_SNAPSHOT = {
+    "PATH": env("COVERAGE_SNAPSHOT_PATH", default=""),
+    "CHECK_INTERVAL": env.float(
+        "COVERAGE_SNAPSHOT_CHECK_INTERVAL", default=5.0
+    ),
+}
+
+# Table holding the coverage rows: "wide" (Coverage) or "compact"
+# (CompactCoverage), smaller for instances with little buffer cache.
+# Reload the data with init_db or refresh_coverage after switching.
+COVERAGE_LAYOUT = env("COVERAGE_LAYOUT", default="wide")
+
+# Maximum number of addresses or coordinates per batch coverage request
+COVERAGE_BATCH_MAX_ITEMS = env.int("COVERAGE_BATCH_MAX_ITEMS", default=500)
+
+# Serves the coverage endpoint with its async view, meant to run under ASGI
+# workers (see entrypoint.sh) so waiting on the geocoder doesn't hold one.
+ASYNC_VIEWS = env.bool("ASYNC_VIEWS", default=False)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
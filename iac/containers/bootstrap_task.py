@@ -0,0 +1,108 @@
+from typing import Any, Optional
+
+import pulumi
+from pulumi.dynamic import (
+    CreateResult,
+    DiffResult,
+    Resource,
+    ResourceProvider,
+    UpdateResult,
+)
+
+# Checks of the task status while it runs, up to an hour
+POLL_DELAY = 15
+MAX_POLLS = 240
+
+
+class BootstrapTaskProvider(ResourceProvider):
+    """
+    Runs the bootstrap task definition once on Fargate and waits for it to
+    stop. The deployment fails unless its container exited with 0.
+    """
+
+    def create(self, props: dict[str, Any]) -> CreateResult:
+        task_arn = self.run(props)
+        return CreateResult(id_=task_arn, outs={**props, "task_arn": task_arn})
+
+    def diff(
+        self, _id: str, _olds: dict[str, Any], _news: dict[str, Any]
+    ) -> DiffResult:
+        # Every deploy runs the task again
+        return DiffResult(changes=True)
+
+    def update(
+        self, _id: str, _olds: dict[str, Any], news: dict[str, Any]
+    ) -> UpdateResult:
+        return UpdateResult(outs={**news, "task_arn": self.run(news)})
+
+    @staticmethod
+    def run(props: dict[str, Any]) -> str:
+        import boto3
+
+        client = boto3.client("ecs", region_name=props.get("region"))
+        response = client.run_task(
+            cluster=props["cluster"],
+            taskDefinition=props["task_definition"],
+            launchType="FARGATE",
+            count=1,
+            networkConfiguration={
+                "awsvpcConfiguration": {
+                    "subnets": props["subnets"],
+                    "securityGroups": props["security_groups"],
+                    "assignPublicIp": "ENABLED",
+                }
+            },
+        )
+        if response["failures"] or not response["tasks"]:
+            raise Exception(
+                f"Couldn't start the bootstrap task: {response['failures']}"
+            )
+
+        task_arn = response["tasks"][0]["taskArn"]
+        client.get_waiter("tasks_stopped").wait(
+            cluster=props["cluster"],
+            tasks=[task_arn],
+            WaiterConfig={"Delay": POLL_DELAY, "MaxAttempts": MAX_POLLS},
+        )
+        task = client.describe_tasks(
+            cluster=props["cluster"], tasks=[task_arn]
+        )["tasks"][0]
+        exit_codes = [
+            container.get("exitCode") for container in task["containers"]
+        ]
+        if any(exit_code != 0 for exit_code in exit_codes):
+            raise Exception(
+                f"Bootstrap task {task_arn} failed with exit codes "
+                f"{exit_codes}: {task.get('stoppedReason')}"
+            )
+        return task_arn
+
+
+class BootstrapTask(Resource):
+    """Run of the bootstrap task, once per deploy."""
+
+    task_arn: pulumi.Output[str]
+
+    def __init__(
+        self,
+        name: str,
+        cluster: pulumi.Input[str],
+        task_definition: pulumi.Input[str],
+        subnets: pulumi.Input[list],
+        security_groups: pulumi.Input[list],
+        region: Optional[str] = None,
+        opts: Optional[pulumi.ResourceOptions] = None,
+    ) -> None:
+        super().__init__(
+            BootstrapTaskProvider(),
+            name,
+            {
+                "cluster": cluster,
+                "task_definition": task_definition,
+                "subnets": subnets,
+                "security_groups": security_groups,
+                "region": region,
+                "task_arn": None,
+            },
+            opts,
+        )
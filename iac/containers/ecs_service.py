@@ -1,4 +1,5 @@
 import json
+import math
 
 import pulumi
 from pulumi_aws import ec2, lb, cloudwatch, ecs, iam, ssm
@@ -8,8 +9,16 @@ from networking import Networking
 from input_schemas import SubnetType, DjangoServiceCfg
 from .repository import Repository
 from .image import Image
+from .bootstrap_task import BootstrapTask
 from dbs.rds import RDS
 
+# pgbouncer sidecar, its share of the task is taken from the Django container
+PGBOUNCER_PORT = 6432
+PGBOUNCER_CPU = 64
+PGBOUNCER_MEMORY = 64
+# Clients are cheap for pgbouncer, only server connections are pooled
+PGBOUNCER_MAX_CLIENT_CONN = 1000
+
 
 class ECSService:
     def __init__(
@@ -153,78 +162,7 @@ class ECSService:
             f"{SERVICE_NAME}-cluster", name=f"{SERVICE_NAME}-cluster"
         )
 
-        container_definitions_template = pulumi.Output.all(
-            image_uri=image_uri,
-            log_group_name=django_log_group.name,
-            host=self.db.get_host(),
-            passwords_param_name=self.service_passwords.name,
-        ).apply(
-            lambda args: json.dumps(
-                [
-                    {
-                        "name": SERVICE_NAME,
-                        "image": args["image_uri"],
-                        "essential": True,
-                        "cpu": backend_cfg.cpu,
-                        "memory": backend_cfg.memory,
-                        "portMappings": [
-                            {
-                                "containerPort": CONT_PORT,
-                                "protocol": "tcp",
-                            }
-                        ],
-                        "command": [
-                            SERVICE_NAME,
-                            str(CONT_PORT),
-                            backend_cfg.superuser.username,
-                            backend_cfg.superuser.email,
-                            backend_cfg.workers_per_instance,
-                            args["passwords_param_name"],
-                        ],
-                        "environment": [
-                            {
-                                "name": "ENVIRONMENT",
-                                "value": "PROD",
-                            },
-                            {
-                                "name": "DB_HOST",
-                                "value": args["host"],
-                            },
-                            {
-                                "name": "DB_PORT",
-                                "value": str(db_cfg.port),
-                            },
-                            {
-                                "name": "AWS_DB_ENGINE",
-                                "value": db_cfg.engine,
-                            },
-                            {
-                                "name": "DB_NAME",
-                                "value": db_cfg.db_name,
-                            },
-                            {
-                                "name": "DB_USER",
-                                "value": db_cfg.db_user,
-                            },
-                            {
-                                "name": "PSS_PARAM_NAME",
-                                "value": args["passwords_param_name"],
-                            },
-                        ],
-                        "logConfiguration": {
-                            "logDriver": "awslogs",
-                            "options": {
-                                "awslogs-group": args["log_group_name"],
-                                "awslogs-region": "eu-west-1",
-                                "awslogs-stream-prefix": f"{SERVICE_NAME}-log-stream",
-                            },
-                        },
-                    }
-                ]
-            )
-        )
-
-        ecs_task_definition = ecs.TaskDefinition(
+        self.task_definition = ecs.TaskDefinition(
             f"{SERVICE_NAME}-tf",
             family=SERVICE_NAME,
             network_mode="awsvpc",
@@ -233,20 +171,63 @@ class ECSService:
             memory=backend_cfg.memory,
             execution_role_arn=self.roles["ecs_execution_role"].arn,
             task_role_arn=self.roles["ecs_task_role"].arn,
-            container_definitions=container_definitions_template,
+            container_definitions=self.container_definitions(
+                image_uri,
+                django_log_group,
+                ["serve", str(CONT_PORT)],
+                [{"containerPort": CONT_PORT, "protocol": "tcp"}],
+                pooled=db_cfg.pgbouncer,
+            ),
+        )
+
+        # Migrations, superuser and data loading run once per deploy, in a
+        # one-off task of the same image, before the service rolls
+        self.bootstrap_task_definition = ecs.TaskDefinition(
+            f"{SERVICE_NAME}-bootstrap-tf",
+            family=f"{SERVICE_NAME}-bootstrap",
+            network_mode="awsvpc",
+            requires_compatibilities=["FARGATE"],
+            cpu=backend_cfg.cpu,
+            memory=backend_cfg.memory,
+            execution_role_arn=self.roles["ecs_execution_role"].arn,
+            task_role_arn=self.roles["ecs_task_role"].arn,
+            container_definitions=self.container_definitions(
+                image_uri,
+                django_log_group,
+                self.service_passwords.name.apply(
+                    lambda passwords_param_name: [
+                        "bootstrap",
+                        backend_cfg.superuser.username,
+                        backend_cfg.superuser.email,
+                        passwords_param_name,
+                    ]
+                ),
+                [],
+            ),
+        )
+
+        subnets = [*self.networking.get_subnet_ids(SubnetType.PRIVATE)]
+        self.bootstrap_task = BootstrapTask(
+            f"{SERVICE_NAME}-bootstrap",
+            cluster=ecs_cluster.arn,
+            task_definition=self.bootstrap_task_definition.arn,
+            subnets=subnets,
+            security_groups=[self.ecs_sg.id],
+            region=pulumi.Config("aws").get("region"),
+            opts=pulumi.ResourceOptions(
+                depends_on=[self.db.get_db_instance()]
+            ),
         )
 
-        ecs.Service(
+        self.service = ecs.Service(
             f"{SERVICE_NAME}-service",
             name=f"{SERVICE_NAME}-service",
             cluster=ecs_cluster.id,
-            task_definition=ecs_task_definition.arn,
+            task_definition=self.task_definition.arn,
             launch_type="FARGATE",
             desired_count=backend_cfg.desired_count,
             network_configuration=ecs.ServiceNetworkConfigurationArgs(
-                subnets=[
-                    *self.networking.get_subnet_ids(SubnetType.PRIVATE),
-                ],
+                subnets=subnets,
                 security_groups=[
                     self.ecs_sg.id,
                 ],
@@ -260,9 +241,198 @@ class ECSService:
                 )
             ],
             opts=pulumi.ResourceOptions(
-                depends_on=[self.db.get_db_instance()]
+                depends_on=[self.db.get_db_instance(), self.bootstrap_task]
+            ),
+        )
+
+    def container_definitions(
+        self,
+        image_uri: pulumi.Output,
+        log_group: cloudwatch.LogGroup,
+        command: pulumi.Input[list[str]],
+        port_mappings: list[dict],
+        pooled: bool = False,
+    ) -> pulumi.Output:
+        """
+        Definition of the Django container, running the command. Pooled,
+        it connects to the database through a pgbouncer sidecar.
+        """
+        backend_cfg = self.django_srv_cfg.backend_cfg
+        db_cfg = self.django_srv_cfg.db_cfg
+        SERVICE_NAME = self.django_srv_cfg.service_name
+
+        def definitions(args: dict) -> str:
+            def log_configuration(stream_prefix: str) -> dict:
+                return {
+                    "logDriver": "awslogs",
+                    "options": {
+                        "awslogs-group": args["log_group_name"],
+                        "awslogs-region": "eu-west-1",
+                        "awslogs-stream-prefix": stream_prefix,
+                    },
+                }
+
+            django = {
+                "name": SERVICE_NAME,
+                "image": args["image_uri"],
+                "essential": True,
+                "cpu": backend_cfg.cpu,
+                "memory": backend_cfg.memory,
+                "portMappings": port_mappings,
+                "command": args["command"],
+                "environment": [
+                    {
+                        "name": "ENVIRONMENT",
+                        "value": "PROD",
+                    },
+                    {
+                        "name": "DB_HOST",
+                        "value": args["host"],
+                    },
+                    {
+                        "name": "DB_PORT",
+                        "value": str(db_cfg.port),
+                    },
+                    {
+                        "name": "AWS_DB_ENGINE",
+                        "value": db_cfg.engine,
+                    },
+                    {
+                        "name": "DB_NAME",
+                        "value": db_cfg.db_name,
+                    },
+                    {
+                        "name": "DB_USER",
+                        "value": db_cfg.db_user,
+                    },
+                    {
+                        "name": "DB_CONN_MAX_AGE",
+                        "value": str(db_cfg.conn_max_age),
+                    },
+                    {
+                        "name": "DB_CONN_HEALTH_CHECKS",
+                        "value": str(db_cfg.conn_health_checks).lower(),
+                    },
+                    {
+                        "name": "PSS_PARAM_NAME",
+                        "value": args["passwords_param_name"],
+                    },
+                    {
+                        "name": "ASYNC_VIEWS",
+                        "value": str(backend_cfg.async_views).lower(),
+                    },
+                    *self.gunicorn_environment(),
+                ],
+                "logConfiguration": log_configuration(
+                    f"{SERVICE_NAME}-log-stream"
+                ),
+            }
+            if not pooled:
+                return json.dumps([django])
+
+            # Containers of a task share localhost
+            overrides = {
+                "DB_HOST": "127.0.0.1",
+                "DB_PORT": str(PGBOUNCER_PORT),
+            }
+            django["environment"] = [
+                {
+                    "name": variable["name"],
+                    "value": overrides.get(
+                        variable["name"], variable["value"]
+                    ),
+                }
+                for variable in django["environment"]
+            ] + [{"name": "DB_POOLER", "value": "pgbouncer"}]
+            django["cpu"] = backend_cfg.cpu - PGBOUNCER_CPU
+            django["memory"] = backend_cfg.memory - PGBOUNCER_MEMORY
+            django["dependsOn"] = [
+                {"containerName": "pgbouncer", "condition": "START"}
+            ]
+            pgbouncer = {
+                "name": "pgbouncer",
+                "image": db_cfg.pgbouncer_image,
+                "essential": True,
+                "cpu": PGBOUNCER_CPU,
+                "memory": PGBOUNCER_MEMORY,
+                "portMappings": [],
+                "environment": [
+                    {"name": name, "value": value}
+                    for name, value in self.pgbouncer_environment(
+                        args["host"]
+                    ).items()
+                ],
+                "secrets": [
+                    {
+                        "name": "DB_PASSWORD",
+                        "valueFrom": args["db_password_arn"],
+                    }
+                ],
+                "logConfiguration": log_configuration(
+                    f"{SERVICE_NAME}-pgbouncer"
+                ),
+            }
+            return json.dumps([django, pgbouncer])
+
+        return pulumi.Output.all(
+            image_uri=image_uri,
+            log_group_name=log_group.name,
+            host=self.db.get_host(),
+            passwords_param_name=self.service_passwords.name,
+            db_password_arn=self.db_password.arn if pooled else "",
+            command=command,
+        ).apply(definitions)
+
+    def pgbouncer_environment(self, host: str) -> dict[str, str]:
+        """Settings of the pgbouncer sidecar, its pool sized per worker."""
+        db_cfg = self.django_srv_cfg.db_cfg
+        return {
+            "DB_HOST": host,
+            "DB_PORT": str(db_cfg.port),
+            "DB_NAME": db_cfg.db_name,
+            "DB_USER": db_cfg.db_user,
+            "LISTEN_PORT": str(PGBOUNCER_PORT),
+            "AUTH_TYPE": "scram-sha-256",
+            "POOL_MODE": db_cfg.pool_mode,
+            "DEFAULT_POOL_SIZE": str(
+                db_cfg.pool_size_per_worker * self.estimated_workers()
             ),
+            "MAX_CLIENT_CONN": str(PGBOUNCER_MAX_CLIENT_CONN),
+        }
+
+    def estimated_workers(self) -> int:
+        """Gunicorn workers of a task, sized like gunicorn.conf.py does."""
+        backend_cfg = self.django_srv_cfg.backend_cfg
+        if backend_cfg.workers_per_instance not in ("", "auto"):
+            return int(backend_cfg.workers_per_instance)
+        cpus = backend_cfg.cpu / 1024
+        worker_class = backend_cfg.worker_class or (
+            "uvicorn" if backend_cfg.async_views else "sync"
         )
+        if worker_class == "sync":
+            return math.ceil(2 * cpus) + 1
+        return max(1, math.ceil(cpus))
+
+    def gunicorn_environment(self) -> list[dict[str, str]]:
+        """Settings read by the gunicorn.conf.py of the project."""
+        backend_cfg = self.django_srv_cfg.backend_cfg
+        settings = {
+            "GUNICORN_WORKER_CLASS": backend_cfg.worker_class,
+            "GUNICORN_WORKERS": backend_cfg.workers_per_instance,
+            "GUNICORN_THREADS": backend_cfg.threads_per_worker,
+            # Fargate reserves the CPU units of the task definition, with
+            # no quota visible in the cgroup of the container
+            "GUNICORN_TASK_CPUS": str(backend_cfg.cpu / 1024),
+            "GUNICORN_PRELOAD": str(backend_cfg.preload_app).lower(),
+            "GUNICORN_MAX_REQUESTS": str(backend_cfg.max_requests),
+            "GUNICORN_MAX_REQUESTS_JITTER": str(
+                backend_cfg.max_requests_jitter
+            ),
+            "GUNICORN_TIMEOUT": str(backend_cfg.timeout),
+        }
+        return [
+            {"name": name, "value": value} for name, value in settings.items()
+        ]
 
     def create_pss_params(self) -> None:
         SERVICE_NAME = self.django_srv_cfg.service_name.replace("_", "-")
@@ -291,6 +461,17 @@ class ECSService:
             data_type="text",
         )
 
+        # The pgbouncer sidecar gets the database password alone, injected
+        # by ECS from its own parameter
+        if self.django_srv_cfg.db_cfg.pgbouncer:
+            self.db_password = ssm.Parameter(
+                f"{self.django_srv_cfg.service_name}-db-password-param",
+                name=f"{self.django_srv_cfg.service_name}_db_password",
+                type="SecureString",
+                value=self.db.get_password(),
+                data_type="text",
+            )
+
     def create_outputs(self) -> None:
         pulumi.export(
             f"{self.django_srv_cfg.service_name}-lb-dns",
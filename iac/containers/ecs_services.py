@@ -14,6 +14,7 @@ class ECSServices:
         self.networking = networking
         self.django_srvs_cfg = django_srvs_cfg
         self.roles: dict = dict()
+        self.services: list[ECSService] = list()
         self.create_common_resources()
 
     def create_common_resources(self) -> None:
@@ -50,6 +51,8 @@ class ECSServices:
                             "ecr:BatchGetImage",
                             "logs:CreateLogStream",
                             "logs:PutLogEvents",
+                            # Secrets of the container definitions
+                            "ssm:GetParameters",
                             "elasticfilesystem:ClientMount",
                             "elasticfilesystem:ClientWrite",
                             "elasticfilesystem:ClientRootAccess",
@@ -119,4 +122,6 @@ class ECSServices:
 
     def create_services(self) -> None:
         for django_srv_cfg in self.django_srvs_cfg:
-            ECSService(self.networking, django_srv_cfg, self.roles)
+            self.services.append(
+                ECSService(self.networking, django_srv_cfg, self.roles)
+            )
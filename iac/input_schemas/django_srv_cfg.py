@@ -16,7 +16,16 @@ class BackendCfg:
     lb_port: int = 80
     container_port: int = 8000
     desired_count: int = 1
-    workers_per_instance: str = "1"
+    # "auto" sizes them from the CPUs of the task
+    workers_per_instance: str = "auto"
+    async_views: bool = False
+    # sync, gthread, gevent or uvicorn, uvicorn when async_views is set
+    worker_class: str = ""
+    threads_per_worker: str = "auto"
+    preload_app: bool = True
+    max_requests: int = 1000
+    max_requests_jitter: int = 100
+    timeout: int = 30
 
 
 @dataclass
@@ -27,6 +36,16 @@ class DBCfg:
     db_name: str
     db_user: str
     port: int
+    # Seconds Django keeps a connection open, 0 closes it after each request
+    conn_max_age: int = 60
+    conn_health_checks: bool = True
+    # pgbouncer sidecar of the service tasks, pooling their connections
+    pgbouncer: bool = False
+    # Pinned, a new pgbouncer release may change its configuration
+    pgbouncer_image: str = "edoburu/pgbouncer:1.22.1-p0"
+    pool_mode: str = "transaction"
+    # Server connections of the pool for each gunicorn worker of the task
+    pool_size_per_worker: int = 2
 
 
 @dataclass
@@ -57,6 +57,23 @@ class Input:
                 extra_container_args["workers_per_instance"] = str(
                     backend_cfg["workers_per_instance"]
                 )
+            if "async_views" in backend_cfg:
+                extra_container_args["async_views"] = backend_cfg[
+                    "async_views"
+                ]
+            if "threads_per_worker" in backend_cfg:
+                extra_container_args["threads_per_worker"] = str(
+                    backend_cfg["threads_per_worker"]
+                )
+            for key in [
+                "worker_class",
+                "preload_app",
+                "max_requests",
+                "max_requests_jitter",
+                "timeout",
+            ]:
+                if key in backend_cfg:
+                    extra_container_args[key] = backend_cfg[key]
 
             superuser_cfg = backend_cfg["superuser"]
             superuser_cfg_fmt = SuperUserCfg(
@@ -71,6 +88,18 @@ class Input:
             )
 
             db_cfg = config.get("db")
+            extra_db_args = dict()
+            for key in [
+                "conn_max_age",
+                "conn_health_checks",
+                "pgbouncer",
+                "pgbouncer_image",
+                "pool_mode",
+                "pool_size_per_worker",
+            ]:
+                if key in db_cfg:
+                    extra_db_args[key] = db_cfg[key]
+
             db_cfg_fmt = DBCfg(
                 engine=db_cfg["engine"],
                 version=db_cfg["version"],
@@ -78,6 +107,7 @@ class Input:
                 db_name=db_cfg["db_name"],
                 db_user=db_cfg["db_user"],
                 port=db_cfg["port"],
+                **extra_db_args,
             )
 
             django_srvs_cfg_fmt.append(
@@ -0,0 +1,231 @@
+import json
+import unittest
+
+import pulumi
+
+
+class Mocks(pulumi.runtime.Mocks):
+    def __init__(self) -> None:
+        self.resources: list[pulumi.runtime.MockResourceArgs] = list()
+
+    def new_resource(self, args: pulumi.runtime.MockResourceArgs) -> tuple:
+        self.resources.append(args)
+        outputs = {**args.inputs, "arn": f"arn:{args.name}"}
+        if args.typ == "aws:rds/cluster:Cluster":
+            outputs["endpoint"] = "db.example.com"
+        if args.typ == "random:index/randomPassword:RandomPassword":
+            outputs["result"] = "password"
+        return f"{args.name}-id", outputs
+
+    def call(self, args: pulumi.runtime.MockCallArgs) -> tuple:
+        if args.token == "aws:ecr/getAuthorizationToken:getAuthorizationToken":
+            return {"password": "password", "userName": "AWS"}, []
+        return {}, []
+
+
+mocks = Mocks()
+pulumi.runtime.set_mocks(mocks, preview=False)
+
+from containers import ECSServices  # noqa: E402
+from input_schemas import (  # noqa: E402
+    BackendCfg,
+    DBCfg,
+    DjangoServiceCfg,
+    SuperUserCfg,
+    VPCCfg,
+)
+from networking import Networking  # noqa: E402
+
+SERVICE_CFG = DjangoServiceCfg(
+    service_name="papernest",
+    backend_cfg=BackendCfg(
+        django_project="papernest",
+        superuser=SuperUserCfg(username="admin", email="user@example.com"),
+        workers_per_instance="2",
+        worker_class="gthread",
+    ),
+    db_cfg=DBCfg(
+        engine="aurora-postgresql",
+        version="15.2",
+        family="db.t3.medium",
+        db_name="papernest",
+        db_user="db_user",
+        port=5432,
+    ),
+)
+
+POOLED_CFG = DjangoServiceCfg(
+    service_name="pooled",
+    backend_cfg=BackendCfg(
+        django_project="papernest",
+        superuser=SuperUserCfg(username="admin", email="user@example.com"),
+        cpu=1024,
+        memory=2048,
+    ),
+    db_cfg=DBCfg(
+        engine="aurora-postgresql",
+        version="15.2",
+        family="db.t3.medium",
+        db_name="pooled",
+        db_user="db_user",
+        port=5432,
+        conn_max_age=300,
+        pgbouncer=True,
+    ),
+)
+
+networking = Networking(VPCCfg(vpc_name="vpc", add_nat=False))
+services = ECSServices(networking, [SERVICE_CFG, POOLED_CFG])
+
+
+def resource(name: str) -> pulumi.runtime.MockResourceArgs:
+    return next(args for args in mocks.resources if args.name == name)
+
+
+def registered(name: str) -> int:
+    return [args.name for args in mocks.resources].index(name)
+
+
+class ECSServiceTest(unittest.TestCase):
+    @pulumi.runtime.test
+    def test_service_only_serves(self):
+        def check(_):
+            task = resource("papernest-tf").inputs
+            (container,) = json.loads(task["containerDefinitions"])
+            self.assertEqual(container["command"], ["serve", "8000"])
+            self.assertEqual(
+                container["portMappings"][0]["containerPort"], 8000
+            )
+            service = resource("papernest-service").inputs
+            self.assertEqual(service["taskDefinition"], "arn:papernest-tf")
+
+        return services.services[0].service.urn.apply(check)
+
+    @pulumi.runtime.test
+    def test_gunicorn_settings(self):
+        def check(_):
+            task = resource("papernest-tf").inputs
+            (container,) = json.loads(task["containerDefinitions"])
+            environment = {
+                variable["name"]: variable["value"]
+                for variable in container["environment"]
+            }
+            self.assertEqual(environment["GUNICORN_WORKER_CLASS"], "gthread")
+            self.assertEqual(environment["GUNICORN_WORKERS"], "2")
+            self.assertEqual(environment["GUNICORN_THREADS"], "auto")
+            self.assertEqual(environment["GUNICORN_TASK_CPUS"], "0.25")
+            self.assertEqual(environment["GUNICORN_PRELOAD"], "true")
+            self.assertEqual(environment["GUNICORN_MAX_REQUESTS"], "1000")
+
+        return services.services[0].service.urn.apply(check)
+
+    @pulumi.runtime.test
+    def test_bootstrap_task(self):
+        def check(_):
+            task = resource("papernest-bootstrap-tf").inputs
+            self.assertEqual(task["family"], "papernest-bootstrap")
+            self.assertEqual(task["requiresCompatibilities"], ["FARGATE"])
+            (container,) = json.loads(task["containerDefinitions"])
+            self.assertEqual(
+                container["command"],
+                [
+                    "bootstrap",
+                    "admin",
+                    "user@example.com",
+                    "papernest_passwords",
+                ],
+            )
+            self.assertEqual(container["portMappings"], [])
+            # Same image as the service
+            (served,) = json.loads(
+                resource("papernest-tf").inputs["containerDefinitions"]
+            )
+            self.assertEqual(container["image"], served["image"])
+
+            run = resource("papernest-bootstrap").inputs
+            self.assertEqual(
+                run["task_definition"], "arn:papernest-bootstrap-tf"
+            )
+            self.assertEqual(run["cluster"], "arn:papernest-cluster")
+            self.assertEqual(
+                run["subnets"], ["private-subnet-a-id", "private-subnet-b-id"]
+            )
+            self.assertEqual(run["security_groups"], ["papernest-sg-id"])
+
+            # The service rolls once the bootstrap task ran
+            self.assertLess(
+                registered("papernest-bootstrap"),
+                registered("papernest-service"),
+            )
+
+        return services.services[0].service.urn.apply(check)
+
+    @pulumi.runtime.test
+    def test_persistent_connections(self):
+        def check(_):
+            task = resource("papernest-tf").inputs
+            (container,) = json.loads(task["containerDefinitions"])
+            environment = {
+                variable["name"]: variable["value"]
+                for variable in container["environment"]
+            }
+            self.assertEqual(environment["DB_CONN_MAX_AGE"], "60")
+            self.assertEqual(environment["DB_CONN_HEALTH_CHECKS"], "true")
+            self.assertEqual(environment["DB_PORT"], "5432")
+            self.assertNotIn("DB_POOLER", environment)
+
+        return services.services[0].service.urn.apply(check)
+
+    @pulumi.runtime.test
+    def test_pgbouncer_sidecar(self):
+        def check(_):
+            task = resource("pooled-tf").inputs
+            django, pgbouncer = json.loads(task["containerDefinitions"])
+            environment = {
+                variable["name"]: variable["value"]
+                for variable in django["environment"]
+            }
+            self.assertEqual(environment["DB_HOST"], "127.0.0.1")
+            self.assertEqual(environment["DB_PORT"], "6432")
+            self.assertEqual(environment["DB_POOLER"], "pgbouncer")
+            self.assertEqual(environment["DB_CONN_MAX_AGE"], "300")
+            self.assertEqual(
+                django["dependsOn"],
+                [{"containerName": "pgbouncer", "condition": "START"}],
+            )
+            # The sidecar fits in the task
+            self.assertEqual(django["cpu"] + pgbouncer["cpu"], 1024)
+            self.assertEqual(django["memory"] + pgbouncer["memory"], 2048)
+
+            bouncer_environment = {
+                variable["name"]: variable["value"]
+                for variable in pgbouncer["environment"]
+            }
+            self.assertEqual(bouncer_environment["DB_HOST"], "db.example.com")
+            self.assertEqual(bouncer_environment["POOL_MODE"], "transaction")
+            # 2 connections for each of the 3 sync workers of 1 CPU
+            self.assertEqual(bouncer_environment["DEFAULT_POOL_SIZE"], "6")
+            self.assertEqual(
+                pgbouncer["secrets"],
+                [
+                    {
+                        "name": "DB_PASSWORD",
+                        "valueFrom": "arn:pooled-db-password-param",
+                    }
+                ],
+            )
+            self.assertEqual(
+                resource("pooled-db-password-param").inputs["type"],
+                "SecureString",
+            )
+
+            # The bootstrap task holds session locks, it connects directly
+            bootstrap = resource("pooled-bootstrap-tf").inputs
+            (container,) = json.loads(bootstrap["containerDefinitions"])
+            environment = {
+                variable["name"]: variable["value"]
+                for variable in container["environment"]
+            }
+            self.assertEqual(environment["DB_HOST"], "db.example.com")
+
+        return services.services[1].service.urn.apply(check)